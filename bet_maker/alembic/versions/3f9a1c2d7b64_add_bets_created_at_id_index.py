@@ -0,0 +1,36 @@
+"""Add (created_at, id) index to bets
+
+Revision ID: 3f9a1c2d7b64
+Revises: e14794870be9
+Create Date: 2026-10-17 10:12:31.284113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9a1c2d7b64"
+down_revision: Union[str, None] = "e14794870be9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY doesn't block writes to bets, it can't run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_bets_created_at_id",
+            "bets",
+            ["created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_bets_created_at_id", table_name="bets", postgresql_concurrently=True
+        )
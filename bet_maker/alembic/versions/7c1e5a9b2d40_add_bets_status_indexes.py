@@ -0,0 +1,54 @@
+"""Add settlement indexes to bets
+
+Revision ID: 7c1e5a9b2d40
+Revises: 3f9a1c2d7b64
+Create Date: 2026-10-17 11:40:05.918274
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c1e5a9b2d40"
+down_revision: Union[str, None] = "3f9a1c2d7b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Stale unplayed bets: WHERE status = 'NOT_PLAYED' AND created_at < ...,
+    # only covers the bets still to settle, so it stays small. CONCURRENTLY
+    # doesn't block writes to bets, it can't run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_bets_not_played_created_at",
+            "bets",
+            ["created_at"],
+            unique=False,
+            postgresql_where=sa.text("status = 'NOT_PLAYED'"),
+            postgresql_concurrently=True,
+        )
+        # Bets of an event: WHERE event_id = ... AND status != ... when it is
+        # settled, the status filter is cheap on the few rows of one event
+        op.create_index(
+            "ix_bets_event_id_id",
+            "bets",
+            ["event_id", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_bets_event_id_id", table_name="bets", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_bets_not_played_created_at",
+            table_name="bets",
+            postgresql_concurrently=True,
+        )
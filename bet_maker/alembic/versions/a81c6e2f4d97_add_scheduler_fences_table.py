@@ -0,0 +1,34 @@
+"""Add scheduler fences table
+
+Revision ID: a81c6e2f4d97
+Revises: d4a7f3e91c05
+Create Date: 2026-10-17 16:41:08.215307
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a81c6e2f4d97"
+down_revision: Union[str, None] = "d4a7f3e91c05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scheduler_fences",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("token", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("scheduler_fences")
@@ -0,0 +1,49 @@
+"""Add settlements table
+
+Revision ID: b52d8e07a6c3
+Revises: 7c1e5a9b2d40
+Create Date: 2026-10-17 13:05:52.640311
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "b52d8e07a6c3"
+down_revision: Union[str, None] = "7c1e5a9b2d40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "settlements",
+        sa.Column("event_id", sa.String(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(
+                "NOT_PLAYED", "WON", "LOST", name="betstatus", create_type=False
+            ),
+            nullable=False,
+        ),
+        sa.Column("state", sa.String(length=7), nullable=False),
+        sa.Column("last_bet_id", sa.UUID(as_uuid=True), nullable=True),
+        sa.Column("settled", sa.Integer(), nullable=False),
+        sa.Column("chunks", sa.Integer(), nullable=False),
+        sa.Column(
+            "started_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("event_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("settlements")
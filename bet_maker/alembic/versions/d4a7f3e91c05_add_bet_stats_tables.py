@@ -0,0 +1,62 @@
+"""Add bet counters tables
+
+Revision ID: d4a7f3e91c05
+Revises: b52d8e07a6c3
+Create Date: 2026-10-17 14:21:37.105562
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a7f3e91c05"
+down_revision: Union[str, None] = "b52d8e07a6c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def bet_status() -> postgresql.ENUM:
+    return postgresql.ENUM(
+        "NOT_PLAYED", "WON", "LOST", name="betstatus", create_type=False
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_bet_stats",
+        sa.Column("event_id", sa.String(), nullable=False),
+        sa.Column("status", bet_status(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("bets", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint("event_id", "status", "shard"),
+    )
+    op.create_table(
+        "bet_stats",
+        sa.Column("status", bet_status(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("bets", sa.BigInteger(), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=18, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint("status", "shard"),
+    )
+
+    # Start the counters from the existing bets, all in shard 0
+    op.execute(
+        "INSERT INTO event_bet_stats (event_id, status, shard, bets, amount)"
+        " SELECT event_id, status, 0, count(*), sum(amount)"
+        " FROM bets GROUP BY event_id, status"
+    )
+    op.execute(
+        "INSERT INTO bet_stats (status, shard, bets, amount)"
+        " SELECT status, 0, sum(bets), sum(amount)"
+        " FROM event_bet_stats GROUP BY status"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("bet_stats")
+    op.drop_table("event_bet_stats")
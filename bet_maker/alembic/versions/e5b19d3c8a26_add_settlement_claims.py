@@ -0,0 +1,28 @@
+"""Add owner claims to settlements
+
+Revision ID: e5b19d3c8a26
+Revises: a81c6e2f4d97
+Create Date: 2026-10-17 18:37:12.508941
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b19d3c8a26"
+down_revision: Union[str, None] = "a81c6e2f4d97"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("settlements", sa.Column("owner", sa.String(), nullable=True))
+    op.add_column("settlements", sa.Column("lease_until", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("settlements", "lease_until")
+    op.drop_column("settlements", "owner")
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import Any, List, Optional, Tuple
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.operations.bet import create_bets
+from app.schemas import BetCreate
+from app.utils import LoggerConfigurator
+
+logger = LoggerConfigurator(name="bet-writer").configure()
+
+# Bet to insert, future resolved with its id and when it was submitted
+PendingBet = Tuple[BetCreate, asyncio.Future, float]
+
+
+class BetWriter:
+    """Group concurrent bet inserts into one statement and one commit.
+
+    Bets submitted by concurrent requests are collected for up to
+    `window_ms` after the first one, or until `max_batch_size` bets, then
+    inserted together. Every submitter waits for its own id, or for the
+    error when the batch fails. The queue is bounded, so submitters wait
+    when the database can't keep up.
+    """
+
+    def __init__(self, max_batch_size: int, window_ms: float, queue_size: int):
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self.queue: asyncio.Queue[PendingBet] = asyncio.Queue(queue_size)
+        self.task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.batch_size_max = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write everything submitted so far"""
+        await self.queue.join()
+        if self.task:
+            self.task.cancel()
+            await asyncio.wait([self.task])
+
+    async def submit(self, bet: BetCreate) -> str:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((bet, future, time.perf_counter()))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _write(self, batch: List[PendingBet]) -> None:
+        try:
+            async with AsyncSessionLocal() as session:
+                bet_ids = await create_bets(
+                    bets=[bet for bet, _, _ in batch], session=session
+                )
+        except Exception as e:
+            logger.error(f"Failed to write batch of {len(batch)} bets: {e}")
+            self.failed += len(batch)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        written_at = time.perf_counter()
+        for (_, future, submitted_at), bet_id in zip(batch, bet_ids):
+            waited = written_at - submitted_at
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+            # The request may have gone away, the bet is stored all the same
+            if not future.done():
+                future.set_result(bet_id)
+
+        self.batches += 1
+        self.written += len(batch)
+        self.batch_size_max = max(self.batch_size_max, len(batch))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "queued": self.queue.qsize(),
+            "batch_size_avg": self.written / self.batches if self.batches else 0,
+            "batch_size_max": self.batch_size_max,
+            "wait_time_avg": self.wait_time_total / self.written if self.written else 0,
+            "wait_time_max": self.wait_time_max,
+        }
+
+
+bet_writer: Optional[BetWriter] = None
+
+
+def init_bet_writer() -> Optional[BetWriter]:
+    """Start the application wide bet writer when group commit is enabled"""
+    global bet_writer
+    if settings.bet_writer_enabled:
+        bet_writer = BetWriter(
+            max_batch_size=settings.bet_writer_max_batch_size,
+            window_ms=settings.bet_writer_window_ms,
+            queue_size=settings.bet_writer_queue_size,
+        )
+        bet_writer.start()
+        logger.info(
+            f"Started bet writer, up to {settings.bet_writer_max_batch_size} bets "
+            f"per {settings.bet_writer_window_ms}ms"
+        )
+    return bet_writer
+
+
+async def close_bet_writer() -> None:
+    global bet_writer
+    if bet_writer:
+        await bet_writer.stop()
+        bet_writer = None
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0,
+        }
+
+
+class SingleFlight:
+    """Run at most one call per key at a time, concurrent callers share it.
+
+    The call runs in its own task, so a cancelled caller doesn't fail the
+    others. Failures are remembered for `error_ttl` seconds and re-raised
+    without calling again.
+    """
+
+    def __init__(self, error_ttl: float, max_errors: int = 10000) -> None:
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._errors = TTLCache(maxsize=max_errors, ttl=error_ttl)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        error = self._errors.get(key)
+        if error is not None:
+            raise error
+
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done))
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        self._calls.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self._errors.set(key, task.exception())
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+# Decoded events in front of Redis, the TTL bounds how stale an entry can get
+# when another instance applies the update
+event_cache = TTLCache(
+    maxsize=settings.event_cache_max_size, ttl=settings.event_cache_ttl
+)
+
+# Upstream event fetches on cache misses, one per event id at a time
+event_fetches = SingleFlight(error_ttl=settings.event_fetch_error_ttl)
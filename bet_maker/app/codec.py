@@ -0,0 +1,131 @@
+import json
+import struct
+from typing import Any, List, Optional, Sequence, Tuple
+
+from app.schemas import Event
+from app.utils import LoggerConfigurator
+
+logger = LoggerConfigurator(name="codec").configure()
+
+CONTENT_TYPE_HEADER = "content-type"
+BINARY_CONTENT_TYPE = "application/vnd.line-provider.event.v1"
+
+BINARY_VERSION = 1
+
+# Field flags, bit per optional field in the order they are written
+COEFFICIENT, DEADLINE, STATE = 1, 2, 4
+
+# version, set fields, null fields, event_id length
+_HEADER = struct.Struct(">BBBH")
+_DEADLINE = struct.Struct(">q")
+
+# Limits of the length fields, longer values raise ValueError
+MAX_EVENT_ID_LENGTH = 0xFFFF
+MAX_COEFFICIENT_LENGTH = 0xFF
+
+
+def encode_event(event: Event) -> bytes:
+    """Encode the fields set on an event in the v1 binary format.
+
+    Layout: header, event_id (utf-8), then for every set and non-null field in
+    flag order: coefficient (length byte + decimal string, kept exact),
+    deadline (int64) and state (uint8). Mirrors `app.codec.encode_event` of
+    line_provider, used here by tests and the codec benchmark. Raises
+    ValueError for values too long for their length fields.
+    """
+    # Read the set fields directly, model_dump costs more than the encoding
+    data = {name: getattr(event, name) for name in event.model_fields_set}
+    event_id = data["event_id"].encode("utf-8")
+    if len(event_id) > MAX_EVENT_ID_LENGTH:
+        raise ValueError(f"Event id {data['event_id'][:32]}... is too long to encode")
+
+    fields, nulls = 0, 0
+    body = [event_id]
+    if "coefficient" in data:
+        fields |= COEFFICIENT
+        if data["coefficient"] is None:
+            nulls |= COEFFICIENT
+        else:
+            coefficient = str(data["coefficient"]).encode("ascii")
+            if len(coefficient) > MAX_COEFFICIENT_LENGTH:
+                raise ValueError(
+                    f"Coefficient of event {data['event_id']} is too long to encode"
+                )
+            body.append(bytes([len(coefficient)]) + coefficient)
+    if "deadline" in data:
+        fields |= DEADLINE
+        if data["deadline"] is None:
+            nulls |= DEADLINE
+        else:
+            body.append(_DEADLINE.pack(data["deadline"]))
+    if "state" in data:
+        fields |= STATE
+        if data["state"] is None:
+            nulls |= STATE
+        else:
+            body.append(bytes([data["state"].value]))
+
+    return _HEADER.pack(BINARY_VERSION, fields, nulls, len(event_id)) + b"".join(body)
+
+
+def decode_event(payload: bytes) -> Event:
+    """Decode a v1 binary payload straight into an `Event`."""
+    version, fields, nulls, event_id_length = _HEADER.unpack_from(payload)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported event format version: {version}")
+
+    position = _HEADER.size
+    data: dict[str, Any] = {
+        "event_id": payload[position : position + event_id_length].decode("utf-8")
+    }
+    position += event_id_length
+
+    if fields & COEFFICIENT:
+        data["coefficient"] = None
+        if not nulls & COEFFICIENT:
+            length = payload[position]
+            position += 1
+            data["coefficient"] = payload[position : position + length].decode("ascii")
+            position += length
+    if fields & DEADLINE:
+        data["deadline"] = None
+        if not nulls & DEADLINE:
+            (data["deadline"],) = _DEADLINE.unpack_from(payload, position)
+            position += _DEADLINE.size
+    if fields & STATE:
+        data["state"] = None if nulls & STATE else payload[position]
+
+    # Validating primitives is cheaper than model_construct with typed values,
+    # and only the decoded fields end up set, as with partial JSON updates
+    return Event.model_validate(data)
+
+
+def get_content_type(headers: Optional[Sequence[Tuple[str, bytes]]]) -> Optional[str]:
+    for key, value in headers or ():
+        if key.lower() == CONTENT_TYPE_HEADER:
+            return value.decode("utf-8")
+    return None
+
+
+def decode_message(
+    value: bytes, headers: Optional[Sequence[Tuple[str, bytes]]]
+) -> Event:
+    """Decode a Kafka message value according to its content type."""
+    content_type = get_content_type(headers)
+    if content_type == BINARY_CONTENT_TYPE:
+        return decode_event(value)
+    if content_type is None:
+        # Legacy format: the event JSON wrapped in a JSON string
+        return Event.model_validate_json(json.loads(value))
+    raise ValueError(f"Unsupported content type: {content_type}")
+
+
+def decode_records(records: List[Any]) -> List[Event]:
+    """Decode consumer records, skipping the malformed ones."""
+    events: List[Event] = []
+    for record in records:
+        try:
+            events.append(decode_message(record.value, record.headers))
+        except Exception as e:
+            logger.error(f"Skipping malformed message: {record.value!r}, error: {e}")
+    return events
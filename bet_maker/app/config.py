@@ -7,14 +7,118 @@ load_dotenv(override=True)
 
 class Settings:
     redis_url = os.getenv("REDIS_URL")
+    redis_max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    # Seconds to wait for a free connection when the pool is exhausted
+    redis_pool_timeout = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+    redis_health_check_interval = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+    redis_socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+    redis_socket_connect_timeout = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "5"))
     line_provider_url = os.getenv("LINE_PROVIDER_URL")
+    line_provider_timeout = float(os.getenv("LINE_PROVIDER_TIMEOUT", "2"))
+    line_provider_connect_timeout = float(
+        os.getenv("LINE_PROVIDER_CONNECT_TIMEOUT", "1")
+    )
+    line_provider_max_connections = int(
+        os.getenv("LINE_PROVIDER_MAX_CONNECTIONS", "100")
+    )
+    line_provider_max_keepalive = int(os.getenv("LINE_PROVIDER_MAX_KEEPALIVE", "20"))
+    # Requires the h2 package
+    line_provider_http2 = os.getenv("LINE_PROVIDER_HTTP2", "false").lower() == "true"
+    # Most event ids sent to Line Provider service in one batch request
+    line_provider_batch_size = int(os.getenv("LINE_PROVIDER_BATCH_SIZE", "500"))
+    # Consecutive failures before failing fast, and seconds before a retry
+    line_provider_breaker_threshold = int(
+        os.getenv("LINE_PROVIDER_BREAKER_THRESHOLD", "5")
+    )
+    line_provider_breaker_reset_timeout = float(
+        os.getenv("LINE_PROVIDER_BREAKER_RESET_TIMEOUT", "30")
+    )
+    # In-process event cache in front of Redis, the TTL is the staleness bound
+    event_cache_max_size = int(os.getenv("EVENT_CACHE_MAX_SIZE", "10000"))
+    event_cache_ttl = float(os.getenv("EVENT_CACHE_TTL", "5"))
+    # Cached events expire this many seconds after their deadline
+    event_cache_retention = int(os.getenv("EVENT_CACHE_RETENTION", str(60 * 60 * 48)))
+    warmup_page_size = int(os.getenv("WARMUP_PAGE_SIZE", "5000"))
+    warmup_chunk_size = int(os.getenv("WARMUP_CHUNK_SIZE", "1000"))
+    # Most bets accepted by a single POST /bets/batch
+    bet_batch_max_size = int(os.getenv("BET_BATCH_MAX_SIZE", "1000"))
+    # Group commit of concurrent POST /bets: bets are written together after
+    # waiting up to the window for more of them, or once the batch is full
+    bet_writer_enabled = os.getenv("BET_WRITER_ENABLED", "false").lower() == "true"
+    bet_writer_max_batch_size = int(os.getenv("BET_WRITER_MAX_BATCH_SIZE", "100"))
+    bet_writer_window_ms = float(os.getenv("BET_WRITER_WINDOW_MS", "2"))
+    bet_writer_queue_size = int(os.getenv("BET_WRITER_QUEUE_SIZE", "10000"))
+    # Monthly bets partitions, see app/partitioning.py. Retention in months,
+    # 0 keeps every partition
+    bets_partitioning = os.getenv("BETS_PARTITIONING", "false").lower() == "true"
+    bets_partitions_ahead = int(os.getenv("BETS_PARTITIONS_AHEAD", "2"))
+    bets_partition_retention = int(os.getenv("BETS_PARTITION_RETENTION", "0"))
+    # Events settled per UPDATE statement and transaction
+    settlement_chunk_size = int(os.getenv("SETTLEMENT_CHUNK_SIZE", "500"))
+    # Bets fetched from the server-side cursor per batch of GET /bets/export
+    export_batch_size = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    # Rows every bet counter is spread over, see EventBetStats
+    bet_stats_shards = int(os.getenv("BET_STATS_SHARDS", "8"))
+    # Bets of a finished event settled per transaction, and how long a
+    # settlement claim lasts without progress before another worker resumes it
+    settlement_batch_size = int(os.getenv("SETTLEMENT_BATCH_SIZE", "5000"))
+    settlement_stale_after = int(os.getenv("SETTLEMENT_STALE_AFTER", "60"))
+    # Failed upstream event fetches are re-raised for this many seconds
+    event_fetch_error_ttl = float(os.getenv("EVENT_FETCH_ERROR_TTL", "1"))
+    # Short Redis lock so only one instance fetches a missing event upstream
+    event_fetch_lock = os.getenv("EVENT_FETCH_LOCK", "true").lower() == "true"
+    event_fetch_lock_ttl = float(os.getenv("EVENT_FETCH_LOCK_TTL", "2"))
+    event_fetch_lock_poll_interval = float(
+        os.getenv("EVENT_FETCH_LOCK_POLL_INTERVAL", "0.05")
+    )
     kafka_bootstrap_servers = os.getenv("KAFKA_BOOTSTRAP_SERVERS")
     kafka_events_update_topic = "line_provider"
     kafka_consumer_group = "bet_maker"
+    # "batch" polls with getmany and commits once per batch, "single" commits
+    # after every record, "partitioned" processes partitions concurrently
+    kafka_consumer_mode = os.getenv("KAFKA_CONSUMER_MODE", "batch")
+    kafka_batch_max_records = int(os.getenv("KAFKA_BATCH_MAX_RECORDS", "500"))
+    kafka_batch_max_wait_ms = int(os.getenv("KAFKA_BATCH_MAX_WAIT_MS", "200"))
+    kafka_batch_retry_backoff = float(os.getenv("KAFKA_BATCH_RETRY_BACKOFF", "1"))
+    # Workers per assigned partition, records are routed by a hash of the key
+    kafka_partition_workers = int(os.getenv("KAFKA_PARTITION_WORKERS", "1"))
+    kafka_worker_queue_size = int(os.getenv("KAFKA_WORKER_QUEUE_SIZE", "1000"))
+    kafka_commit_interval = float(os.getenv("KAFKA_COMMIT_INTERVAL", "1"))
+    # How long revoked partitions get to finish their in-flight records
+    kafka_revoke_timeout = float(os.getenv("KAFKA_REVOKE_TIMEOUT", "10"))
     database_url = (
         f"postgresql+asyncpg://{os.getenv('BET_MAKER_DB_USER')}:{os.getenv('BET_MAKER_DB_PASSWORD')}"
         f"@{os.getenv('BET_MAKER_DB_HOST')}:{os.getenv('BET_MAKER_DB_PORT')}/{os.getenv('BET_MAKER_POSTGRES_DB')}"
     )
+    # In-process timers closing events at their deadline and checking their
+    # settlement EVENT_SETTLE_CHECK_DELAY seconds later, retried with a
+    # doubling delay up to EVENT_SETTLE_CHECK_ATTEMPTS times
+    event_timers_enabled = os.getenv("EVENT_TIMERS_ENABLED", "true").lower() == "true"
+    event_settle_check_delay = float(os.getenv("EVENT_SETTLE_CHECK_DELAY", "60"))
+    event_settle_check_attempts = int(os.getenv("EVENT_SETTLE_CHECK_ATTEMPTS", "5"))
+    event_timers_max_size = int(os.getenv("EVENT_TIMERS_MAX_SIZE", "100000"))
+
+    # How instances share the hourly pending bets sweep: "lease" runs it on
+    # one instance per cycle, "shard" splits events between the instances
+    # live when the cycle started, "none" runs the whole sweep everywhere
+    sweep_coordination = os.getenv("SWEEP_COORDINATION", "lease")
+    sweep_lease_ttl = int(os.getenv("SWEEP_LEASE_TTL", "60"))
+    cluster_member_ttl = int(os.getenv("CLUSTER_MEMBER_TTL", "30"))
+
+    # Optional read replica for read-only queries, same credentials and
+    # database as the primary
+    replica_database_url = (
+        f"postgresql+asyncpg://{os.getenv('BET_MAKER_DB_USER')}:{os.getenv('BET_MAKER_DB_PASSWORD')}"
+        f"@{os.getenv('BET_MAKER_REPLICA_DB_HOST')}:{os.getenv('BET_MAKER_REPLICA_DB_PORT', os.getenv('BET_MAKER_DB_PORT'))}/{os.getenv('BET_MAKER_POSTGRES_DB')}"
+        if os.getenv("BET_MAKER_REPLICA_DB_HOST")
+        else None
+    )
+    # Reads go to the primary while the replica lags more than this many
+    # seconds or can't be reached, checked at most once per interval in the
+    # background, the check and every replica connect bounded by the timeout
+    replica_max_lag = float(os.getenv("REPLICA_MAX_LAG", "5"))
+    replica_check_interval = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))
+    replica_timeout = float(os.getenv("REPLICA_TIMEOUT", "2"))
 
 
 settings = Settings()
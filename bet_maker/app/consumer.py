@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import zlib
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiokafka import AIOKafkaConsumer, ConsumerRecord, TopicPartition  # type: ignore
+from aiokafka.abc import ConsumerRebalanceListener  # type: ignore
+from app.utils import LoggerConfigurator
+
+logger: logging.Logger = LoggerConfigurator(name="consumer").configure()
+
+WorkerKey = Tuple[TopicPartition, int]
+
+
+class PartitionOffsets:
+    """In-flight offsets of a partition and the position safe to commit."""
+
+    def __init__(self) -> None:
+        self.pending: Set[int] = set()
+        self.next_offset: Optional[int] = None
+        self.committed: Optional[int] = None
+
+    def add(self, offset: int) -> None:
+        self.pending.add(offset)
+        self.next_offset = offset + 1
+
+    def done(self, offset: int) -> None:
+        self.pending.discard(offset)
+
+    def committable(self) -> Optional[int]:
+        """Lowest offset not processed yet, everything below it is done."""
+        if self.pending:
+            return min(self.pending)
+        return self.next_offset
+
+
+class PartitionedConsumer(ConsumerRebalanceListener):
+    """Process records concurrently, one worker per partition (or key bucket).
+
+    Records of a partition are routed to `buckets` workers by a stable hash of
+    the record key, so updates for the same event are handled in order while
+    different partitions and buckets run concurrently. Each worker has a
+    bounded queue which throttles polling, and offsets are only committed up
+    to the lowest record still in flight. On rebalance the workers of
+    revoked partitions get `revoke_timeout` seconds to finish, then they
+    are cancelled and only the completed offsets are committed.
+    """
+
+    def __init__(
+        self,
+        consumer: AIOKafkaConsumer,
+        handler: Callable[[List[ConsumerRecord]], Awaitable[None]],
+        buckets: int = 1,
+        queue_size: int = 1000,
+        batch_size: int = 500,
+        poll_timeout_ms: int = 200,
+        commit_interval: float = 1,
+        retry_backoff: float = 1,
+        revoke_timeout: float = 10,
+    ) -> None:
+        self._consumer = consumer
+        self._handler = handler
+        self._buckets = max(buckets, 1)
+        self._queue_size = queue_size
+        self._batch_size = batch_size
+        self._poll_timeout_ms = poll_timeout_ms
+        self._commit_interval = commit_interval
+        self._retry_backoff = retry_backoff
+        self._revoke_timeout = revoke_timeout
+
+        self._offsets: Dict[TopicPartition, PartitionOffsets] = {}
+        self._queues: Dict[WorkerKey, asyncio.Queue[ConsumerRecord]] = {}
+        self._workers: Dict[WorkerKey, asyncio.Task[None]] = {}
+
+    def _bucket(self, key: Optional[bytes]) -> int:
+        if self._buckets == 1 or not key:
+            return 0
+        return zlib.crc32(key) % self._buckets
+
+    def _queue_for(self, tp: TopicPartition, key: Optional[bytes]):
+        worker_key = (tp, self._bucket(key))
+        if worker_key not in self._queues:
+            queue: asyncio.Queue[ConsumerRecord] = asyncio.Queue(self._queue_size)
+            self._queues[worker_key] = queue
+            self._workers[worker_key] = asyncio.create_task(self._work(tp, queue))
+        return self._queues[worker_key]
+
+    async def _work(self, tp: TopicPartition, queue: asyncio.Queue) -> None:
+        while True:
+            records = [await queue.get()]
+            while len(records) < self._batch_size and not queue.empty():
+                records.append(queue.get_nowait())
+
+            # Retry until the records are processed, skipping them would
+            # break at-least-once delivery and per-event ordering
+            while True:
+                try:
+                    await self._handler(records)
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error processing records of {tp}: {e}")
+                    await asyncio.sleep(self._retry_backoff)
+
+            offsets = self._offsets.get(tp)
+            for record in records:
+                if offsets:
+                    offsets.done(record.offset)
+                queue.task_done()
+
+    async def commit(self) -> None:
+        """Commit the lowest completed position of every partition."""
+        offsets = {}
+        for tp, tracker in self._offsets.items():
+            position = tracker.committable()
+            if position is not None and position != tracker.committed:
+                offsets[tp] = position
+
+        if not offsets:
+            return
+
+        await self._consumer.commit(offsets)
+        for tp, position in offsets.items():
+            self._offsets[tp].committed = position
+
+    async def _commit_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._commit_interval)
+            try:
+                await self.commit()
+            except Exception as e:
+                logger.error(f"Failed to commit offsets: {e}")
+
+    def _stop_workers(self, partitions: Set[TopicPartition]) -> None:
+        for worker_key in [key for key in self._workers if key[0] in partitions]:
+            self._workers.pop(worker_key).cancel()
+            queue = self._queues.pop(worker_key)
+            # Unblock a poll loop waiting to put into the full queue
+            while not queue.empty():
+                queue.get_nowait()
+        for tp in partitions:
+            self._offsets.pop(tp, None)
+
+    async def on_partitions_revoked(self, revoked) -> None:
+        # Let the workers finish what was already polled, so the new owner of
+        # the partition starts right after the last processed record
+        # A failing handler is retried forever, so the wait is bounded to stay
+        # within the rebalance timeout, unfinished records are redelivered
+        queues = [queue for key, queue in self._queues.items() if key[0] in revoked]
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in queues)),
+                self._revoke_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Revoked partitions not drained in {self._revoke_timeout}s, "
+                "committing the completed records only"
+            )
+        try:
+            await self.commit()
+        except Exception as e:
+            logger.error(f"Failed to commit revoked partitions: {e}")
+        self._stop_workers(set(revoked))
+
+    async def on_partitions_assigned(self, assigned) -> None:
+        logger.info(f"Assigned partitions: {assigned}")
+
+    async def run(self) -> None:
+        committer = asyncio.create_task(self._commit_periodically())
+        try:
+            while True:
+                try:
+                    batches = await self._consumer.getmany(
+                        timeout_ms=self._poll_timeout_ms,
+                        max_records=self._batch_size,
+                    )
+                except Exception as e:
+                    logger.error(f"Consumer error: {e}")
+                    await asyncio.sleep(5)
+                    continue
+
+                for tp, records in batches.items():
+                    for record in records:
+                        # Revoked while waiting for a full queue, the records
+                        # left belong to the new owner now
+                        if tp not in self._consumer.assignment():
+                            break
+                        offsets = self._offsets.setdefault(tp, PartitionOffsets())
+                        offsets.add(record.offset)
+                        # Blocks when the worker is full, bounding in-flight work
+                        await self._queue_for(tp, record.key).put(record)
+        finally:
+            committer.cancel()
+            try:
+                await self.commit()
+            except Exception as e:
+                logger.error(f"Failed to commit offsets on shutdown: {e}")
+            self._stop_workers(set(self._offsets))
@@ -15,3 +15,19 @@ engine = create_async_engine(DATABASE_URL, echo=True)
 AsyncSessionLocal = async_sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
 )
+
+replica_engine = (
+    create_async_engine(
+        settings.replica_database_url,
+        echo=True,
+        connect_args={"timeout": settings.replica_timeout},
+    )
+    if settings.replica_database_url
+    else None
+)
+
+AsyncReplicaSessionLocal = (
+    async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine
+    else None
+)
@@ -1,10 +1,11 @@
-import json
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator, Tuple
 
 from aiokafka import AIOKafkaConsumer  # type: ignore
+from app import redis_pool
 from app.config import settings
 from app.database import AsyncSessionLocal
+from app.replica import get_read_sessionmaker
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -14,7 +15,18 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    # Replica when configured and fresh enough, for read-only requests
+    session_factory = await get_read_sessionmaker()
+    async with session_factory() as session:
+        yield session
+
+
 async def get_redis_client() -> Redis:
+    # Borrow from the shared pool, closing the client releases the connection
+    if redis_pool.redis_pool:
+        return Redis(connection_pool=redis_pool.redis_pool)
+
     if not settings.redis_url:
         raise ValueError("Redis URL not set")
 
@@ -40,7 +52,6 @@ async def get_consumer() -> AIOKafkaConsumer:
         group_id=settings.kafka_consumer_group,
         auto_offset_reset="earliest",
         enable_auto_commit=False,
-        value_deserializer=lambda m: json.loads(m.decode("utf-8")),
     )
 
     return consumer
@@ -1,2 +1,14 @@
 class ConsumerStartError(Exception):
     pass
+
+
+class LineProviderUnavailableError(Exception):
+    pass
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class StaleLeaseError(Exception):
+    pass
@@ -0,0 +1,241 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.schemas import EventState
+from app.utils import LoggerConfigurator
+
+logger = LoggerConfigurator(name="event-timers").configure()
+
+CLOSE, SETTLE_CHECK = "close", "settle_check"
+
+# Fires at, tie breaker, kind, event id and the deadline it was scheduled for
+Timer = Tuple[float, int, str, str, int]
+
+
+class EventTimers:
+    """Fire at event deadlines from one in-process heap.
+
+    Events are tracked with their deadline from every update this instance
+    sees. When the deadline passes the event is marked closed and
+    `on_close` is called. `settle_delay` seconds later `on_settle_check`
+    is called, and the checks are repeated with a doubling delay until it
+    reports the event settled, at most `settle_attempts` times. Checks run
+    as tasks of their own, so a slow settlement doesn't hold up the timers
+    behind it. Changed deadlines leave the old timers in the heap, they are
+    skipped when due.
+    """
+
+    def __init__(
+        self,
+        on_close: Callable[[List[str]], Awaitable[None]],
+        on_settle_check: Callable[[List[str]], Awaitable[List[str]]],
+        settle_delay: float,
+        settle_attempts: int,
+        max_size: int,
+    ):
+        self.on_close = on_close
+        self.on_settle_check = on_settle_check
+        self.settle_delay = settle_delay
+        self.settle_attempts = settle_attempts
+        self.max_size = max_size
+
+        self.heap: List[Timer] = []
+        self.deadlines: Dict[str, int] = {}
+        self.closed: Set[str] = set()
+        self.attempts: Dict[str, int] = {}
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.checks: Set[asyncio.Task] = set()
+
+        self.closes = 0
+        self.settle_checks = 0
+        self.settled = 0
+        self.given_up = 0
+        self.dropped = 0
+        self.lag_max = 0.0
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [self.task, *self.checks] if self.task else list(self.checks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def track(self, event: dict) -> None:
+        """Schedule the timers of an event, or drop them once it finished"""
+        event_id = event.get("event_id")
+        if not event_id:
+            return
+        state = event.get("state")
+        if state is not None and state != EventState.NEW.value:
+            self.forget(event_id)
+            return
+
+        deadline = event.get("deadline")
+        if not isinstance(deadline, int) or self.deadlines.get(event_id) == deadline:
+            return
+        if event_id not in self.deadlines and len(self.deadlines) >= self.max_size:
+            # Left to the hourly sweep
+            self.dropped += 1
+            return
+
+        self.deadlines[event_id] = deadline
+        self.attempts.pop(event_id, None)
+        if deadline > time.time():
+            self.closed.discard(event_id)
+            self._push(deadline, CLOSE, event_id, deadline)
+        else:
+            self.closed.add(event_id)
+        self._push(deadline + self.settle_delay, SETTLE_CHECK, event_id, deadline)
+
+    def forget(self, event_id: str) -> None:
+        self.deadlines.pop(event_id, None)
+        self.closed.discard(event_id)
+        self.attempts.pop(event_id, None)
+        # Rebuild once mostly stale timers are left, the rest are skipped
+        if len(self.heap) > 2 * len(self.deadlines) + 1000:
+            self.heap = [timer for timer in self.heap if self._is_current(timer)]
+            heapq.heapify(self.heap)
+
+    def is_closed(self, event_id: str) -> bool:
+        return event_id in self.closed
+
+    def _push(self, when: float, kind: str, event_id: str, deadline: int) -> None:
+        timer = (when, next(self.counter), kind, event_id, deadline)
+        heapq.heappush(self.heap, timer)
+        if self.heap[0] is timer:
+            self.wakeup.set()
+
+    def _is_current(self, timer: Timer) -> bool:
+        return self.deadlines.get(timer[3]) == timer[4]
+
+    def _pop_due(self, now: float) -> Tuple[List[str], List[str]]:
+        closing: List[str] = []
+        checking: List[str] = []
+        while self.heap and self.heap[0][0] <= now:
+            timer = heapq.heappop(self.heap)
+            if not self._is_current(timer):
+                continue
+            when, _, kind, event_id, _ = timer
+            self.lag_max = max(self.lag_max, now - when)
+            if kind == CLOSE:
+                self.closed.add(event_id)
+                closing.append(event_id)
+            else:
+                checking.append(event_id)
+        return closing, checking
+
+    async def _run(self) -> None:
+        while True:
+            self.wakeup.clear()
+            now = time.time()
+            if not self.heap or self.heap[0][0] > now:
+                timeout = self.heap[0][0] - now if self.heap else None
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            closing, checking = self._pop_due(now)
+            if closing:
+                self.closes += len(closing)
+                try:
+                    await self.on_close(closing)
+                except Exception as e:
+                    logger.error(f"Failed to close events {closing}: {e}")
+            if checking:
+                check = asyncio.create_task(self._check_settlements(checking))
+                self.checks.add(check)
+                check.add_done_callback(self.checks.discard)
+
+    async def _check_settlements(self, event_ids: List[str]) -> None:
+        self.settle_checks += len(event_ids)
+        try:
+            settled = set(await self.on_settle_check(event_ids))
+        except Exception as e:
+            logger.error(f"Failed to check settlement of events {event_ids}: {e}")
+            settled = set()
+
+        for event_id in event_ids:
+            deadline = self.deadlines.get(event_id)
+            if deadline is None:
+                continue
+            if event_id in settled:
+                self.settled += 1
+                self.forget(event_id)
+                continue
+
+            attempts = self.attempts.get(event_id, 0) + 1
+            if attempts >= self.settle_attempts:
+                # Left to the hourly sweep
+                self.given_up += 1
+                self.forget(event_id)
+                continue
+            self.attempts[event_id] = attempts
+            retry_at = time.time() + self.settle_delay * 2**attempts
+            self._push(retry_at, SETTLE_CHECK, event_id, deadline)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "tracked": len(self.deadlines),
+            "closed": len(self.closed),
+            "timers": len(self.heap),
+            "checks_running": len(self.checks),
+            "next_in": max(self.heap[0][0] - time.time(), 0) if self.heap else None,
+            "closes": self.closes,
+            "settle_checks": self.settle_checks,
+            "settled": self.settled,
+            "given_up": self.given_up,
+            "dropped": self.dropped,
+            "lag_max": self.lag_max,
+        }
+
+
+event_timers: Optional[EventTimers] = None
+
+
+def init_event_timers(
+    on_close: Callable[[List[str]], Awaitable[None]],
+    on_settle_check: Callable[[List[str]], Awaitable[List[str]]],
+) -> Optional[EventTimers]:
+    """Start the application wide event timers when enabled"""
+    global event_timers
+    if settings.event_timers_enabled:
+        event_timers = EventTimers(
+            on_close=on_close,
+            on_settle_check=on_settle_check,
+            settle_delay=settings.event_settle_check_delay,
+            settle_attempts=settings.event_settle_check_attempts,
+            max_size=settings.event_timers_max_size,
+        )
+        event_timers.start()
+        logger.info("Started event timers")
+    return event_timers
+
+
+async def close_event_timers() -> None:
+    global event_timers
+    if event_timers:
+        await event_timers.stop()
+        event_timers = None
+
+
+def track_events(events: Iterable[dict]) -> None:
+    """Feed event updates to the timers, when running"""
+    if event_timers:
+        for event in events:
+            event_timers.track(event)
+
+
+def is_closed(event_id: str) -> bool:
+    """Whether the deadline of the event is known to have passed"""
+    return event_timers is not None and event_timers.is_closed(event_id)
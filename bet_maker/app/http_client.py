@@ -0,0 +1,168 @@
+import bisect
+import time
+from typing import Any, List, Optional
+
+import httpx
+from app.config import settings
+from app.errors import LineProviderUnavailableError
+from app.utils import LoggerConfigurator
+
+logger = LoggerConfigurator(name="http-client").configure()
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures.
+
+    Opens after `failure_threshold` consecutive failures, and after
+    `reset_timeout` seconds lets a single trial call through (half-open): a
+    success closes it again, a failure reopens it. A trial without an
+    outcome doesn't block the circuit, another one is let through after
+    `reset_timeout` again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            # Counts the trial timeout from here
+            self.opened_at = now
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.error(f"Circuit opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed bucket bounds in seconds."""
+
+    def __init__(self, bounds: List[float]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def stats(self) -> dict[str, Any]:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip([*map(str, self.bounds), "+Inf"], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"count": self.count, "sum": self.total, "buckets": buckets}
+
+
+class LineProviderClient:
+    """Pooled keep-alive client for Line Provider service behind a breaker."""
+
+    def __init__(self) -> None:
+        self.client = httpx.AsyncClient(
+            base_url=settings.line_provider_url or "",
+            http2=settings.line_provider_http2,
+            timeout=httpx.Timeout(
+                settings.line_provider_timeout,
+                connect=settings.line_provider_connect_timeout,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.line_provider_max_connections,
+                max_keepalive_connections=settings.line_provider_max_keepalive,
+            ),
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.line_provider_breaker_threshold,
+            reset_timeout=settings.line_provider_breaker_reset_timeout,
+        )
+        self.latency = LatencyHistogram(
+            bounds=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+        )
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if not self.breaker.allow():
+            raise LineProviderUnavailableError("Line Provider circuit is open")
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled or failed otherwise, a trial call still has to end
+            if self.breaker.state == CircuitBreaker.HALF_OPEN:
+                self.breaker.record_failure()
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+
+        # Client errors such as unknown events don't mean the service is down
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def stats(self) -> dict[str, Any]:
+        return {"breaker": self.breaker.stats(), "latency": self.latency.stats()}
+
+
+line_provider_client: Optional[LineProviderClient] = None
+
+
+def get_line_provider_client() -> LineProviderClient:
+    """Shared client, created on first use when lifespan didn't create it"""
+    global line_provider_client
+    if line_provider_client is None:
+        line_provider_client = LineProviderClient()
+    return line_provider_client
+
+
+async def close_line_provider_client() -> None:
+    global line_provider_client
+    if line_provider_client:
+        await line_provider_client.aclose()
+        line_provider_client = None
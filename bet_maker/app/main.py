@@ -4,13 +4,27 @@ from contextlib import asynccontextmanager
 from typing import Optional
 
 from aiokafka import AIOKafkaConsumer  # type: ignore
+from app.bet_writer import close_bet_writer, init_bet_writer
+from app.config import settings
+from app.consumer import PartitionedConsumer
 from app.database import db
 from app.dependencies import get_consumer
 from app.errors import ConsumerStartError
-from app.routes import bets, events
+from app.event_timers import close_event_timers, init_event_timers
+from app.http_client import close_line_provider_client, get_line_provider_client
+from app.redis_pool import close_redis_pool, init_redis_pool
+from app.replica import close_replica_router
+from app.routes import bets, events, stats
 from app.tasks import (
+    check_event_settlements,
+    close_events,
+    cluster_heartbeat,
     get_available_events_on_startup,
+    leave_cluster_on_shutdown,
+    maintain_bets_partitions,
     process_message,
+    process_messages,
+    resume_settlements_scheduler,
     update_pending_bets_scheduler,
 )
 from app.utils import LoggerConfigurator
@@ -27,8 +41,8 @@ async def consume_messages():
         try:
             async for msg in consumer:
                 try:
-                    logger.info(f"Received message: {msg.value}")
-                    await process_message(message=msg.value)
+                    logger.info(f"Received message: {msg.value!r}")
+                    await process_message(message=msg)
                     await consumer.commit()
                 except Exception as e:
                     logger.error(f"Error processing message: {e}")
@@ -46,6 +60,47 @@ async def consume_messages():
                 logger.error(f"Fialed to reconnect: {reconnect_error}")
 
 
+async def consume_batches():
+    global consumer
+    while consumer:
+        try:
+            batches = await consumer.getmany(
+                timeout_ms=settings.kafka_batch_max_wait_ms,
+                max_records=settings.kafka_batch_max_records,
+            )
+            if not batches:
+                continue
+
+            messages = [record for records in batches.values() for record in records]
+            logger.info(f"Received batch of {len(messages)} messages")
+            try:
+                await process_messages(messages=messages)
+            except Exception as e:
+                logger.error(f"Error processing batch: {e}")
+                # Rewind to the start of the batch so it's redelivered,
+                # nothing from it has been committed yet
+                for tp, records in batches.items():
+                    consumer.seek(tp, records[0].offset)
+                await asyncio.sleep(settings.kafka_batch_retry_backoff)
+                continue
+
+            await consumer.commit(
+                {tp: records[-1].offset + 1 for tp, records in batches.items()}
+            )
+        except asyncio.CancelledError:
+            logger.info("Consumer task was cancelled")
+            break
+        except Exception as e:
+            logger.error(f"Consumer error: {e}")
+            await asyncio.sleep(5)
+            # Attempt to reconnect
+            try:
+                await consumer.stop()
+                await consumer.start()
+            except Exception as reconnect_error:
+                logger.error(f"Fialed to reconnect: {reconnect_error}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global consumer, consume_task
@@ -56,16 +111,43 @@ async def lifespan(app: FastAPI):
 
     logger.info("Database connected")
 
-    # Start periodic bets check task
+    # Shared by request handlers, background tasks and the consumer
+    init_redis_pool()
+    get_line_provider_client()
+    init_bet_writer()
+    init_event_timers(on_close=close_events, on_settle_check=check_event_settlements)
+
+    # Start periodic bets check task, shared with the other instances
+    # according to SWEEP_COORDINATION
+    await cluster_heartbeat()
     await update_pending_bets_scheduler()
+    await maintain_bets_partitions()
+    await resume_settlements_scheduler()
 
-    # Start available events getter task
-    # TODO: Not situable for multiple instances, need better solution
-    # May be better to use control events counter for interval
+    # Catch up the event cache, every instance keeps its own in-process
+    # copy, and the incremental sync makes this cheap for each of them
     await get_available_events_on_startup()
 
     # Set up consumer
     consumer = await get_consumer()
+    partitioned_consumer: Optional[PartitionedConsumer] = None
+    if settings.kafka_consumer_mode == "partitioned":
+        partitioned_consumer = PartitionedConsumer(
+            consumer=consumer,
+            handler=process_messages,
+            buckets=settings.kafka_partition_workers,
+            queue_size=settings.kafka_worker_queue_size,
+            batch_size=settings.kafka_batch_max_records,
+            poll_timeout_ms=settings.kafka_batch_max_wait_ms,
+            commit_interval=settings.kafka_commit_interval,
+            retry_backoff=settings.kafka_batch_retry_backoff,
+            revoke_timeout=settings.kafka_revoke_timeout,
+        )
+        # Drain and commit revoked partitions before they move to another member
+        consumer.subscribe(
+            topics=[settings.kafka_events_update_topic],
+            listener=partitioned_consumer,
+        )
 
     # Start consumer
     try:
@@ -75,19 +157,31 @@ async def lifespan(app: FastAPI):
         raise ConsumerStartError("Failed to start consumer")
 
     # Start consumer task
-    consume_task = asyncio.create_task(consume_messages())
+    if partitioned_consumer:
+        consume_task = asyncio.create_task(partitioned_consumer.run())
+    elif settings.kafka_consumer_mode == "batch":
+        consume_task = asyncio.create_task(consume_batches())
+    else:
+        consume_task = asyncio.create_task(consume_messages())
 
     logger.info("Started up")
 
     yield
 
     logger.info("Shutting down")
+    # Flush the bets still waiting for a group commit
+    await close_bet_writer()
+    await close_event_timers()
+    await leave_cluster_on_shutdown()
     await db.disconnect()
 
     if consume_task:
         consume_task.cancel()
         await asyncio.wait([consume_task])
     await consumer.stop()
+    await close_redis_pool()
+    await close_line_provider_client()
+    await close_replica_router()
 
     logger.info("Shutdown complete")
 
@@ -96,6 +190,7 @@ app_bet_maker = FastAPI(lifespan=lifespan)
 
 app_bet_maker.include_router(bets.router, prefix="")
 app_bet_maker.include_router(events.router, prefix="")
+app_bet_maker.include_router(stats.router, prefix="")
 
 
 @app_bet_maker.get("/health")
@@ -2,7 +2,16 @@ import uuid
 from enum import Enum as PyEnum
 
 from app.database import Base
-from sqlalchemy import DateTime, Enum, Numeric, String
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Enum,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    text,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
@@ -14,8 +23,26 @@ class BetStatus(PyEnum):
     LOST = "проиграла"
 
 
+class SettlementState(PyEnum):
+    RUNNING = "running"
+    DONE = "done"
+
+
 class Bet(Base):
     __tablename__ = "bets"
+    __table_args__ = (
+        # Keyset pagination of the bets history
+        Index("ix_bets_created_at_id", "created_at", "id"),
+        # Bets of an event: chunked settlement walks them by id, the sweep
+        # filters them by status
+        Index("ix_bets_event_id_id", "event_id", "id"),
+        # Stale unplayed bets, covers only the bets still to settle
+        Index(
+            "ix_bets_not_played_created_at",
+            "created_at",
+            postgresql_where=text("status = 'NOT_PLAYED'"),
+        ),
+    )
 
     id: Mapped[UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
@@ -31,3 +58,73 @@ class Bet(Base):
     updated_at: Mapped[DateTime] = mapped_column(
         DateTime, server_default=func.now(), onupdate=func.now()
     )
+
+
+class Settlement(Base):
+    """Progress of settling the bets of a finished event."""
+
+    __tablename__ = "settlements"
+
+    event_id: Mapped[str] = mapped_column(String, primary_key=True)
+    status: Mapped[BetStatus] = mapped_column(Enum(BetStatus), nullable=False)
+    state: Mapped[SettlementState] = mapped_column(
+        Enum(SettlementState, native_enum=False),
+        nullable=False,
+        default=SettlementState.RUNNING,
+    )
+    # Bets are settled in id order, every bet up to this one is done
+    last_bet_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    settled: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    chunks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    started_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime, server_default=func.now(), onupdate=func.now()
+    )
+    finished_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+    # Worker settling the event, its claim expires unless renewed by a chunk
+    owner: Mapped[str] = mapped_column(String, nullable=True)
+    lease_until: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+
+
+class EventBetStats(Base):
+    """Number and amount of bets per event and status.
+
+    Maintained alongside every bet insert and status change. Writers add to
+    one of `bet_stats_shards` rows at random, so concurrent bets on a
+    popular event don't queue on a single row, readers sum the shards.
+    """
+
+    __tablename__ = "event_bet_stats"
+
+    event_id: Mapped[str] = mapped_column(String, primary_key=True)
+    status: Mapped[BetStatus] = mapped_column(Enum(BetStatus), primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bets: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    amount: Mapped[Numeric] = mapped_column(
+        Numeric(precision=14, scale=2), nullable=False, default=0
+    )
+
+
+class BetStats(Base):
+    """Number and amount of all bets per status, sharded like EventBetStats."""
+
+    __tablename__ = "bet_stats"
+
+    status: Mapped[BetStatus] = mapped_column(Enum(BetStatus), primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bets: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    amount: Mapped[Numeric] = mapped_column(
+        Numeric(precision=18, scale=2), nullable=False, default=0
+    )
+
+
+class SchedulerFence(Base):
+    """Latest fencing token seen by the database per scheduled job."""
+
+    __tablename__ = "scheduler_fences"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    token: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime, server_default=func.now(), onupdate=func.now()
+    )
@@ -1,14 +1,37 @@
+import base64
 import json
+import time
+import uuid
 from datetime import datetime, timedelta
 from decimal import Decimal
+from typing import List, Optional, Tuple
 
+from app import event_timers
+from app.cache import event_cache
+from app.config import settings
+from app.errors import InvalidCursorError
 from app.models import Bet, BetStatus
-from app.operations.event import get_event
-from app.schemas import BetResponse, Event, EventState, PaginatedBetsHistory
+from app.operations.bet_stats import (
+    apply_bet_stats,
+    count_new_bets,
+    get_bets_total,
+    settle_bets,
+)
+from app.operations.event import get_events, merge_cached_event
+from app.operations.settlement import settle_event
+from app.scheduling import PENDING_BETS_SWEEP, check_fence, in_shard
+from app.schemas import (
+    BetCreate,
+    BetResponse,
+    CursorBetsHistory,
+    Event,
+    EventState,
+    PaginatedBetsHistory,
+)
 from app.utils import LoggerConfigurator
-from fastapi import HTTPException
 from redis.asyncio import Redis
-from sqlalchemy import func, update
+from sqlalchemy import String, and_, any_, bindparam, func, insert, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -22,23 +45,38 @@ async def create_bet(
 ) -> str:
     """Create a new bet."""
     async with session.begin():
-        new_bet = Bet(event_id=event_id, amount=amount)
-        session.add(new_bet)
-        await session.flush()
-        await session.refresh(new_bet)
+        # The generated id comes back with the insert, no extra round trip
+        query = insert(Bet).values(event_id=event_id, amount=amount).returning(Bet.id)
+        result = await session.execute(query)
+        bet_id = result.scalar_one()
+        await apply_bet_stats(count_new_bets([(event_id, amount)]), session)
 
-        if new_bet.id is None:
+        if bet_id is None:
             raise ValueError("Bet id is None after commit")
 
-        return str(new_bet.id)
+        return str(bet_id)
+
+
+async def create_bets(bets: List[BetCreate], session: AsyncSession) -> List[str]:
+    """Create many bets with a single multi-row insert, ids in input order."""
+    rows = [
+        {"id": uuid.uuid4(), "event_id": bet.event_id, "amount": bet.amount}
+        for bet in bets
+    ]
+    async with session.begin():
+        await session.execute(insert(Bet).values(rows))
+        await apply_bet_stats(
+            count_new_bets((bet.event_id, bet.amount) for bet in bets), session
+        )
+
+    return [str(row["id"]) for row in rows]
 
 
 async def get_bets(page: int, size: int, session: AsyncSession) -> PaginatedBetsHistory:
     """Get all bets."""
     async with session.begin():
-        query = select(func.count()).select_from(Bet)
-        result = await session.execute(query)
-        total = result.scalar_one()
+        # Read from the counters, counting the table costs a full scan
+        total = await get_bets_total(session)
 
         query = select(Bet.id, Bet.status)
         result = await session.execute(query.offset((page - 1) * size).limit(size))
@@ -50,84 +88,262 @@ async def get_bets(page: int, size: int, session: AsyncSession) -> PaginatedBets
         )
 
 
+def encode_cursor(created_at: datetime, bet_id: uuid.UUID) -> str:
+    """Opaque cursor pointing right after the given bet."""
+    position = json.dumps([created_at.isoformat(), str(bet_id)])
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        created_at, bet_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(created_at), uuid.UUID(bet_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+async def get_estimated_bets_count(session: AsyncSession) -> int:
+    """Planner estimate of the number of bets, without scanning the table."""
+    query = text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'bets'::regclass")
+    result = await session.execute(query)
+    # -1 until the table is vacuumed or analyzed for the first time
+    return max(result.scalar_one(), 0)
+
+
+async def get_bets_page(
+    size: int,
+    session: AsyncSession,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
+) -> CursorBetsHistory:
+    """Get bets ordered by creation, a page after the cursor.
+
+    Seeks through the (created_at, id) index, so every page costs the same.
+    `count` adds the "exact" total or the cheap "estimated" one.
+    """
+    async with session.begin():
+        query = select(Bet.id, Bet.status, Bet.created_at).order_by(
+            Bet.created_at, Bet.id
+        )
+        if cursor:
+            created_at, bet_id = decode_cursor(cursor)
+            query = query.where(
+                tuple_(Bet.created_at, Bet.id) > tuple_(created_at, bet_id)
+            )
+
+        # One extra row tells whether there is a next page
+        result = await session.execute(query.limit(size + 1))
+        rows = result.all()
+
+        total = None
+        if count == "exact":
+            result = await session.execute(select(func.count()).select_from(Bet))
+            total = result.scalar_one()
+        elif count == "estimated":
+            total = await get_estimated_bets_count(session)
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return CursorBetsHistory(
+        items=[BetResponse(id=row.id, status=row.status) for row in rows],
+        size=size,
+        next_cursor=next_cursor,
+        total=total,
+        total_is_estimate=count == "estimated",
+    )
+
+
+def coalesce_events(events: List[Event]) -> List[Event]:
+    """Merge updates of the same event into one, applying fields in order.
+
+    The result keeps the order in which events were first seen and only the
+    fields set by at least one of the updates.
+    """
+    merged: dict[str, dict] = {}
+    for event in events:
+        merged.setdefault(event.event_id, {}).update(
+            event.model_dump(exclude_unset=True)
+        )
+    return [Event(**event_data) for event_data in merged.values()]
+
+
+def get_settlement_status(event: Event) -> Optional[BetStatus]:
+    """Bet status implied by the event state, None if bets stay unplayed."""
+    if not event.state or event.state == EventState.NEW:
+        return None
+
+    return BetStatus.WON if event.state == EventState.FINISHED_WIN else BetStatus.LOST
+
+
 async def update_event_status(
     event: Event,
     session: AsyncSession,
     redis_client: Redis,
 ) -> dict[str, str]:
     """Update the status of an event for all bets on that event."""
-    # Update event in cache
-    # Try to get the event from cache
-    try:
-        cached_event = await redis_client.get(f"event:{event.event_id}")
-    except Exception as e:
-        logger.error(f"Failed to get event from cache: {e}")
-        cached_event = None
-
-    cached_event_data = json.loads(cached_event) if cached_event else {}
-    event_data = cached_event_data.copy()
-    for p_name, p_value in event.model_dump(exclude_unset=True).items():
-        event_data[p_name] = p_value
-
+    # Update event in cache, merged on the Redis side in one round trip
     try:
-        await redis_client.set(
-            f"event:{event.event_id}", Event(**event_data).model_dump_json()
-        )
+        merged_event = json.loads(await merge_cached_event(redis_client, event))
+        event_cache.set(event.event_id, merged_event)
+        event_timers.track_events([merged_event])
     except Exception as e:
+        event_cache.invalidate(event.event_id)
         logger.error(f"Failed to cache event: {event}, error: {e}")
 
     # Update all bets on that event
     if not event.state:
         return {"message": f"Event {event.event_id} has no changes for status"}
 
-    if event.state == EventState.NEW:
+    new_status = get_settlement_status(event)
+    if new_status is None:
         return {"message": f"Event {event.event_id} has no bets to update"}
 
-    new_status = (
-        BetStatus.WON if event.state == EventState.FINISHED_WIN else BetStatus.LOST
+    rowcount = await settle_event(
+        event_id=event.event_id, new_status=new_status, session=session
     )
 
-    async with session.begin():
-        query = (
-            update(Bet)
-            .where((Bet.event_id == event.event_id) & (Bet.status != new_status))
-            .values(status=new_status)
-        )
+    return {"message": f"Updated {rowcount} bets for event {event.event_id}"}
 
-        result = await session.execute(query)
 
-        if result.rowcount == 0:
-            logger.info(f"No bets found for event {event.event_id}")
+async def update_events_status(
+    events: List[Event],
+    session: AsyncSession,
+    redis_client: Redis,
+) -> List[dict[str, str]]:
+    """Apply a batch of event updates with one cache pipeline.
+
+    Updates of the same event are coalesced first, so each event gets one
+    cache write and at most one settlement. Cache errors are logged
+    like in `update_event_status`, database errors are raised so the caller
+    can redeliver the whole batch.
+    """
+    if not events:
+        return []
 
-        await session.commit()
+    received = len(events)
+    events = coalesce_events(events)
+    logger.debug(f"Coalesced {received} event updates into {len(events)}")
 
-    return {"message": f"Updated {result.rowcount} bets for event {event.event_id}"}
+    # Merge every event into the cache with one pipeline round trip
+    event_ids = [event.event_id for event in events]
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for event in events:
+                await merge_cached_event(pipe, event)
+            merged_events = await pipe.execute()
+        merged_events = [json.loads(merged_event) for merged_event in merged_events]
+        for event_id, merged_event in zip(event_ids, merged_events):
+            event_cache.set(event_id, merged_event)
+        event_timers.track_events(merged_events)
+    except Exception as e:
+        for event_id in event_ids:
+            event_cache.invalidate(event_id)
+        logger.error(f"Failed to cache events: {event_ids}, error: {e}")
 
+    # Settle the bets of finished events, each in short chunked transactions
+    responses: List[dict[str, str]] = []
+    for event in events:
+        new_status = get_settlement_status(event)
+        if new_status is None:
+            responses.append(
+                {"message": f"Event {event.event_id} has no bets to update"}
+            )
+            continue
 
-async def update_not_playyed_bets(session: AsyncSession, redis_client: Redis) -> None:
-    """Periodically update the status of not played bets."""
+        rowcount = await settle_event(
+            event_id=event.event_id, new_status=new_status, session=session
+        )
+        responses.append(
+            {"message": f"Updated {rowcount} bets for event {event.event_id}"}
+        )
+
+    return responses
+
+
+async def update_not_playyed_bets(
+    session: AsyncSession,
+    redis_client: Redis,
+    read_session: Optional[AsyncSession] = None,
+    fencing_token: Optional[int] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> dict:
+    """Periodically update the status of not played bets.
+
+    Works on events rather than bets: the distinct events of bets unplayed
+    for more than 24 hours are resolved in bulk, then the pending bets of
+    finished events are settled with set-based updates, in short
+    transactions of `settlement_chunk_size` events each. The scan for
+    stale bets runs on `read_session` when given. Returns how many bets
+    were settled and how long every chunk took.
+
+    With a `fencing_token` every chunk first checks the sweep lease is still
+    current, with a `shard` (index, count) only its share of events is
+    swept.
+    """
     logger.debug("Updating not played bets")
-    async with session.begin():
-        # Get all non played bets older than 24 hours
+    started = time.perf_counter()
+
+    # Bets a day old are long replicated, the scan can run on a replica
+    read_session = read_session or session
+    async with read_session.begin():
         cutoff_time = datetime.utcnow() - timedelta(hours=24)
-        query = select(Bet).where(
-            Bet.status == BetStatus.NOT_PLAYED, Bet.created_at < cutoff_time
+        query = (
+            select(Bet.event_id)
+            .where(Bet.status == BetStatus.NOT_PLAYED, Bet.created_at < cutoff_time)
+            .distinct()
         )
-        result = await session.execute(query)
-        not_playyed_bets = result.scalars().all()
-        logger.info(f"Found {len(not_playyed_bets)} not played bets")
-
-        for bet in not_playyed_bets:
-            try:
-                event_data = await get_event(bet.event_id, redis_client=redis_client)
-                if event_data["state"] != EventState.NEW:
-                    bet.status = (
-                        BetStatus.WON
-                        if event_data["state"] == EventState.FINISHED_WIN
-                        else BetStatus.LOST
-                    )
-            except HTTPException:
-                # If we can't fetch the event data, we'll skip this bet for now
-                continue
-
-        await session.commit()
+        result = await read_session.execute(query)
+        event_ids = result.scalars().all()
+    if shard is not None:
+        event_ids = [event_id for event_id in event_ids if in_shard(event_id, shard)]
+    logger.info(f"Found {len(event_ids)} events with not played bets")
+
+    # Events that couldn't be fetched are skipped for now
+    events = await get_events(event_ids, redis_client=redis_client)
+    finished: dict[BetStatus, List[str]] = {}
+    for event_id, event_data in events.items():
+        new_status = get_settlement_status(Event.model_validate(event_data))
+        if new_status is not None:
+            finished.setdefault(new_status, []).append(event_id)
+
+    settled = 0
+    chunks = []
+    chunk_size = settings.settlement_chunk_size
+    for new_status, status_event_ids in finished.items():
+        for start in range(0, len(status_event_ids), chunk_size):
+            chunk = status_event_ids[start : start + chunk_size]
+            chunk_started = time.perf_counter()
+            async with session.begin():
+                if fencing_token is not None:
+                    await check_fence(session, PENDING_BETS_SWEEP, fencing_token)
+                rowcount = await settle_bets(
+                    new_status=new_status,
+                    criteria=and_(
+                        Bet.event_id
+                        == any_(bindparam("event_ids", type_=ARRAY(String))),
+                        Bet.status == BetStatus.NOT_PLAYED,
+                    ),
+                    params={"event_ids": chunk},
+                    session=session,
+                )
+            duration = time.perf_counter() - chunk_started
+            settled += rowcount
+            chunks.append(
+                {"events": len(chunk), "bets": rowcount, "duration": duration}
+            )
+            logger.info(
+                f"Settled {rowcount} bets of {len(chunk)} events as "
+                f"{new_status.name} in {duration:.3f}s"
+            )
+
+    report = {
+        "events": len(event_ids),
+        "settled": settled,
+        "chunks": chunks,
+        "duration": time.perf_counter() - started,
+    }
+    logger.info(f"Settled {settled} bets in {report['duration']:.2f}s")
+    return report
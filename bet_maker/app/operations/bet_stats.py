@@ -0,0 +1,165 @@
+import random
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from app.config import settings
+from app.models import Bet, BetStats, BetStatus, EventBetStats
+from app.schemas import BetStatsSummary, EventExposure, StatusStats
+from app.utils import LoggerConfigurator
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+logger = LoggerConfigurator(name="bet-stats-operations").configure()
+
+# Change of the number and amount of bets, per event and status
+StatsDeltas = Dict[Tuple[str, BetStatus], Tuple[int, Decimal]]
+
+
+def count_new_bets(bets: Iterable[Tuple[str, Decimal]]) -> StatsDeltas:
+    """Deltas of inserting unplayed bets given as (event_id, amount)."""
+    deltas: StatsDeltas = {}
+    for event_id, amount in bets:
+        count, total = deltas.get((event_id, BetStatus.NOT_PLAYED), (0, Decimal(0)))
+        deltas[(event_id, BetStatus.NOT_PLAYED)] = (count + 1, total + amount)
+    return deltas
+
+
+async def apply_bet_stats(deltas: StatsDeltas, session: AsyncSession) -> None:
+    """Add the deltas to the bet counters, inside the caller's transaction."""
+    if not deltas:
+        return
+
+    shard = random.randrange(settings.bet_stats_shards)
+    totals: Dict[BetStatus, List] = defaultdict(lambda: [0, Decimal(0)])
+    # Sorted, so concurrent writers lock the rows in the same order
+    event_rows = []
+    for (event_id, status), (count, amount) in sorted(
+        deltas.items(), key=lambda item: (item[0][0], item[0][1].name)
+    ):
+        event_rows.append(
+            {
+                "event_id": event_id,
+                "status": status,
+                "shard": shard,
+                "bets": count,
+                "amount": amount,
+            }
+        )
+        totals[status][0] += count
+        totals[status][1] += amount
+
+    query = insert(EventBetStats).values(event_rows)
+    await session.execute(
+        query.on_conflict_do_update(
+            index_elements=["event_id", "status", "shard"],
+            set_={
+                "bets": EventBetStats.bets + query.excluded.bets,
+                "amount": EventBetStats.amount + query.excluded.amount,
+            },
+        )
+    )
+
+    query = insert(BetStats).values(
+        [
+            {"status": status, "shard": shard, "bets": count, "amount": amount}
+            for status, (count, amount) in sorted(
+                totals.items(), key=lambda item: item[0].name
+            )
+        ]
+    )
+    await session.execute(
+        query.on_conflict_do_update(
+            index_elements=["status", "shard"],
+            set_={
+                "bets": BetStats.bets + query.excluded.bets,
+                "amount": BetStats.amount + query.excluded.amount,
+            },
+        )
+    )
+
+
+async def settle_bets(
+    new_status: BetStatus, criteria, params: dict, session: AsyncSession
+) -> int:
+    """Set the status of the bets matching `criteria` and update the counters.
+
+    The bets are updated in one statement which also reports their previous
+    status, so the counters move from the old status to the new one. Runs
+    inside the caller's transaction, returns how many bets changed.
+    """
+    previous = (
+        select(Bet.id, Bet.status.label("old_status"))
+        .where(criteria, Bet.status != new_status)
+        .with_for_update()
+        .subquery("previous")
+    )
+    changed = (
+        update(Bet)
+        .where(Bet.id == previous.c.id)
+        .values(status=new_status)
+        .returning(Bet.event_id, previous.c.old_status, Bet.amount)
+        .cte("changed")
+    )
+    query = select(
+        changed.c.event_id,
+        changed.c.old_status,
+        func.count(),
+        func.sum(changed.c.amount),
+    ).group_by(changed.c.event_id, changed.c.old_status)
+    result = await session.execute(query, params)
+
+    settled = 0
+    deltas: StatsDeltas = {}
+    for event_id, old_status, count, amount in result.all():
+        settled += count
+        for status, sign in ((old_status, -1), (new_status, 1)):
+            bets, total = deltas.get((event_id, status), (0, Decimal(0)))
+            deltas[(event_id, status)] = (bets + sign * count, total + sign * amount)
+    await apply_bet_stats(deltas, session)
+    return settled
+
+
+def summarize(rows) -> Dict:
+    by_status = {
+        status: StatusStats(bets=bets, amount=amount) for status, bets, amount in rows
+    }
+    return {
+        "bets": sum(stats.bets for stats in by_status.values()),
+        "amount": sum((stats.amount for stats in by_status.values()), Decimal(0)),
+        "by_status": by_status,
+    }
+
+
+async def get_event_exposure(event_id: str, session: AsyncSession) -> EventExposure:
+    """Bets and staked amount on an event per status, from the counters."""
+    async with session.begin():
+        query = (
+            select(
+                EventBetStats.status,
+                func.sum(EventBetStats.bets),
+                func.sum(EventBetStats.amount),
+            )
+            .where(EventBetStats.event_id == event_id)
+            .group_by(EventBetStats.status)
+        )
+        result = await session.execute(query)
+        return EventExposure(event_id=event_id, **summarize(result.all()))
+
+
+async def get_bet_stats(session: AsyncSession) -> BetStatsSummary:
+    """Bets and staked amount per status, from the counters."""
+    async with session.begin():
+        query = select(
+            BetStats.status, func.sum(BetStats.bets), func.sum(BetStats.amount)
+        ).group_by(BetStats.status)
+        result = await session.execute(query)
+        return BetStatsSummary(**summarize(result.all()))
+
+
+async def get_bets_total(session: AsyncSession) -> int:
+    """Number of bets, inside the caller's transaction."""
+    result = await session.execute(select(func.coalesce(func.sum(BetStats.bets), 0)))
+    return int(result.scalar_one())
@@ -1,80 +1,449 @@
+import asyncio
 import json
 import time
-from typing import List
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Union
 
 import httpx
+from app import event_timers
+from app.cache import event_cache, event_fetches
 from app.config import settings
+from app.errors import LineProviderUnavailableError
+from app.http_client import get_line_provider_client
+from app.schemas import Event
 from app.utils import LoggerConfigurator
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 
 logger = LoggerConfigurator(name="event-operations").configure()
 
+# Sorted set of event ids scored by deadline, used to list upcoming events
+EVENTS_BY_DEADLINE = "events:by_deadline"
+
+# Delete a lock only if it's still held with our token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+# Merge a partial event into the cached one in a single atomic step: fields set
+# in the update (ARGV[1]) overwrite the cached ones, the deadline index is kept
+# in sync and the merged event is returned. The key expires like in
+# `get_event_ttl`, from the current time (ARGV[2]) and the retention (ARGV[3]),
+# and keeps its TTL when the event has no deadline
+MERGE_EVENT_SCRIPT = """
+local event = {}
+local cached = redis.call("get", KEYS[1])
+if cached then
+    event = cjson.decode(cached)
+end
+for name, value in pairs(cjson.decode(ARGV[1])) do
+    event[name] = value
+end
+local merged = cjson.encode(event)
+if type(event["deadline"]) == "number" then
+    local ttl = math.floor(event["deadline"] - ARGV[2] + ARGV[3])
+    redis.call("set", KEYS[1], merged, "EX", math.max(ttl, 1))
+    redis.call("zadd", KEYS[2], event["deadline"], event["event_id"])
+else
+    redis.call("set", KEYS[1], merged, "KEEPTTL")
+end
+return merged
+"""
+
+
+async def merge_cached_event(redis_client: Union[Redis, Pipeline], event: Event):
+    """Atomically merge a partial event into its cached version.
+
+    Returns the merged event JSON, or queues the merge when given a pipeline.
+    """
+    merge_script = redis_client.register_script(MERGE_EVENT_SCRIPT)
+    return await merge_script(
+        keys=[f"event:{event.event_id}", EVENTS_BY_DEADLINE],
+        args=[
+            event.model_dump_json(exclude_unset=True),
+            int(time.time()),
+            settings.event_cache_retention,
+        ],
+        client=redis_client,
+    )
+
+
+# Outcome of the last startup warm-up, exposed for monitoring
+last_warmup: dict[str, Any] = {}
+
+# Hash with the epoch and version of the last applied Line Provider change
+EVENTS_SYNC_KEY = "events:sync"
+
+
+def get_event_ttl(deadline: Optional[int]) -> Optional[int]:
+    """Seconds to keep a cached event: until its deadline plus the retention."""
+    if deadline is None:
+        return None
+    return max(deadline - int(time.time()) + settings.event_cache_retention, 1)
+
+
+def cache_event(
+    pipe: Pipeline,
+    event_id: str,
+    event_json: str,
+    deadline: Optional[int],
+    ttl: Optional[int] = None,
+) -> None:
+    """Queue the cache write of an event and its deadline index entry."""
+    pipe.set(f"event:{event_id}", event_json, ex=ttl)
+    if deadline is not None:
+        pipe.zadd(EVENTS_BY_DEADLINE, {event_id: deadline})
+
 
 async def get_event(event_id: str, redis_client: Redis) -> dict:
     logger.debug(f"get_event is called with event_id: {event_id}")
 
-    # Try to get the event from cache
+    # Try the in-process cache first, then Redis
+    event_data = event_cache.get(event_id)
+    if event_data is not None:
+        return event_data
+
     try:
         cached_event = await redis_client.get(f"event:{event_id}")
     except Exception as e:
         logger.error(f"Failed to get event from cache: {e}")
         cached_event = None
     if cached_event:
-        return json.loads(cached_event)
+        event_data = json.loads(cached_event)
+        event_cache.set(event_id, event_data)
+        return event_data
+
+    # If not in cache, get from Line Provider service, once per event at a time
+    return await event_fetches.do(
+        event_id, lambda: fetch_event(event_id=event_id, redis_client=redis_client)
+    )
+
+
+async def get_events(
+    event_ids: Iterable[str], redis_client: Redis, raise_errors: bool = False
+) -> Dict[str, dict]:
+    """Look many events up at once, keyed by event id.
 
-    # If not in cache, get from Line Provider service
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{settings.line_provider_url}/events/{event_id}")
+    Served from the in-process cache and a single Redis MGET where possible,
+    only the misses are requested from Line Provider service, in batches of
+    `line_provider_batch_size`. Unknown events are missing from the result,
+    and so are events that couldn't be fetched unless `raise_errors` is set,
+    then the upstream error is raised.
+    """
+    found: Dict[str, dict] = {}
+    missing: List[str] = []
+    for event_id in dict.fromkeys(event_ids):
+        event_data = event_cache.get(event_id)
+        if event_data is not None:
+            found[event_id] = event_data
+        else:
+            missing.append(event_id)
+
+    if missing:
+        try:
+            cached_events = await redis_client.mget([f"event:{i}" for i in missing])
+        except Exception as e:
+            logger.error(f"Failed to get events from cache: {e}")
+            cached_events = [None] * len(missing)
+
+        not_cached = []
+        for event_id, cached_event in zip(missing, cached_events):
+            if cached_event:
+                found[event_id] = json.loads(cached_event)
+                event_cache.set(event_id, found[event_id])
+            else:
+                not_cached.append(event_id)
+        missing = not_cached
+
+    client = get_line_provider_client()
+    for start in range(0, len(missing), settings.line_provider_batch_size):
+        chunk = missing[start : start + settings.line_provider_batch_size]
+        try:
+            response = await client.post("/events/batch", json={"event_ids": chunk})
+            response.raise_for_status()
+        except (httpx.HTTPError, LineProviderUnavailableError) as e:
+            logger.error(f"Failed to fetch {len(chunk)} events: {e}")
+            if raise_errors:
+                raise
+            break
+
+        events: List[dict] = response.json()
+        for event_data in events:
+            found[event_data["event_id"]] = event_data
+            event_cache.set(event_data["event_id"], event_data)
+        await cache_events(events=events, redis_client=redis_client)
+
+    return found
+
+
+async def fetch_event(event_id: str, redis_client: Redis) -> dict:
+    """Fetch an event from Line Provider service and cache it.
+
+    With the fetch lock enabled only the instance holding the short lock on
+    the event goes upstream, the others wait for it to fill the cache.
+    """
+    lock_key = f"lock:event:{event_id}"
+    lock_token = uuid.uuid4().hex
+    locked = False
+    if settings.event_fetch_lock:
+        try:
+            locked = bool(
+                await redis_client.set(
+                    lock_key,
+                    lock_token,
+                    nx=True,
+                    px=int(settings.event_fetch_lock_ttl * 1000),
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to lock event fetch: {e}")
+        else:
+            if not locked:
+                event_data = await wait_for_cached_event(event_id, redis_client)
+                if event_data is not None:
+                    return event_data
+
+    try:
+        client = get_line_provider_client()
+        response = await client.get(f"/events/{event_id}")
         response.raise_for_status()
         event_data = response.json()
 
         # Cache the event
+        event_cache.set(event_id, event_data)
         try:
-            await redis_client.set(f"event:{event_id}", json.dumps(event_data))
+            async with redis_client.pipeline(transaction=False) as pipe:
+                deadline = event_data.get("deadline")
+                cache_event(
+                    pipe,
+                    event_id,
+                    json.dumps(event_data),
+                    deadline,
+                    ttl=get_event_ttl(deadline),
+                )
+                await pipe.execute()
         except Exception as e:
             logger.error(f"Failed to cache event: {event_data}, error: {e}")
 
         return event_data
+    finally:
+        if locked:
+            try:
+                await redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, lock_token)
+            except Exception as e:
+                logger.error(f"Failed to release event fetch lock: {e}")
+
+
+async def wait_for_cached_event(event_id: str, redis_client: Redis) -> Optional[dict]:
+    """Poll Redis for an event another instance is fetching.
+
+    Returns None on timeout, or as soon as the lock is released without the
+    event cached, when the holder's fetch failed, so the caller fetches it
+    itself right away.
+    """
+    deadline = time.monotonic() + settings.event_fetch_lock_ttl
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.event_fetch_lock_poll_interval)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(f"event:{event_id}")
+                pipe.exists(f"lock:event:{event_id}")
+                cached_event, locked = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to get event from cache: {e}")
+            return None
+        if cached_event:
+            event_data = json.loads(cached_event)
+            event_cache.set(event_id, event_data)
+            return event_data
+        if not locked:
+            return None
+    return None
 
 
 async def get_available_events(redis_client: Redis) -> int:
-    async with httpx.AsyncClient() as client:
-        logger.info("Fetching events from Line Provider service")
-        logger.debug(f"URL: {settings.line_provider_url}/events")
-        events: List[dict] = []
+    """Warm the cache up with the available events of Line Provider service.
+
+    Events are fetched page by page and written in chunked pipelines, every
+    key expiring some time after the event deadline.
+    """
+    started = time.perf_counter()
+    loaded = 0
+    offset = 0
+    client = get_line_provider_client()
+    logger.info("Fetching events from Line Provider service")
+    logger.debug(f"URL: {settings.line_provider_url}/events")
+    complete = False
+    while True:
         try:
-            response = await client.get(f"{settings.line_provider_url}/events")
+            response = await client.get(
+                "/events",
+                params={"offset": offset, "limit": settings.warmup_page_size},
+                # A page can take longer than a single event lookup
+                timeout=settings.line_provider_timeout * 5,
+            )
             response.raise_for_status()
-        except (httpx.ConnectError, httpx.HTTPStatusError):
-            logger.error("Failed to fetch events from Line Provider service")
-        else:
-            events = response.json()
+        except (httpx.HTTPError, LineProviderUnavailableError) as e:
+            logger.error(f"Failed to fetch events from Line Provider service: {e}")
+            break
+
+        events: List[dict] = response.json()
+        loaded += await cache_events(events=events, redis_client=redis_client)
+
+        # Without a total the service returned everything in one response
+        offset += len(events)
+        total = response.headers.get("X-Total-Count")
+        if not events or total is None or offset >= int(total):
+            complete = True
+            break
+
+    duration = time.perf_counter() - started
+    last_warmup.update(
+        {"events": loaded, "duration": duration, "mode": "full", "complete": complete}
+    )
+    logger.info(f"Warmed up {loaded} events in {duration:.2f}s")
+    return loaded
+
+
+async def sync_events(redis_client: Redis) -> int:
+    """Catch the cache up with the changes of Line Provider service.
+
+    Applies the changes after the version stored in Redis page by page,
+    storing the new version after every page, so recovery costs as much as
+    the number of missed changes. Falls back to the full warm-up when no
+    version is stored, when Line Provider versions restarted (another epoch)
+    or when the change feed isn't available. Returns the events applied.
+    """
+    started = time.perf_counter()
+    try:
+        position = await redis_client.hgetall(EVENTS_SYNC_KEY)
+    except Exception as e:
+        logger.error(f"Failed to read the events sync position: {e}")
+        position = {}
+    epoch = position.get("epoch")
+    since = int(position.get("version", 0))
+
+    client = get_line_provider_client()
+    applied = 0
+    while True:
+        try:
+            response = await client.get(
+                "/events/changes",
+                params={"since": since, "limit": settings.warmup_page_size},
+                timeout=settings.line_provider_timeout * 5,
+            )
+            response.raise_for_status()
+        except (httpx.HTTPError, LineProviderUnavailableError) as e:
+            logger.error(f"Failed to fetch event changes: {e}")
+            if applied:
+                break
+            return await get_available_events(redis_client=redis_client)
+
+        changes = response.json()
+        if changes["epoch"] != epoch:
+            logger.info("No events sync position for this epoch, full warm-up")
+            # Changes made during the warm-up are applied again next time
+            loaded = await get_available_events(redis_client=redis_client)
+            if last_warmup.get("complete"):
+                await save_sync_position(
+                    redis_client, epoch=changes["epoch"], version=changes["latest"]
+                )
+            return loaded
 
+        events: List[dict] = changes["events"]
         for event in events:
-            event_id = event.get("event_id")
-            if not event_id:
-                logger.info(f"Skipping event with no ID: {event}")
-                continue
+            event_cache.invalidate(event["event_id"])
+        applied += await cache_events(events=events, redis_client=redis_client)
 
-            # Cache the event
-            try:
-                await redis_client.set(f"event:{event_id}", json.dumps(event))
-            except Exception as e:
-                logger.error(f"Failed to cache event: {event}, error: {e}")
+        since = changes["version"]
+        await save_sync_position(redis_client, epoch=epoch, version=since)
+        if not changes["has_more"]:
+            break
+
+    duration = time.perf_counter() - started
+    last_warmup.update({"events": applied, "duration": duration, "mode": "incremental"})
+    logger.info(f"Applied {applied} event changes up to version {since}")
+    return applied
+
+
+async def save_sync_position(redis_client: Redis, epoch: str, version: int) -> None:
+    try:
+        await redis_client.hset(
+            EVENTS_SYNC_KEY, mapping={"epoch": epoch, "version": version}
+        )
+    except Exception as e:
+        logger.error(f"Failed to save the events sync position: {e}")
 
-    return len(events)
 
+async def cache_events(events: List[dict], redis_client: Redis) -> int:
+    """Cache events in pipelines of `warmup_chunk_size`, return how many."""
+    cached = 0
+    for start in range(0, len(events), settings.warmup_chunk_size):
+        chunk = [
+            event
+            for event in events[start : start + settings.warmup_chunk_size]
+            if event.get("event_id")
+        ]
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for event in chunk:
+                    deadline = event.get("deadline")
+                    cache_event(
+                        pipe,
+                        event["event_id"],
+                        json.dumps(event),
+                        deadline,
+                        ttl=get_event_ttl(deadline),
+                    )
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to cache {len(chunk)} events, error: {e}")
+        else:
+            cached += len(chunk)
+            event_timers.track_events(chunk)
 
-async def get_upcoming_events(redis_client: Redis) -> list[dict]:
+    skipped = len(events) - cached
+    if skipped:
+        logger.info(f"Skipped {skipped} events without ID or failed to cache")
+    return cached
+
+
+async def get_upcoming_events(
+    redis_client: Redis, limit: Optional[int] = None, offset: int = 0
+) -> list[dict]:
+    """Events with a deadline in the future, ordered by deadline."""
     current_time = int(time.time())
-    upcoming_events = []
 
-    async for key in redis_client.scan_iter("event:*"):
-        event_data = await redis_client.get(key)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        # Prune the index lazily, past events are never listed again
+        pipe.zremrangebyscore(EVENTS_BY_DEADLINE, "-inf", current_time)
+        pipe.zrangebyscore(
+            EVENTS_BY_DEADLINE,
+            f"({current_time}",
+            "+inf",
+            start=offset,
+            num=limit if limit is not None else -1,
+        )
+        _, event_ids = await pipe.execute()
+
+    if not event_ids:
+        return []
+
+    cached_events = await redis_client.mget([f"event:{i}" for i in event_ids])
+
+    upcoming_events = []
+    missing_event_ids = []
+    for event_id, event_data in zip(event_ids, cached_events):
         if event_data:
-            event = json.loads(event_data)
-            logger.debug(f"event: {event}")
-            if event["deadline"] > current_time:
-                upcoming_events.append(event)
+            upcoming_events.append(json.loads(event_data))
+        else:
+            missing_event_ids.append(event_id)
+
+    if missing_event_ids:
+        await redis_client.zrem(EVENTS_BY_DEADLINE, *missing_event_ids)
 
     return upcoming_events
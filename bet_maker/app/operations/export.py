@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+from app.models import Bet, BetStatus
+from app.replica import get_read_sessionmaker
+from app.utils import LoggerConfigurator
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy.future import select
+
+logger = LoggerConfigurator(name="export-operations").configure()
+
+EXPORT_COLUMNS = ["id", "event_id", "amount", "status", "created_at", "updated_at"]
+
+
+def build_export_query(
+    status: Optional[BetStatus] = None,
+    event_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    query = select(
+        Bet.id, Bet.event_id, Bet.amount, Bet.status, Bet.created_at, Bet.updated_at
+    ).order_by(Bet.created_at, Bet.id)
+    if status is not None:
+        query = query.where(Bet.status == status)
+    if event_id is not None:
+        query = query.where(Bet.event_id == event_id)
+    if created_from is not None:
+        query = query.where(Bet.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Bet.created_at < created_to)
+    return query
+
+
+def format_row(row) -> dict:
+    return {
+        "id": str(row.id),
+        "event_id": row.event_id,
+        "amount": str(row.amount),
+        "status": row.status.value,
+        "created_at": row.created_at.isoformat(),
+        "updated_at": row.updated_at.isoformat(),
+    }
+
+
+def to_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(format_row(row), ensure_ascii=False) + "\n" for row in rows
+    )
+
+
+def to_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    if header:
+        writer.writeheader()
+    writer.writerows(format_row(row) for row in rows)
+    return buffer.getvalue()
+
+
+async def export_bets(
+    export_format: str,
+    status: Optional[BetStatus] = None,
+    event_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> AsyncIterator[str]:
+    """Start streaming matching bets as NDJSON or CSV, ordered by creation.
+
+    The session is opened and the query started before this returns, so a
+    failure to read surfaces before the response does. Rows are then read
+    through a server-side cursor `export_batch_size` at a time and every
+    batch is written out before the next is fetched, so memory stays flat
+    however many bets match. The session lives as long as the stream,
+    outside of the request dependencies.
+    """
+    query = build_export_query(
+        status=status,
+        event_id=event_id,
+        created_from=created_from,
+        created_to=created_to,
+    ).execution_options(yield_per=settings.export_batch_size)
+
+    session_factory = await get_read_sessionmaker()
+    session = session_factory()
+    try:
+        result = await session.stream(query)
+    except BaseException:
+        await session.close()
+        raise
+    return stream_bets(export_format, session, result)
+
+
+async def stream_bets(
+    export_format: str, session: AsyncSession, result: AsyncResult
+) -> AsyncIterator[str]:
+    exported = 0
+    try:
+        if export_format == "csv":
+            yield to_csv([], header=True)
+
+        async for rows in result.partitions():
+            exported += len(rows)
+            yield to_csv(rows) if export_format == "csv" else to_ndjson(rows)
+    finally:
+        await session.close()
+
+    logger.info(f"Exported {exported} bets")
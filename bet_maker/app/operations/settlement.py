@@ -0,0 +1,209 @@
+import uuid
+from datetime import timedelta
+from typing import List, Optional
+
+from app.config import settings
+from app.models import Bet, BetStatus, Settlement, SettlementState
+from app.operations.bet_stats import settle_bets
+from app.scheduling import INSTANCE_ID
+from app.schemas import SettlementProgress
+from app.utils import LoggerConfigurator
+from sqlalchemy import any_, bindparam, func, or_, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+logger = LoggerConfigurator(name="settlement-operations").configure()
+
+
+async def start_settlement(
+    event_id: str, new_status: BetStatus, session: AsyncSession, owner: str
+) -> Optional[Settlement]:
+    """Record the start of a settlement and claim it for `owner`.
+
+    Returns None when the event was already settled to this status, or while
+    another owner holds an unexpired claim on it. A changed result is
+    claimed regardless, the previous owner stops at its next chunk.
+    """
+    async with session.begin():
+        await session.execute(
+            insert(Settlement)
+            .values(
+                event_id=event_id,
+                status=new_status,
+                state=SettlementState.RUNNING,
+                settled=0,
+                chunks=0,
+            )
+            .on_conflict_do_nothing(index_elements=[Settlement.event_id])
+        )
+        query = (
+            select(Settlement).where(Settlement.event_id == event_id).with_for_update()
+        )
+        result = await session.execute(query)
+        settlement = result.scalar_one()
+
+        claim = (
+            update(Settlement)
+            .where(Settlement.event_id == event_id)
+            .values(owner=owner, lease_until=get_lease_until())
+        )
+        if settlement.status != new_status:
+            # The result changed, settle every bet again
+            claim = claim.values(
+                status=new_status,
+                state=SettlementState.RUNNING,
+                last_bet_id=None,
+                settled=0,
+                chunks=0,
+                started_at=func.now(),
+                finished_at=None,
+            )
+        elif settlement.state == SettlementState.DONE:
+            return None
+        else:
+            claim = claim.where(
+                or_(
+                    Settlement.owner.is_(None),
+                    Settlement.owner == owner,
+                    Settlement.lease_until < func.now(),
+                )
+            )
+        result = await session.execute(claim.returning(Settlement.event_id))
+        if result.scalar_one_or_none() is None:
+            return None
+
+        result = await session.execute(query.execution_options(populate_existing=True))
+        return result.scalar_one()
+
+
+def get_lease_until():
+    """Expiry of a settlement claim, renewed with every chunk"""
+    return func.now() + timedelta(seconds=settings.settlement_stale_after)
+
+
+async def settle_event(
+    event_id: str, new_status: BetStatus, session: AsyncSession
+) -> int:
+    """Settle the bets of a finished event in chunks, return how many changed.
+
+    Bets are walked in id order, `settlement_batch_size` at a time, each chunk
+    updated together with its recorded progress in its own short transaction,
+    so row locks are held briefly and an interrupted settlement resumes after
+    the last settled chunk. Only the claimed owner of the settlement writes
+    chunks, concurrent callers for the same event return 0.
+    """
+    owner = f"{INSTANCE_ID}:{uuid.uuid4().hex[:8]}"
+    settlement = await start_settlement(event_id, new_status, session, owner=owner)
+    if settlement is None:
+        logger.info(f"Bets of event {event_id} are settled or being settled")
+        return 0
+
+    last_bet_id = settlement.last_bet_id
+    batch_size = settings.settlement_batch_size
+    settled = 0
+    while True:
+        async with session.begin():
+            # Renews the claim, and locks it until the chunk commits
+            result = await session.execute(
+                update(Settlement)
+                .where(Settlement.event_id == event_id, Settlement.owner == owner)
+                .values(lease_until=get_lease_until())
+                .returning(Settlement.event_id)
+            )
+            if result.scalar_one_or_none() is None:
+                logger.warning(f"Settlement of event {event_id} was taken over")
+                break
+
+            query = select(Bet.id).where(Bet.event_id == event_id)
+            if last_bet_id is not None:
+                query = query.where(Bet.id > last_bet_id)
+            result = await session.execute(query.order_by(Bet.id).limit(batch_size))
+            bet_ids = result.scalars().all()
+
+            rowcount = 0
+            if bet_ids:
+                rowcount = await settle_bets(
+                    new_status=new_status,
+                    criteria=Bet.id == any_(bindparam("bet_ids", type_=ARRAY(UUID))),
+                    params={"bet_ids": bet_ids},
+                    session=session,
+                )
+                last_bet_id = bet_ids[-1]
+
+            done = len(bet_ids) < batch_size
+            progress = {
+                "last_bet_id": last_bet_id,
+                "settled": Settlement.settled + rowcount,
+                "chunks": Settlement.chunks + 1,
+                "state": SettlementState.RUNNING,
+            }
+            if done:
+                progress.update(
+                    state=SettlementState.DONE,
+                    finished_at=func.now(),
+                    owner=None,
+                    lease_until=None,
+                )
+            await session.execute(
+                update(Settlement)
+                .where(Settlement.event_id == event_id)
+                .values(**progress)
+            )
+        settled += rowcount
+        if done:
+            break
+
+    logger.info(f"Settled {settled} bets of event {event_id} as {new_status.name}")
+    return settled
+
+
+async def get_settlement(
+    event_id: str, session: AsyncSession
+) -> Optional[SettlementProgress]:
+    """Progress of the settlement of an event, None if it never started."""
+    async with session.begin():
+        result = await session.execute(
+            select(Settlement).where(Settlement.event_id == event_id)
+        )
+        settlement = result.scalar_one_or_none()
+        if settlement is None:
+            return None
+
+        query = select(func.count()).where(
+            Bet.event_id == event_id, Bet.status != settlement.status
+        )
+        result = await session.execute(query)
+        remaining = result.scalar_one()
+
+    return SettlementProgress(
+        event_id=settlement.event_id,
+        status=settlement.status,
+        state=settlement.state.value,
+        settled=settlement.settled,
+        remaining=remaining,
+        chunks=settlement.chunks,
+        started_at=settlement.started_at,
+        updated_at=settlement.updated_at,
+        finished_at=settlement.finished_at,
+    )
+
+
+async def resume_settlements(session: AsyncSession) -> List[str]:
+    """Finish the settlements whose claim expired, e.g. on a crash."""
+    async with session.begin():
+        result = await session.execute(
+            select(Settlement.event_id, Settlement.status).where(
+                Settlement.state == SettlementState.RUNNING,
+                or_(
+                    Settlement.lease_until.is_(None),
+                    Settlement.lease_until < func.now(),
+                ),
+            )
+        )
+        stalled = result.all()
+
+    for event_id, status in stalled:
+        logger.info(f"Resuming settlement of event {event_id}")
+        await settle_event(event_id=event_id, new_status=status, session=session)
+    return [event_id for event_id, _ in stalled]
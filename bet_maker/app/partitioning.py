@@ -0,0 +1,239 @@
+"""Optional range partitioning of `bets` by `created_at`, one partition a month.
+
+Convert the table once, with the service stopped:
+
+    python -m app.partitioning convert
+
+The existing rows are moved from the DEFAULT partition into monthly
+partitions, a month per transaction, so retention applies to them too. New
+bets go to monthly partitions, which `maintain_bets_partitions` creates
+ahead of time and drops after the retention period when BETS_PARTITIONING is
+enabled.
+"""
+
+import asyncio
+import re
+import sys
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+
+from app.database import AsyncSessionLocal
+from app.models import BetStatus
+from app.operations.bet_stats import StatsDeltas, apply_bet_stats
+from app.utils import LoggerConfigurator
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = LoggerConfigurator(name="partitioning").configure()
+
+PARTITION_NAME = re.compile(r"^bets_p(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "bets_default"
+
+# Swap the plain table for a partitioned one, keeping its rows in the DEFAULT
+# partition. Index and constraint names move to the new parent, which needs
+# created_at in its primary key
+CONVERT_STATEMENTS = [
+    f"ALTER TABLE bets RENAME TO {DEFAULT_PARTITION}",
+    f"ALTER TABLE {DEFAULT_PARTITION} RENAME CONSTRAINT bets_pkey"
+    f" TO {DEFAULT_PARTITION}_pkey",
+    f"ALTER INDEX ix_bets_created_at_id RENAME TO {DEFAULT_PARTITION}_created_at_id",
+    f"ALTER INDEX ix_bets_not_played_created_at"
+    f" RENAME TO {DEFAULT_PARTITION}_not_played_created_at",
+    f"ALTER INDEX ix_bets_event_id_id RENAME TO {DEFAULT_PARTITION}_event_id_id",
+    f"CREATE TABLE bets (LIKE {DEFAULT_PARTITION} INCLUDING DEFAULTS)"
+    " PARTITION BY RANGE (created_at)",
+    "ALTER TABLE bets ADD CONSTRAINT bets_pkey PRIMARY KEY (id, created_at)",
+    "CREATE INDEX ix_bets_created_at_id ON bets (created_at, id)",
+    "CREATE INDEX ix_bets_event_id_id ON bets (event_id, id)",
+    "CREATE INDEX ix_bets_not_played_created_at ON bets (created_at)"
+    " WHERE status = 'NOT_PLAYED'",
+    f"ALTER TABLE bets ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT",
+]
+
+
+def add_months(day: date, months: int) -> date:
+    """First day of the month `months` after the month of `day`."""
+    year, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + year, month + 1, 1)
+
+
+def partition_name(start: date) -> str:
+    return f"bets_p{start:%Y_%m}"
+
+
+async def is_partitioned(session: AsyncSession) -> bool:
+    query = text(
+        "SELECT EXISTS ("
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'bets'::regclass)"
+    )
+    result = await session.execute(query)
+    return bool(result.scalar_one())
+
+
+async def list_partitions(session: AsyncSession) -> List[str]:
+    query = text(
+        "SELECT child.relname FROM pg_inherits"
+        " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+        " WHERE pg_inherits.inhparent = 'bets'::regclass"
+    )
+    result = await session.execute(query)
+    return list(result.scalars().all())
+
+
+async def convert_to_partitioned(session: AsyncSession) -> None:
+    """Turn `bets` into a partitioned table and split its rows by month.
+
+    The conversion is one transaction, then every month found in the DEFAULT
+    partition is moved to its own partition in a transaction of its own, so
+    an interrupted run is completed by running it again.
+    """
+    async with session.begin():
+        if await is_partitioned(session):
+            logger.info("bets is already partitioned")
+        else:
+            for statement in CONVERT_STATEMENTS:
+                await session.execute(text(statement))
+            logger.info("Converted bets to a partitioned table")
+
+        result = await session.execute(
+            text(
+                "SELECT DISTINCT date_trunc('month', created_at)::date"
+                f" FROM {DEFAULT_PARTITION} ORDER BY 1"
+            )
+        )
+        months = list(result.scalars().all())
+
+    for start in months:
+        await split_default_partition(session, start)
+
+
+async def has_default_rows(session: AsyncSession, start: date) -> bool:
+    query = text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION}"
+        f" WHERE created_at >= '{start}' AND created_at < '{add_months(start, 1)}')"
+    )
+    result = await session.execute(query)
+    return bool(result.scalar_one())
+
+
+async def split_default_partition(session: AsyncSession, start: date) -> None:
+    """Create the partition of a month out of its rows in the DEFAULT one.
+
+    Postgres refuses a partition whose rows sit in the DEFAULT partition, so
+    the DEFAULT partition is detached while the rows move, in one
+    transaction which blocks writes to `bets` until it commits.
+    """
+    name = partition_name(start)
+    end = add_months(start, 1)
+    month = f"created_at >= '{start}' AND created_at < '{end}'"
+    async with session.begin():
+        await session.execute(
+            text(f"ALTER TABLE bets DETACH PARTITION {DEFAULT_PARTITION}")
+        )
+        await session.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF bets"
+                f" FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+        )
+        result = await session.execute(
+            text(f"INSERT INTO bets SELECT * FROM {DEFAULT_PARTITION} WHERE {month}")
+        )
+        await session.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {month}"))
+        await session.execute(
+            text(f"ALTER TABLE bets ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+        )
+    logger.info(f"Moved {result.rowcount} bets to partition {name}")
+
+
+async def ensure_partitions(
+    session: AsyncSession, months_ahead: int, today: Optional[date] = None
+) -> List[str]:
+    """Create the partitions of this month and `months_ahead` next ones."""
+    async with session.begin():
+        if not await is_partitioned(session):
+            return []
+        existing = set(await list_partitions(session))
+
+    first = add_months(today or date.today(), 0)
+    created = []
+    for months in range(months_ahead + 1):
+        start = add_months(first, months)
+        name = partition_name(start)
+        if name in existing:
+            continue
+
+        try:
+            async with session.begin():
+                default_rows = await has_default_rows(session, start)
+                if not default_rows:
+                    await session.execute(
+                        text(
+                            f"CREATE TABLE {name} PARTITION OF bets FOR VALUES"
+                            f" FROM ('{start}') TO ('{add_months(start, 1)}')"
+                        )
+                    )
+            # Bets of the month went to the DEFAULT partition meanwhile
+            if default_rows:
+                await split_default_partition(session, start)
+        except Exception as e:
+            logger.error(f"Failed to create partition {name}: {e}")
+        else:
+            created.append(name)
+            logger.info(f"Created partition {name}")
+    return created
+
+
+async def drop_expired_partitions(
+    session: AsyncSession, retention_months: int, today: Optional[date] = None
+) -> List[str]:
+    """Drop the monthly partitions older than `retention_months` months.
+
+    Whole partitions are dropped, bets included, no matter their status. The
+    bets of a partition are taken off the counters in the transaction which
+    drops it, once it is detached and takes no more writes.
+    """
+    async with session.begin():
+        if not await is_partitioned(session):
+            return []
+        partitions = await list_partitions(session)
+
+    cutoff = add_months(today or date.today(), -retention_months)
+    dropped = []
+    for name in sorted(partitions):
+        match = PARTITION_NAME.match(name)
+        if not match:
+            continue
+        start = date(int(match.group(1)), int(match.group(2)), 1)
+        if add_months(start, 1) > cutoff:
+            continue
+
+        async with session.begin():
+            await session.execute(text(f"ALTER TABLE bets DETACH PARTITION {name}"))
+            result = await session.execute(
+                text(
+                    "SELECT event_id, status, count(*), coalesce(sum(amount), 0)"
+                    f" FROM {name} GROUP BY event_id, status"
+                )
+            )
+            deltas: StatsDeltas = {
+                (event_id, BetStatus[status]): (-count, -Decimal(amount))
+                for event_id, status, count, amount in result.all()
+            }
+            await apply_bet_stats(deltas, session)
+            await session.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+        logger.info(f"Dropped partition {name}")
+    return dropped
+
+
+async def main() -> None:
+    async with AsyncSessionLocal() as session:
+        await convert_to_partitioned(session)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["convert"]:
+        raise SystemExit("Usage: python -m app.partitioning convert")
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.config import settings
+from app.utils import LoggerConfigurator
+from redis.asyncio import BlockingConnectionPool
+from redis.exceptions import ConnectionError, TimeoutError
+
+logger = LoggerConfigurator(name="redis-pool").configure()
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """Blocking connection pool which records how long callers wait."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+        self.timeouts = 0
+        self.connection_errors = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    async def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except (ConnectionError, TimeoutError) as e:
+            # The pool raises ConnectionError from a timeout when no connection
+            # frees up, anything else, a connect timeout included, is Redis
+            # being unreachable
+            if isinstance(e, ConnectionError) and isinstance(
+                e.__cause__, asyncio.TimeoutError
+            ):
+                self.timeouts += 1
+            else:
+                self.connection_errors += 1
+            raise
+
+        waited = time.perf_counter() - started
+        self.acquired += 1
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+        return connection
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "max_connections": self.max_connections,
+            "in_use": len(self._in_use_connections),
+            "idle": sum(1 for c in self._available_connections if c.is_connected),
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "connection_errors": self.connection_errors,
+            "wait_time_avg": (
+                self.wait_time_total / self.acquired if self.acquired else 0
+            ),
+            "wait_time_max": self.wait_time_max,
+        }
+
+
+redis_pool: Optional[InstrumentedConnectionPool] = None
+
+
+def init_redis_pool() -> InstrumentedConnectionPool:
+    """Create the application wide Redis connection pool"""
+    global redis_pool
+    if not settings.redis_url:
+        raise ValueError("Redis URL not set")
+
+    redis_pool = InstrumentedConnectionPool.from_url(
+        settings.redis_url,
+        encoding="utf-8",
+        decode_responses=True,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        health_check_interval=settings.redis_health_check_interval,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_connect_timeout,
+    )
+    logger.info(f"Created Redis pool of {settings.redis_max_connections} connections")
+    return redis_pool
+
+
+async def close_redis_pool() -> None:
+    global redis_pool
+    if redis_pool:
+        await redis_pool.disconnect()
+        redis_pool = None
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from typing import Any, Optional
+
+from app.config import settings
+from app.database import AsyncReplicaSessionLocal, AsyncSessionLocal
+from app.utils import LoggerConfigurator
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = LoggerConfigurator(name="replica").configure()
+
+# Seconds the replica is behind, 0 when it replayed everything it received.
+# NULL while no WAL receiver runs, as then nothing arrives to replay and the
+# replica looks caught up however far behind it falls
+REPLICATION_LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver) THEN NULL"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+    " END"
+)
+
+
+class ReplicaRouter:
+    """Route read-only sessions to a replica while it is fresh enough.
+
+    The replication lag is checked at most once per `check_interval`, in a
+    background task bounded by `timeout`, and sessions are routed by the last
+    verdict meanwhile. While the lag exceeds `max_lag`, the replica isn't
+    streaming or can't be reached, sessions are opened on the primary.
+    """
+
+    def __init__(
+        self,
+        replica: async_sessionmaker[AsyncSession],
+        primary: async_sessionmaker[AsyncSession],
+        max_lag: float,
+        check_interval: float,
+        timeout: float,
+    ) -> None:
+        self.replica = replica
+        self.primary = primary
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.timeout = timeout
+
+        self.lag: Optional[float] = None
+        self.usable = False
+        self.checked_at: Optional[float] = None
+        self.checking: Optional[asyncio.Task] = None
+
+        self.replica_sessions = 0
+        self.primary_sessions = 0
+        self.check_failures = 0
+
+    async def check(self) -> bool:
+        try:
+            async with self.replica() as session:
+                result = await asyncio.wait_for(
+                    session.execute(REPLICATION_LAG_QUERY), self.timeout
+                )
+                lag = result.scalar_one()
+        except Exception as e:
+            self.check_failures += 1
+            self.lag = None
+            if self.usable:
+                logger.error(f"Replica is unavailable, reading from primary: {e!r}")
+            self.usable = False
+        else:
+            if lag is None:
+                if self.usable:
+                    logger.error("Replica is not streaming, reading from primary")
+                self.lag = None
+                self.usable = False
+            else:
+                self.lag = float(lag)
+                usable = self.lag <= self.max_lag
+                if usable != self.usable:
+                    logger.info(f"Replica lag {self.lag:.2f}s, usable: {usable}")
+                self.usable = usable
+
+        self.checked_at = time.monotonic()
+        return self.usable
+
+    async def session_factory(self) -> async_sessionmaker[AsyncSession]:
+        if (
+            self.checked_at is None
+            or time.monotonic() - self.checked_at >= self.check_interval
+        ) and (self.checking is None or self.checking.done()):
+            self.checking = asyncio.create_task(self.check())
+
+        if self.usable:
+            self.replica_sessions += 1
+            return self.replica
+        self.primary_sessions += 1
+        return self.primary
+
+    async def close(self) -> None:
+        if self.checking:
+            self.checking.cancel()
+            await asyncio.gather(self.checking, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "usable": self.usable,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "replica_sessions": self.replica_sessions,
+            "primary_sessions": self.primary_sessions,
+            "check_failures": self.check_failures,
+        }
+
+
+replica_router: Optional[ReplicaRouter] = (
+    ReplicaRouter(
+        replica=AsyncReplicaSessionLocal,
+        primary=AsyncSessionLocal,
+        max_lag=settings.replica_max_lag,
+        check_interval=settings.replica_check_interval,
+        timeout=settings.replica_timeout,
+    )
+    if AsyncReplicaSessionLocal
+    else None
+)
+
+
+async def get_read_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Session factory for read-only queries, the primary without a replica"""
+    if replica_router:
+        return await replica_router.session_factory()
+    return AsyncSessionLocal
+
+
+async def close_replica_router() -> None:
+    """Cancel a lag check still in flight"""
+    if replica_router:
+        await replica_router.close()
@@ -1,19 +1,45 @@
-from datetime import datetime
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Union
 
 import httpx
-from app.dependencies import get_redis_client, get_session
-from app.operations.bet import create_bet, get_bets
-from app.operations.event import get_event
-from app.schemas import BetCreate, BetCreateResponse, PaginatedBetsHistory
+from app import bet_writer, event_timers
+from app.cache import event_cache
+from app.config import settings
+from app.dependencies import get_read_session, get_redis_client, get_session
+from app.errors import InvalidCursorError, LineProviderUnavailableError
+from app.models import BetStatus
+from app.operations.bet import create_bet, create_bets, get_bets, get_bets_page
+from app.operations.bet_stats import get_bet_stats
+from app.operations.event import get_event, get_events
+from app.operations.export import export_bets
+from app.schemas import (
+    BetBatchCreate,
+    BetBatchCreateResponse,
+    BetBatchItemResult,
+    BetCreate,
+    BetCreateResponse,
+    BetStatsSummary,
+    CursorBetsHistory,
+    PaginatedBetsHistory,
+)
 from app.tasks import update_pending_bets_scheduler
 from app.utils import LoggerConfigurator
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = LoggerConfigurator(name="router-bets").configure()
 
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+EVENT_NOT_FOUND = "Event not found"
+INVALID_DEADLINE = "Invalid deadline format in event data"
+DEADLINE_PASSED = "Betting deadline has passed"
+
+MAX_PAGE_SIZE = 1000
+
 router = APIRouter()
 
 
@@ -30,6 +56,12 @@ async def place_bet(
     logger.debug(f"Entering place_bet function with bet: {bet}")
     logger.debug(f"Using get_event function: {get_event}")
 
+    # Closed by its deadline timer, which only sees the updates consumed by
+    # this instance: check the shared copy, the deadline may have moved since
+    closed = event_timers.is_closed(bet.event_id)
+    if closed:
+        event_cache.invalidate(bet.event_id)
+
     # Check event deadline
     try:
         event_data = await get_event(event_id=bet.event_id, redis_client=redis_client)
@@ -37,32 +69,38 @@ async def place_bet(
         logger.error(f"Failed to fetch event data: {e}")
         if e.response.status_code == status.HTTP_404_NOT_FOUND:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Event not found"
+                status_code=status.HTTP_404_NOT_FOUND, detail=EVENT_NOT_FOUND
             )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Unable to fetch event data",
         )
-
-    try:
-        deadline = datetime.fromtimestamp(event_data["deadline"])
-    except (AttributeError, ValueError, TypeError) as e:
-        logger.error(f"Invalid deadline format in event data: {e}")
+    except (httpx.HTTPError, LineProviderUnavailableError) as e:
+        logger.error(f"Line Provider service is unavailable: {e}")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Invalid deadline format in event data",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to fetch event data",
         )
 
-    if deadline <= datetime.utcnow():
+    error = get_deadline_error(event_data)
+    if error == INVALID_DEADLINE:
+        logger.error(f"{error}: {event_data}")
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Betting deadline has passed",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error
         )
+    if error is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+    if closed:
+        # Reopen the event on the later deadline
+        event_timers.track_events([event_data])
 
     try:
-        bet_id = await create_bet(
-            event_id=bet.event_id, amount=bet.amount, session=session
-        )
+        if bet_writer.bet_writer:
+            bet_id = await bet_writer.bet_writer.submit(bet)
+        else:
+            bet_id = await create_bet(
+                event_id=bet.event_id, amount=bet.amount, session=session
+            )
     except Exception as e:
         detail = "Failed to create bet"
         logger.error(f"{detail}: {e}")
@@ -74,21 +112,115 @@ async def place_bet(
     return JSONResponse(content={"id": str(bet_id)}, status_code=201)
 
 
+def get_deadline_error(event_data: Optional[dict]) -> Optional[str]:
+    """Why a bet can't be placed on the event, None if it can."""
+    if event_data is None:
+        return EVENT_NOT_FOUND
+
+    try:
+        deadline = datetime.fromtimestamp(event_data["deadline"])
+    except (KeyError, ValueError, TypeError, AttributeError):
+        return INVALID_DEADLINE
+
+    if deadline <= datetime.utcnow():
+        return DEADLINE_PASSED
+    return None
+
+
+@router.post(
+    "/bets/batch",
+    response_model=BetBatchCreateResponse,
+)
+async def place_bets(
+    batch: BetBatchCreate,
+    session: AsyncSession = Depends(get_session),
+    redis_client: Redis = Depends(get_redis_client),
+) -> BetBatchCreateResponse:
+    """Place many bets at once, with a result for every bet in order.
+
+    Bets on unknown or closed events are rejected individually, the others
+    are created together.
+    """
+    if len(batch.bets) > settings.bet_batch_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.bet_batch_max_size} bets per request",
+        )
+
+    # One lookup for all distinct events of the batch, an upstream outage
+    # fails the whole batch rather than reporting every event as not found
+    try:
+        events = await get_events(
+            [bet.event_id for bet in batch.bets],
+            redis_client=redis_client,
+            raise_errors=True,
+        )
+    except (httpx.HTTPError, LineProviderUnavailableError) as e:
+        logger.error(f"Line Provider service is unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to fetch event data",
+        )
+
+    items = [
+        BetBatchItemResult(error=get_deadline_error(events.get(bet.event_id)))
+        for bet in batch.bets
+    ]
+    accepted = [index for index, item in enumerate(items) if item.error is None]
+    if accepted:
+        try:
+            bet_ids = await create_bets(
+                bets=[batch.bets[index] for index in accepted], session=session
+            )
+        except Exception as e:
+            detail = "Failed to create bets"
+            logger.error(f"{detail}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=detail,
+            )
+
+        for index, bet_id in zip(accepted, bet_ids):
+            items[index].id = uuid.UUID(bet_id)
+
+    return BetBatchCreateResponse(items=items)
+
+
 @router.get(
     "/bets",
-    response_model=PaginatedBetsHistory,
+    response_model=Union[PaginatedBetsHistory, CursorBetsHistory],
 )
 async def read_bets(
-    page: int = 1,
-    size: int = 50,
-    session: AsyncSession = Depends(get_session),
-) -> PaginatedBetsHistory:
-    """Get all bets."""
+    page: int = Query(1, ge=1),
+    size: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+) -> Union[PaginatedBetsHistory, CursorBetsHistory]:
+    """Get all bets.
+
+    Pages by offset by default. Passing `cursor` (empty for the first page)
+    switches to keyset pagination ordered by creation time, where `count`
+    may be "exact" or "estimated" to include the total.
+    """
+
+    if count not in (None, "exact", "estimated"):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='count must be "exact" or "estimated"',
+        )
 
     try:
+        if cursor is not None:
+            return await get_bets_page(
+                size=size, session=session, cursor=cursor, count=count
+            )
+
         bets: PaginatedBetsHistory = await get_bets(
             page=page, size=size, session=session
         )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         detail = "Failed to get bets"
         logger.error(f"{detail}: {e}")
@@ -100,6 +232,79 @@ async def read_bets(
     return bets
 
 
+@router.get(
+    "/bets/stats",
+    response_model=BetStatsSummary,
+)
+async def read_bet_stats(
+    session: AsyncSession = Depends(get_read_session),
+) -> BetStatsSummary:
+    """Number of bets and staked amount, per bet status."""
+    try:
+        return await get_bet_stats(session=session)
+    except Exception as e:
+        detail = "Failed to get bet stats"
+        logger.error(f"{detail}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=detail,
+        )
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Compare aware datetimes with the naive UTC of `created_at`"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/bets/export")
+async def export_bets_history(
+    format: str = "ndjson",
+    bet_status: Optional[str] = Query(None, alias="status"),
+    event_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> StreamingResponse:
+    """Stream all matching bets as NDJSON or CSV.
+
+    `status` is a status name (NOT_PLAYED, WON or LOST), the time range
+    includes `created_from` and excludes `created_to`. Times without an
+    offset are taken as UTC, like the stored ones.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='format must be "ndjson" or "csv"',
+        )
+    if bet_status is not None and bet_status not in BetStatus.__members__:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"status must be one of {', '.join(BetStatus.__members__)}",
+        )
+
+    try:
+        rows = await export_bets(
+            export_format=format,
+            status=BetStatus[bet_status] if bet_status else None,
+            event_id=event_id,
+            created_from=to_naive_utc(created_from),
+            created_to=to_naive_utc(created_to),
+        )
+    except Exception as e:
+        detail = "Failed to export bets"
+        logger.error(f"{detail}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=detail,
+        )
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="bets.{format}"'},
+    )
+
+
 @router.get(
     "/bets/check",
 )
@@ -1,9 +1,11 @@
-from typing import List
+from typing import List, Optional
 
-from app.dependencies import get_redis_client, get_session
+from app.dependencies import get_read_session, get_redis_client, get_session
 from app.operations.bet import update_event_status
+from app.operations.bet_stats import get_event_exposure
 from app.operations.event import get_upcoming_events
-from app.schemas import Event, EventState
+from app.operations.settlement import get_settlement
+from app.schemas import Event, EventExposure, EventState, SettlementProgress
 from app.utils import LoggerConfigurator
 from fastapi import APIRouter, Depends, HTTPException, Path, status
 from redis.asyncio import Redis
@@ -16,11 +18,15 @@ router = APIRouter()
 
 @router.get("/events", response_model=List[Event])
 async def retrieve_events(
+    limit: Optional[int] = None,
+    offset: int = 0,
     redis_client: Redis = Depends(get_redis_client),
 ) -> list[dict]:
     """Retrieve available events."""
     try:
-        events: list[dict] = await get_upcoming_events(redis_client=redis_client)
+        events: list[dict] = await get_upcoming_events(
+            redis_client=redis_client, limit=limit, offset=offset
+        )
     except Exception as e:
         detail = "Failed to retrieve events"
         logger.error(f"{detail}: {e}")
@@ -63,3 +69,43 @@ async def update_event(
         )
 
     return {"message": response.get("message") or "Event status updated successfully"}
+
+
+@router.get("/events/{event_id}/settlement", response_model=SettlementProgress)
+async def retrieve_settlement(
+    event_id: str = Path(...),
+    session: AsyncSession = Depends(get_session),
+) -> SettlementProgress:
+    """Progress of settling the bets of a finished event."""
+    try:
+        settlement = await get_settlement(event_id=event_id, session=session)
+    except Exception as e:
+        detail = "Failed to retrieve settlement"
+        logger.error(f"{detail}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=detail,
+        )
+
+    if settlement is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Settlement not found"
+        )
+    return settlement
+
+
+@router.get("/events/{event_id}/exposure", response_model=EventExposure)
+async def retrieve_exposure(
+    event_id: str = Path(...),
+    session: AsyncSession = Depends(get_read_session),
+) -> EventExposure:
+    """Number of bets and staked amount on an event, per bet status."""
+    try:
+        return await get_event_exposure(event_id=event_id, session=session)
+    except Exception as e:
+        detail = "Failed to retrieve exposure"
+        logger.error(f"{detail}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=detail,
+        )
@@ -0,0 +1,73 @@
+from app import bet_writer, event_timers, redis_pool, replica
+from app.cache import event_cache
+from app.http_client import get_line_provider_client
+from app.operations.event import last_warmup
+from app.utils import LoggerConfigurator
+from fastapi import APIRouter, HTTPException, status
+
+logger = LoggerConfigurator(name="router-stats").configure()
+
+router = APIRouter()
+
+
+@router.get("/stats/redis")
+async def get_redis_stats() -> dict[str, float]:
+    """Redis connection pool usage and wait times."""
+    if not redis_pool.redis_pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Redis pool is not initialized",
+        )
+
+    return redis_pool.redis_pool.stats()
+
+
+@router.get("/stats/cache")
+async def get_cache_stats() -> dict[str, float]:
+    """In-process event cache size and hit ratio."""
+    return event_cache.stats()
+
+
+@router.get("/stats/warmup")
+async def get_warmup_stats() -> dict:
+    """Events loaded by the startup sync, its duration and mode."""
+    return last_warmup
+
+
+@router.get("/stats/line-provider")
+async def get_line_provider_stats() -> dict:
+    """Line Provider circuit breaker state and request latency histogram."""
+    return get_line_provider_client().stats()
+
+
+@router.get("/stats/bet-writer")
+async def get_bet_writer_stats() -> dict:
+    """Group commit batch sizes and how long bets waited to be written."""
+    if not bet_writer.bet_writer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Bet writer is disabled"
+        )
+
+    return bet_writer.bet_writer.stats()
+
+
+@router.get("/stats/replica")
+async def get_replica_stats() -> dict:
+    """Read replica lag and how many sessions went to replica or primary."""
+    if not replica.replica_router:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Read replica is disabled"
+        )
+
+    return replica.replica_router.stats()
+
+
+@router.get("/stats/event-timers")
+async def get_event_timers_stats() -> dict:
+    """Events tracked by the deadline timers and the checks they made."""
+    if not event_timers.event_timers:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Event timers are disabled"
+        )
+
+    return event_timers.event_timers.stats()
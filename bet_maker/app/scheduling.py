@@ -0,0 +1,230 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from app.config import settings
+from app.errors import StaleLeaseError
+from app.models import SchedulerFence
+from app.utils import LoggerConfigurator
+from redis.asyncio import Redis
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = LoggerConfigurator(name="scheduling").configure()
+
+T = TypeVar("T")
+
+# Identifies this process as lease owner and cluster member
+INSTANCE_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+CLUSTER_MEMBERS_KEY = "scheduler:members"
+
+PENDING_BETS_SWEEP = "pending-bets-sweep"
+RESUME_SETTLEMENTS = "resume-settlements"
+SETTLE_CHECK = "settle-check"
+
+# Take the lease only when it's free, with a token greater than any before
+ACQUIRE_SCRIPT = """
+if redis.call("set", KEYS[1], ARGV[1], "NX", "PX", ARGV[2]) then
+    return redis.call("incr", KEYS[2])
+end
+return false
+"""
+RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseLock:
+    """Redis lease electing the one instance which runs a job.
+
+    Every acquisition gets a fencing token from a counter which only goes
+    up. The lease expires after `ttl` seconds unless renewed, so a crashed
+    holder doesn't block the job for long, and a holder which stalled past
+    its lease is stopped by `check_fence` once a newer token was used.
+    """
+
+    def __init__(self, redis_client: Redis, name: str, ttl: float):
+        self.redis_client = redis_client
+        self.name = name
+        self.ttl_ms = int(ttl * 1000)
+        self.key = f"scheduler:{name}:lease"
+        self.token_key = f"scheduler:{name}:token"
+        # Sent by hash, the script body only when Redis doesn't know it yet
+        self.acquire_script = redis_client.register_script(ACQUIRE_SCRIPT)
+        self.renew_script = redis_client.register_script(RENEW_SCRIPT)
+        self.release_script = redis_client.register_script(RELEASE_SCRIPT)
+
+    async def acquire(self) -> Optional[int]:
+        token = await self.acquire_script(
+            keys=[self.key, self.token_key], args=[INSTANCE_ID, self.ttl_ms]
+        )
+        return int(token) if token else None
+
+    async def renew(self) -> bool:
+        renewed = await self.renew_script(
+            keys=[self.key], args=[INSTANCE_ID, self.ttl_ms]
+        )
+        return bool(renewed)
+
+    async def release(self) -> None:
+        await self.release_script(keys=[self.key], args=[INSTANCE_ID])
+
+    async def _keep_renewed(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl_ms / 3000)
+            try:
+                if not await self.renew():
+                    logger.warning(f"Lost the {self.name} lease")
+                    return
+            except Exception as e:
+                logger.error(f"Failed to renew the {self.name} lease: {e}")
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[Optional[int]]:
+        """Yield the fencing token while holding the lease, None if taken"""
+        token = await self.acquire()
+        if token is None:
+            yield None
+            return
+
+        renewer = asyncio.create_task(self._keep_renewed())
+        try:
+            yield token
+        finally:
+            renewer.cancel()
+            await asyncio.wait([renewer])
+            try:
+                await self.release()
+            except Exception as e:
+                logger.error(f"Failed to release the {self.name} lease: {e}")
+
+
+def settle_check_lease(redis_client: Redis, event_id: str) -> LeaseLock:
+    """Lease of the instance settling an event on its timer"""
+    return LeaseLock(
+        redis_client, f"{SETTLE_CHECK}:{event_id}", ttl=settings.sweep_lease_ttl
+    )
+
+
+async def check_fence(session: AsyncSession, name: str, token: int) -> None:
+    """Record `token` as the latest of `name` within the current transaction.
+
+    Raises StaleLeaseError when a newer token has already been recorded.
+    The fence row stays locked until the transaction ends, so a stale holder
+    can't write concurrently with the current one either.
+    """
+    query = (
+        insert(SchedulerFence)
+        .values(name=name, token=token)
+        .on_conflict_do_update(
+            index_elements=[SchedulerFence.name],
+            set_={"token": token},
+            where=SchedulerFence.token <= token,
+        )
+        .returning(SchedulerFence.token)
+    )
+    result = await session.execute(query)
+    if result.scalar_one_or_none() is None:
+        raise StaleLeaseError(f"Fencing token {token} of {name} is stale")
+
+
+def get_cycle(interval: float) -> int:
+    """Number of the current wall-clock cycle of a job every `interval`"""
+    return int(time.time() // interval)
+
+
+def cycle_done_key(name: str, interval: float) -> str:
+    """Key marking the current run of a job every `interval` seconds as done"""
+    return f"scheduler:{name}:done:{get_cycle(interval)}"
+
+
+async def run_once_per_interval(
+    redis_client: Redis,
+    name: str,
+    interval: float,
+    job: Callable[[int], Awaitable[T]],
+) -> Optional[T]:
+    """Run `job` on the first instance to take the lease in an interval.
+
+    `job` gets the fencing token. The others skip the interval once it's
+    marked done, and return None like the instances which lost the lease.
+    """
+    done_key = cycle_done_key(name, interval)
+    if await redis_client.exists(done_key):
+        return None
+
+    lease = LeaseLock(redis_client, name, ttl=settings.sweep_lease_ttl)
+    async with lease.hold() as token:
+        # Checked again, the previous holder may have just finished
+        if token is None or await redis_client.exists(done_key):
+            return None
+        result = await job(token)
+        await redis_client.set(done_key, INSTANCE_ID, ex=int(interval * 2))
+    return result
+
+
+async def join_cluster(redis_client: Redis, ttl: float) -> None:
+    """Register this instance as alive for the next `ttl` seconds"""
+    now = time.time()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.zadd(CLUSTER_MEMBERS_KEY, {INSTANCE_ID: now + ttl})
+        pipe.zremrangebyscore(CLUSTER_MEMBERS_KEY, "-inf", now)
+        await pipe.execute()
+
+
+async def leave_cluster(redis_client: Redis) -> None:
+    await redis_client.zrem(CLUSTER_MEMBERS_KEY, INSTANCE_ID)
+
+
+async def get_cluster_members(redis_client: Redis) -> List[str]:
+    return sorted(
+        await redis_client.zrangebyscore(CLUSTER_MEMBERS_KEY, time.time(), "+inf")
+    )
+
+
+async def get_shard(
+    redis_client: Redis, name: str, interval: float
+) -> Optional[Tuple[int, int]]:
+    """Index of this instance among the members of this cycle and their number.
+
+    Instances run a job at different times within a cycle, each counted from
+    its own start, so the members are snapshot by the first of them and the
+    others shard by the same list. None when this instance isn't part of it,
+    having joined later, its events are covered by the others already. The
+    shards of members which stop during the cycle wait for the next one.
+    """
+    key = f"scheduler:{name}:members:{get_cycle(interval)}"
+    members = await get_cluster_members(redis_client)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(key, json.dumps(members), nx=True, ex=int(interval * 2))
+        pipe.get(key)
+        _, snapshot = await pipe.execute()
+    members = json.loads(snapshot)
+
+    if not members:
+        # Nobody registered (yet), take everything rather than nothing
+        return 0, 1
+    if INSTANCE_ID not in members:
+        return None
+    return members.index(INSTANCE_ID), len(members)
+
+
+def in_shard(event_id: str, shard: Tuple[int, int]) -> bool:
+    index, count = shard
+    return zlib.crc32(event_id.encode("utf-8")) % count == index
@@ -1,7 +1,8 @@
 import decimal
 import enum
+from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 from app.models import BetStatus
 from pydantic import UUID4, BaseModel, Field, field_serializer, field_validator
@@ -29,6 +30,19 @@ class BetCreateResponse(BaseModel):
     id: UUID4
 
 
+class BetBatchCreate(BaseModel):
+    bets: List[BetCreate] = Field(..., min_length=1)
+
+
+class BetBatchItemResult(BaseModel):
+    id: Optional[UUID4] = None
+    error: Optional[str] = None
+
+
+class BetBatchCreateResponse(BaseModel):
+    items: List[BetBatchItemResult]
+
+
 class BetResponse(BaseModel):
     id: UUID4
     status: BetStatus
@@ -45,6 +59,41 @@ class PaginatedBetsHistory(BaseModel):
     size: int
 
 
+class CursorBetsHistory(BaseModel):
+    items: List[BetResponse]
+    size: int
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+
+class SettlementProgress(BaseModel):
+    event_id: str
+    status: BetStatus
+    state: str
+    settled: int
+    remaining: int
+    chunks: int
+    started_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class StatusStats(BaseModel):
+    bets: int
+    amount: Decimal
+
+
+class BetStatsSummary(BaseModel):
+    bets: int
+    amount: Decimal
+    by_status: Dict[BetStatus, StatusStats]
+
+
+class EventExposure(BetStatsSummary):
+    event_id: str
+
+
 class EventState(enum.Enum):
     NEW = 1
     FINISHED_WIN = 2
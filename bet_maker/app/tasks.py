@@ -1,36 +1,192 @@
 import logging
+from functools import partial
+from typing import List, Optional
 
-from app.dependencies import get_db_and_redis
-from app.operations.bet import update_event_status, update_not_playyed_bets
-from app.operations.event import get_available_events
+from aiokafka import ConsumerRecord  # type: ignore
+from app.cache import event_cache
+from app.codec import decode_message, decode_records
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.dependencies import get_db_and_redis, get_redis_client
+from app.errors import StaleLeaseError
+from app.operations.bet import (
+    get_settlement_status,
+    update_event_status,
+    update_events_status,
+    update_not_playyed_bets,
+)
+from app.operations.event import EVENTS_BY_DEADLINE, get_events, sync_events
+from app.operations.settlement import resume_settlements, settle_event
+from app.partitioning import drop_expired_partitions, ensure_partitions
+from app.replica import get_read_sessionmaker
+from app.scheduling import (
+    PENDING_BETS_SWEEP,
+    RESUME_SETTLEMENTS,
+    get_shard,
+    join_cluster,
+    leave_cluster,
+    run_once_per_interval,
+    settle_check_lease,
+)
 from app.schemas import Event
 from app.utils import LoggerConfigurator
 from fastapi_utils.tasks import repeat_every  # type: ignore
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 
 logger: logging.Logger = LoggerConfigurator(name="tasks").configure()
 
 
-@repeat_every(seconds=60 * 60)  # Run every hour
+PENDING_BETS_INTERVAL = 60 * 60
+
+
+async def run_pending_bets_sweep(
+    session: AsyncSession, redis_client: Redis, read_session: AsyncSession
+) -> Optional[dict]:
+    """Run the share of the pending bets sweep of this instance.
+
+    Depends on `sweep_coordination`: in "lease" mode the first instance
+    to take the lease in an interval sweeps everything and the others skip
+    the interval, in "shard" mode every instance live when the interval
+    started sweeps its share of events. Returns None when there was nothing
+    to do here.
+    """
+    sweep = partial(
+        update_not_playyed_bets,
+        session=session,
+        redis_client=redis_client,
+        read_session=read_session,
+    )
+    if settings.sweep_coordination == "shard":
+        shard = await get_shard(redis_client, PENDING_BETS_SWEEP, PENDING_BETS_INTERVAL)
+        if shard is None:
+            return None
+        logger.info(f"Sweeping shard {shard[0]} of {shard[1]}")
+        return await sweep(shard=shard)
+    if settings.sweep_coordination != "lease":
+        return await sweep()
+
+    return await run_once_per_interval(
+        redis_client,
+        PENDING_BETS_SWEEP,
+        PENDING_BETS_INTERVAL,
+        lambda token: sweep(fencing_token=token),
+    )
+
+
+@repeat_every(seconds=PENDING_BETS_INTERVAL)  # Run every hour
 async def update_pending_bets_scheduler() -> None:
     """Check for unplayed bets"""
     logger.info("Starting update pending bets task")
 
     try:
+        read_sessionmaker = await get_read_sessionmaker()
         async with get_db_and_redis() as (session, redis_client):
-            await update_not_playyed_bets(session=session, redis_client=redis_client)
+            async with read_sessionmaker() as read_session:
+                report = await run_pending_bets_sweep(
+                    session=session,
+                    redis_client=redis_client,
+                    read_session=read_session,
+                )
+    except StaleLeaseError as e:
+        logger.warning(f"Stopped update_pending_bets_scheduler: {e}")
     except Exception as e:
         logger.error(f"Error during update_pending_bets_scheduler: {e}")
+    else:
+        if report is None:
+            logger.info("Pending bets of this interval are swept by another instance")
+        else:
+            logger.info(
+                f"Settled {report['settled']} bets of {report['events']} events "
+                f"in {len(report['chunks'])} chunks"
+            )
 
     logger.info("Update pending bets task complete")
 
 
+@repeat_every(seconds=max(settings.cluster_member_ttl // 3, 1))
+async def cluster_heartbeat() -> None:
+    """Keep this instance registered for the sharded sweep"""
+    if settings.sweep_coordination != "shard":
+        return
+
+    redis_client = await get_redis_client()
+    try:
+        await join_cluster(redis_client, ttl=settings.cluster_member_ttl)
+    except Exception as e:
+        logger.error(f"Error during cluster_heartbeat: {e}")
+    finally:
+        await redis_client.close()
+
+
+async def leave_cluster_on_shutdown() -> None:
+    """Hand the share of this instance over to the others right away"""
+    if settings.sweep_coordination != "shard":
+        return
+
+    redis_client = await get_redis_client()
+    try:
+        await leave_cluster(redis_client)
+    except Exception as e:
+        logger.error(f"Error during leave_cluster_on_shutdown: {e}")
+    finally:
+        await redis_client.close()
+
+
+RESUME_SETTLEMENTS_INTERVAL = 60
+
+
+@repeat_every(seconds=RESUME_SETTLEMENTS_INTERVAL)  # Run every minute
+async def resume_settlements_scheduler() -> None:
+    """Finish settlements interrupted by a crash or an error
+
+    Runs on one instance a minute, each settlement is claimed by whoever
+    resumes it anyway.
+    """
+    try:
+        async with get_db_and_redis() as (session, redis_client):
+            resumed = await run_once_per_interval(
+                redis_client,
+                RESUME_SETTLEMENTS,
+                RESUME_SETTLEMENTS_INTERVAL,
+                lambda _: resume_settlements(session),
+            )
+    except Exception as e:
+        logger.error(f"Error during resume_settlements_scheduler: {e}")
+    else:
+        if resumed:
+            logger.info(f"Resumed settlements of events {resumed}")
+
+
+@repeat_every(seconds=60 * 60 * 24)  # Run every day
+async def maintain_bets_partitions() -> None:
+    """Create upcoming bets partitions and drop expired ones"""
+    if not settings.bets_partitioning:
+        return
+
+    try:
+        async with AsyncSessionLocal() as session:
+            created = await ensure_partitions(
+                session, months_ahead=settings.bets_partitions_ahead
+            )
+            dropped = []
+            if settings.bets_partition_retention:
+                dropped = await drop_expired_partitions(
+                    session, retention_months=settings.bets_partition_retention
+                )
+    except Exception as e:
+        logger.error(f"Error during maintain_bets_partitions: {e}")
+    else:
+        logger.info(f"Created partitions {created}, dropped partitions {dropped}")
+
+
 async def get_available_events_on_startup() -> None:
-    """Fetch available events on startup"""
+    """Catch the event cache up on startup, incrementally when possible"""
     logger.info("Start up get available events task")
 
     try:
         async with get_db_and_redis() as (_, redis_client):
-            count = await get_available_events(redis_client=redis_client)
+            count = await sync_events(redis_client=redis_client)
     except Exception as e:
         logger.error(f"Error during get_available_events_on_startup: {e}")
     else:
@@ -39,12 +195,56 @@ async def get_available_events_on_startup() -> None:
     logger.info("Get available events task complete")
 
 
-async def process_message(message: str) -> None:
+async def close_events(event_ids: List[str]) -> None:
+    """Drop events whose deadline passed from the upcoming events index.
+
+    Closing an event means only that, its cached record is left as it is.
+    Bets on it are rejected by the deadline in that record, which stays
+    right when the deadline is extended later on.
+    """
+    redis_client = await get_redis_client()
+    try:
+        await redis_client.zrem(EVENTS_BY_DEADLINE, *event_ids)
+    finally:
+        await redis_client.close()
+    logger.info(f"Closed events {event_ids}")
+
+
+async def check_event_settlements(event_ids: List[str]) -> List[str]:
+    """Settle the bets of the events which finished, return their ids.
+
+    Every instance sees the event and checks it, the one holding the lease
+    of an event settles it, the others retry later and find it settled.
+    """
+    # Results arrive through Redis, possibly applied by another instance
+    for event_id in event_ids:
+        event_cache.invalidate(event_id)
+
+    settled: List[str] = []
+    async with get_db_and_redis() as (session, redis_client):
+        events = await get_events(event_ids, redis_client=redis_client)
+        for event_id, event_data in events.items():
+            new_status = get_settlement_status(Event.model_validate(event_data))
+            if new_status is None:
+                continue
+            async with settle_check_lease(redis_client, event_id).hold() as token:
+                if token is None:
+                    logger.info(f"Event {event_id} is settled by another instance")
+                    continue
+                rowcount = await settle_event(
+                    event_id=event_id, new_status=new_status, session=session
+                )
+            logger.info(f"Settled {rowcount} bets of event {event_id} on its timer")
+            settled.append(event_id)
+    return settled
+
+
+async def process_message(message: ConsumerRecord) -> None:
     """Message processor"""
-    logger.debug(f"Processing message: {message}")
+    logger.debug(f"Processing message: {message.value!r}")
 
     try:
-        event: Event = Event.parse_raw(message)
+        event: Event = decode_message(message.value, message.headers)
         async with get_db_and_redis() as (session, redis_client):
             # Create or update event
             response = await update_event_status(
@@ -53,3 +253,19 @@ async def process_message(message: str) -> None:
             logger.info(f"Response: {response}")
     except Exception as e:
         logger.error(f"Error during processing message: {e}")
+
+
+async def process_messages(messages: List[ConsumerRecord]) -> None:
+    """Batch message processor
+
+    Malformed messages are skipped, any other error is raised so the whole
+    batch is redelivered.
+    """
+    logger.debug(f"Processing batch of {len(messages)} messages")
+
+    events = decode_records(messages)
+    async with get_db_and_redis() as (session, redis_client):
+        responses = await update_events_status(
+            events=events, session=session, redis_client=redis_client
+        )
+    logger.info(f"Processed batch of {len(events)} events: {responses}")
@@ -0,0 +1,97 @@
+"""Query times of the bets settlement and history queries on a large table.
+
+Seeds bets on `bench-*` events, runs every query with EXPLAIN ANALYZE and
+removes the seeded rows again. Compare the output before and after
+`alembic upgrade head`, or after `python -m app.partitioning convert`.
+Run from bet_maker against a development database:
+
+    python -m benchmarks.bets_benchmark --rows 5000000
+"""
+
+import argparse
+import asyncio
+import json
+
+from app.config import settings
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+# Spread over 90 days, a third of the bets still unplayed
+SEED = """
+INSERT INTO bets (id, event_id, amount, status, created_at, updated_at)
+SELECT
+    gen_random_uuid(),
+    'bench-' || (n % :events),
+    10,
+    (ARRAY['NOT_PLAYED', 'WON', 'LOST'])[n % 3 + 1]::betstatus,
+    now() - (n % (90 * 24 * 60)) * interval '1 minute',
+    now()
+FROM generate_series(1, :rows) AS n
+"""
+
+QUERIES = {
+    "settle event": (
+        "UPDATE bets SET status = 'WON'"
+        " WHERE event_id = 'bench-1' AND status != 'WON'"
+    ),
+    "stale unplayed": (
+        "SELECT DISTINCT event_id FROM bets"
+        " WHERE status = 'NOT_PLAYED' AND created_at < now() - interval '24 hours'"
+    ),
+    "history page": (
+        "SELECT id, status, created_at FROM bets"
+        " WHERE (created_at, id) > (now() - interval '45 days',"
+        " '00000000-0000-0000-0000-000000000000')"
+        " ORDER BY created_at, id LIMIT 50"
+    ),
+}
+
+
+async def explain(connection: AsyncConnection, query: str) -> tuple[float, str]:
+    """Execution time in ms and the top plan node, changes rolled back."""
+    transaction = await connection.begin()
+    try:
+        result = await connection.execute(
+            text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}")
+        )
+        plan = result.scalar_one()
+    finally:
+        await transaction.rollback()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    node = plan[0]["Plan"]
+    while node.get("Plans") and node["Node Type"] in ("ModifyTable", "Limit"):
+        node = node["Plans"][0]
+    return plan[0]["Execution Time"], node["Node Type"]
+
+
+async def main(rows: int, events: int, keep: bool) -> None:
+    engine = create_async_engine(settings.database_url)
+    async with engine.connect() as connection:
+        print(f"Seeding {rows} bets on {events} events")
+        async with connection.begin():
+            await connection.execute(text(SEED), {"rows": rows, "events": events})
+        async with connection.begin():
+            await connection.execute(text("ANALYZE bets"))
+
+        try:
+            for name, query in QUERIES.items():
+                duration, node = await explain(connection, query)
+                print(f"{name:<16} {duration:10.2f} ms  {node}")
+        finally:
+            if not keep:
+                async with connection.begin():
+                    await connection.execute(
+                        text("DELETE FROM bets WHERE event_id LIKE 'bench-%'")
+                    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded bets")
+    args = parser.parse_args()
+    asyncio.run(main(rows=args.rows, events=args.events, keep=args.keep))
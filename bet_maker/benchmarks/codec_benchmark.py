@@ -0,0 +1,55 @@
+"""Encode/decode cost per event message, legacy JSON vs binary v1.
+
+Run from bet_maker with the service environment loaded:
+
+    python -m benchmarks.codec_benchmark
+"""
+
+import json
+import timeit
+from decimal import Decimal
+
+from app.codec import (
+    BINARY_CONTENT_TYPE,
+    CONTENT_TYPE_HEADER,
+    decode_message,
+    encode_event,
+)
+from app.schemas import Event, EventState
+
+NUMBER = 100_000
+
+EVENT = Event(
+    event_id="1",
+    coefficient=Decimal("1.15"),
+    deadline=1723456789,
+    state=EventState.NEW,
+)
+HEADERS = [(CONTENT_TYPE_HEADER, BINARY_CONTENT_TYPE.encode("utf-8"))]
+
+
+def encode_legacy() -> bytes:
+    # model_dump_json in send_event_to_kafka, json.dumps in value_serializer
+    return json.dumps(EVENT.model_dump_json(exclude_unset=True)).encode("utf-8")
+
+
+def encode_binary() -> bytes:
+    return encode_event(EVENT)
+
+
+def report(name: str, statement, payload_size: int) -> None:
+    seconds = timeit.timeit(statement, number=NUMBER)
+    print(f"{name:<16} {seconds / NUMBER * 1e6:8.2f} us/msg {payload_size:6d} bytes")
+
+
+def main() -> None:
+    legacy, binary = encode_legacy(), encode_binary()
+
+    report("encode legacy", encode_legacy, len(legacy))
+    report("encode binary", encode_binary, len(binary))
+    report("decode legacy", lambda: decode_message(legacy, None), len(legacy))
+    report("decode binary", lambda: decode_message(binary, HEADERS), len(binary))
+
+
+if __name__ == "__main__":
+    main()
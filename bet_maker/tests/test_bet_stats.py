@@ -0,0 +1,112 @@
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.models import Bet, BetStatus
+from app.operations.bet_stats import (
+    apply_bet_stats,
+    count_new_bets,
+    get_event_exposure,
+    settle_bets,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@pytest.fixture
+def session_mock():
+    session_mock = AsyncMock(spec=AsyncSession)
+    session_mock.begin = MagicMock()
+    session_mock.begin.return_value.__aenter__.return_value = session_mock
+    session_mock.begin.return_value.__aexit__.return_value = None
+    return session_mock
+
+
+def test_count_new_bets_groups_by_event():
+    # Act
+    deltas = count_new_bets(
+        [("1", Decimal("10")), ("2", Decimal("5")), ("1", Decimal("2.5"))]
+    )
+
+    # Assert
+    assert deltas == {
+        ("1", BetStatus.NOT_PLAYED): (2, Decimal("12.5")),
+        ("2", BetStatus.NOT_PLAYED): (1, Decimal("5")),
+    }
+
+
+@pytest.mark.asyncio
+async def test_apply_bet_stats_upserts_event_and_total_counters(session_mock):
+    # Act
+    await apply_bet_stats(
+        {
+            ("2", BetStatus.WON): (3, Decimal("30")),
+            ("1", BetStatus.WON): (1, Decimal("10")),
+            ("1", BetStatus.NOT_PLAYED): (-1, Decimal("-10")),
+        },
+        session_mock,
+    )
+
+    # Assert
+    event_stats, totals = [
+        call.args[0] for call in session_mock.execute.await_args_list
+    ]
+    assert "ON CONFLICT (event_id, status, shard) DO UPDATE" in str(event_stats)
+    params = totals.compile().params
+    assert sorted(value for key, value in params.items() if key.startswith("bets")) == [
+        -1,
+        4,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_settle_bets_moves_counters_to_new_status(session_mock):
+    # Arrange
+    result = MagicMock()
+    result.all.return_value = [
+        ("1", BetStatus.NOT_PLAYED, 2, Decimal("20")),
+        ("1", BetStatus.LOST, 1, Decimal("5")),
+    ]
+    session_mock.execute.return_value = result
+
+    # Act
+    with patch(
+        "app.operations.bet_stats.apply_bet_stats", new_callable=AsyncMock
+    ) as mock_apply_bet_stats:
+        settled = await settle_bets(
+            new_status=BetStatus.WON,
+            criteria=Bet.event_id == "1",
+            params={},
+            session=session_mock,
+        )
+
+    # Assert
+    assert settled == 3
+    mock_apply_bet_stats.assert_awaited_once_with(
+        {
+            ("1", BetStatus.NOT_PLAYED): (-2, Decimal("-20")),
+            ("1", BetStatus.WON): (3, Decimal("25")),
+            ("1", BetStatus.LOST): (-1, Decimal("-5")),
+        },
+        session_mock,
+    )
+    query = str(session_mock.execute.await_args.args[0])
+    assert "RETURNING bets.event_id, previous.old_status, bets.amount" in query
+
+
+@pytest.mark.asyncio
+async def test_get_event_exposure_sums_shards(session_mock):
+    # Arrange
+    result = MagicMock()
+    result.all.return_value = [
+        (BetStatus.NOT_PLAYED, 4, Decimal("40")),
+        (BetStatus.WON, 1, Decimal("15")),
+    ]
+    session_mock.execute.return_value = result
+
+    # Act
+    exposure = await get_event_exposure(event_id="1", session=session_mock)
+
+    # Assert
+    assert exposure.bets == 5
+    assert exposure.amount == Decimal("55")
+    assert exposure.by_status[BetStatus.WON].bets == 1
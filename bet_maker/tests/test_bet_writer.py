@@ -0,0 +1,61 @@
+import asyncio
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.bet_writer import BetWriter
+from app.schemas import BetCreate
+
+
+def make_bets(count):
+    return [BetCreate(event_id=str(i), amount=Decimal("10")) for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_bet_writer_groups_concurrent_bets():
+    # Arrange
+    async def create_bets(bets, session):
+        return [f"id-{bet.event_id}" for bet in bets]
+
+    writer = BetWriter(max_batch_size=3, window_ms=50, queue_size=100)
+
+    with patch("app.bet_writer.AsyncSessionLocal", MagicMock()), patch(
+        "app.bet_writer.create_bets", AsyncMock(side_effect=create_bets)
+    ) as mock_create_bets:
+        writer.start()
+
+        # Act
+        bet_ids = await asyncio.gather(*(writer.submit(bet) for bet in make_bets(5)))
+        await writer.stop()
+
+    # Assert
+    assert bet_ids == [f"id-{i}" for i in range(5)]
+    assert [len(call.kwargs["bets"]) for call in mock_create_bets.await_args_list] == [
+        3,
+        2,
+    ]
+    stats = writer.stats()
+    assert stats["batches"] == 2
+    assert stats["written"] == 5
+    assert stats["batch_size_max"] == 3
+
+
+@pytest.mark.asyncio
+async def test_bet_writer_fails_whole_batch():
+    # Arrange
+    writer = BetWriter(max_batch_size=10, window_ms=10, queue_size=100)
+
+    with patch("app.bet_writer.AsyncSessionLocal", MagicMock()), patch(
+        "app.bet_writer.create_bets", AsyncMock(side_effect=Exception("db is down"))
+    ):
+        writer.start()
+
+        # Act
+        results = await asyncio.gather(
+            *(writer.submit(bet) for bet in make_bets(2)), return_exceptions=True
+        )
+        await writer.stop()
+
+    # Assert
+    assert [str(result) for result in results] == ["db is down", "db is down"]
+    assert writer.stats()["failed"] == 2
@@ -0,0 +1,38 @@
+from unittest.mock import patch
+
+from app.cache import TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    # Arrange
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("1", {"event_id": "1"})
+    cache.set("2", {"event_id": "2"})
+
+    # Act
+    cache.get("1")
+    cache.set("3", {"event_id": "3"})
+
+    # Assert
+    assert cache.get("1") == {"event_id": "1"}
+    assert cache.get("2") is None
+    assert cache.get("3") == {"event_id": "3"}
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    # Arrange
+    cache = TTLCache(maxsize=10, ttl=5)
+
+    with patch("app.cache.time.monotonic", return_value=100):
+        cache.set("1", {"event_id": "1"})
+
+    # Act & Assert
+    with patch("app.cache.time.monotonic", return_value=104):
+        assert cache.get("1") == {"event_id": "1"}
+
+    with patch("app.cache.time.monotonic", return_value=105):
+        assert cache.get("1") is None
+
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,89 @@
+import json
+from decimal import Decimal
+
+import pytest
+from app.codec import (
+    BINARY_CONTENT_TYPE,
+    CONTENT_TYPE_HEADER,
+    decode_event,
+    decode_message,
+    encode_event,
+)
+from app.schemas import Event, EventState
+
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        Event(
+            event_id="1",
+            coefficient=Decimal("1.15"),
+            deadline=1723456789,
+            state=EventState.NEW,
+        ),
+        Event(event_id="2", state=EventState.FINISHED_WIN),
+        Event(event_id="событие", coefficient=None, deadline=0),
+    ],
+)
+def test_binary_roundtrip_keeps_set_fields(event: Event):
+    # Act
+    decoded = decode_event(encode_event(event))
+
+    # Assert
+    assert decoded == event
+    assert decoded.model_fields_set == event.model_fields_set
+    assert decoded.model_dump(exclude_unset=True) == event.model_dump(
+        exclude_unset=True
+    )
+
+
+# Encoded by the line_provider producer, see its tests/test_codec.py
+@pytest.mark.parametrize(
+    "payload, event",
+    [
+        (
+            "01070000013104312e31350000000066b9dd1501",
+            Event(
+                event_id="1",
+                coefficient=Decimal("1.15"),
+                deadline=1723456789,
+                state=EventState.NEW,
+            ),
+        ),
+        ("01040000013202", Event(event_id="2", state=EventState.FINISHED_WIN)),
+        (
+            "010301000ed181d0bed0b1d18bd182d0b8d0b50000000000000000",
+            Event(event_id="событие", coefficient=None, deadline=0),
+        ),
+    ],
+)
+def test_decode_line_provider_golden_payload(payload: str, event: Event):
+    # Act
+    decoded = decode_event(bytes.fromhex(payload))
+
+    # Assert
+    assert decoded == event
+    assert decoded.model_fields_set == event.model_fields_set
+
+
+def test_encode_event_rejects_oversized_coefficient():
+    # Arrange
+    event = Event(event_id="1", coefficient=Decimal("1." + "1" * 300))
+
+    # Act & Assert
+    with pytest.raises(ValueError):
+        encode_event(event)
+
+
+def test_decode_message_by_content_type():
+    # Arrange
+    event = Event(event_id="1", coefficient=Decimal("1.2"), state=EventState.NEW)
+    legacy = json.dumps(event.model_dump_json(exclude_unset=True)).encode("utf-8")
+    headers = [(CONTENT_TYPE_HEADER, BINARY_CONTENT_TYPE.encode("utf-8"))]
+
+    # Act & Assert
+    assert decode_message(legacy, headers=[]) == event
+    assert decode_message(encode_event(event), headers=headers) == event
+
+    with pytest.raises(ValueError):
+        decode_message(b"", headers=[(CONTENT_TYPE_HEADER, b"text/plain")])
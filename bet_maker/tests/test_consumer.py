@@ -0,0 +1,167 @@
+import asyncio
+from typing import List
+from unittest.mock import AsyncMock
+
+import pytest
+from aiokafka import ConsumerRecord, TopicPartition  # type: ignore
+from app.consumer import PartitionedConsumer, PartitionOffsets
+
+TP = TopicPartition("line_provider", 0)
+
+
+def make_record(offset: int, key: str) -> ConsumerRecord:
+    return ConsumerRecord(
+        topic=TP.topic,
+        partition=TP.partition,
+        offset=offset,
+        timestamp=0,
+        timestamp_type=0,
+        key=key.encode("utf-8"),
+        value=f'{{"event_id": "{key}", "offset": {offset}}}',
+        checksum=None,
+        serialized_key_size=0,
+        serialized_value_size=0,
+        headers=[],
+    )
+
+
+class FakeConsumer:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.commit = AsyncMock()
+        self.assigned = {TP}
+
+    def assignment(self):
+        return self.assigned
+
+    async def getmany(self, timeout_ms, max_records):
+        if self.batches:
+            return self.batches.pop(0)
+        await asyncio.sleep(timeout_ms / 1000)
+        return {}
+
+
+def test_partition_offsets_commit_lowest_in_flight():
+    # Arrange
+    offsets = PartitionOffsets()
+    for offset in (10, 11, 12):
+        offsets.add(offset)
+
+    # Act & Assert
+    offsets.done(11)
+    assert offsets.committable() == 10
+
+    offsets.done(10)
+    assert offsets.committable() == 12
+
+    offsets.done(12)
+    assert offsets.committable() == 13
+
+
+@pytest.mark.asyncio
+async def test_partitioned_consumer_keeps_key_order_and_commits():
+    # Arrange
+    records = [make_record(offset, key) for offset, key in enumerate("abab")]
+    consumer = FakeConsumer([{TP: records}])
+    handled: List[List[str]] = []
+
+    async def handler(messages: List[ConsumerRecord]) -> None:
+        handled.append([message.value for message in messages])
+
+    engine = PartitionedConsumer(
+        consumer=consumer,
+        handler=handler,
+        buckets=4,
+        poll_timeout_ms=10,
+        commit_interval=0.01,
+    )
+
+    # Act
+    task = asyncio.create_task(engine.run())
+    await asyncio.sleep(0.1)
+    task.cancel()
+    await asyncio.wait([task])
+
+    # Assert
+    received = [message for messages in handled for message in messages]
+    assert sorted(received) == sorted(record.value for record in records)
+    for key in "ab":
+        key_messages = [message for message in received if f'"{key}"' in message]
+        assert key_messages == [r.value for r in records if r.key == key.encode()]
+    consumer.commit.assert_awaited_with({TP: 4})
+
+
+@pytest.mark.asyncio
+async def test_partitioned_consumer_retries_failed_records():
+    # Arrange
+    consumer = FakeConsumer([{TP: [make_record(0, "a")]}])
+    handler = AsyncMock(side_effect=[Exception("Database is down"), None])
+
+    engine = PartitionedConsumer(
+        consumer=consumer,
+        handler=handler,
+        poll_timeout_ms=10,
+        commit_interval=0.01,
+        retry_backoff=0.01,
+    )
+
+    # Act
+    task = asyncio.create_task(engine.run())
+    await asyncio.sleep(0.1)
+    task.cancel()
+    await asyncio.wait([task])
+
+    # Assert
+    assert handler.await_count == 2
+    consumer.commit.assert_awaited_with({TP: 1})
+
+
+@pytest.mark.asyncio
+async def test_partitioned_consumer_bounds_revoke_wait():
+    # Arrange
+    consumer = FakeConsumer([{TP: [make_record(0, "a")]}])
+    handler = AsyncMock(side_effect=Exception("Database is down"))
+
+    engine = PartitionedConsumer(
+        consumer=consumer,
+        handler=handler,
+        poll_timeout_ms=10,
+        commit_interval=10,
+        retry_backoff=0.01,
+        revoke_timeout=0.05,
+    )
+    task = asyncio.create_task(engine.run())
+    await asyncio.sleep(0.05)
+
+    # Act
+    consumer.assigned = set()
+    await asyncio.wait_for(engine.on_partitions_revoked({TP}), 1)
+    task.cancel()
+    await asyncio.wait([task])
+
+    # Assert
+    # Nothing completed, the failing record is left to the new owner
+    consumer.commit.assert_awaited_with({TP: 0})
+    assert not engine._workers
+
+
+@pytest.mark.asyncio
+async def test_partitioned_consumer_skips_revoked_partitions():
+    # Arrange
+    consumer = FakeConsumer([{TP: [make_record(0, "a")]}])
+    consumer.assigned = set()
+    handler = AsyncMock()
+
+    engine = PartitionedConsumer(
+        consumer=consumer, handler=handler, poll_timeout_ms=10, commit_interval=0.01
+    )
+
+    # Act
+    task = asyncio.create_task(engine.run())
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.wait([task])
+
+    # Assert
+    handler.assert_not_awaited()
+    consumer.commit.assert_not_awaited()
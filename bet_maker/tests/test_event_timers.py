@@ -0,0 +1,141 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.event_timers import EventTimers
+from app.models import BetStatus
+from app.tasks import check_event_settlements
+
+
+def make_timers(settled=(), settle_delay=0, settle_attempts=3):
+    return EventTimers(
+        on_close=AsyncMock(),
+        on_settle_check=AsyncMock(return_value=list(settled)),
+        settle_delay=settle_delay,
+        settle_attempts=settle_attempts,
+        max_size=100,
+    )
+
+
+def test_event_timers_close_at_deadline():
+    # Arrange
+    timers = make_timers(settle_delay=60)
+    deadline = int(time.time()) + 600
+    timers.track({"event_id": "1", "deadline": deadline, "state": 1})
+    # The deadline moved, the first timer is skipped
+    timers.track({"event_id": "1", "deadline": deadline + 10, "state": 1})
+
+    # Act
+    before = timers._pop_due(deadline + 5)
+    at_deadline = timers._pop_due(deadline + 10)
+    settle_check = timers._pop_due(deadline + 70)
+
+    # Assert
+    assert before == ([], [])
+    assert at_deadline == (["1"], [])
+    assert timers.is_closed("1")
+    assert settle_check == ([], ["1"])
+
+
+def test_event_timers_forget_finished_events():
+    # Arrange
+    timers = make_timers()
+    deadline = int(time.time()) + 600
+    timers.track({"event_id": "1", "deadline": deadline, "state": 1})
+
+    # Act
+    timers.track({"event_id": "1", "state": 2})
+
+    # Assert
+    assert timers._pop_due(deadline + 600) == ([], [])
+    assert timers.stats()["tracked"] == 0
+
+
+@pytest.mark.asyncio
+async def test_event_timers_check_settlement_after_deadline():
+    # Arrange
+    timers = make_timers(settled=["1"])
+    timers.track({"event_id": "1", "deadline": int(time.time()) - 1, "state": 1})
+
+    # Act
+    timers.start()
+    await asyncio.sleep(0.05)
+    await timers.stop()
+
+    # Assert
+    timers.on_settle_check.assert_awaited_once_with(["1"])
+    assert timers.stats()["settled"] == 1
+    assert timers.stats()["tracked"] == 0
+
+
+@pytest.mark.asyncio
+async def test_event_timers_retry_unsettled_events():
+    # Arrange
+    timers = make_timers(settle_attempts=2)
+    timers.track({"event_id": "1", "deadline": int(time.time()) - 1, "state": 1})
+
+    # Act
+    await timers._check_settlements(["1"])
+    retry = timers.heap[-1]
+    await timers._check_settlements(["1"])
+
+    # Assert
+    assert retry[2] == "settle_check" and retry[3] == "1"
+    # Left to the hourly sweep after the last attempt
+    assert timers.stats()["given_up"] == 1
+    assert not timers.is_closed("1")
+
+
+@pytest.mark.asyncio
+async def test_event_timers_close_while_settle_check_runs():
+    # Arrange
+    timers = make_timers(settle_delay=60)
+
+    async def hang(event_ids):
+        await asyncio.Event().wait()
+
+    timers.on_settle_check = hang
+    timers.track({"event_id": "1", "deadline": int(time.time()) - 120, "state": 1})
+    timers.track({"event_id": "2", "deadline": int(time.time()) + 1, "state": 1})
+
+    # Act
+    timers.start()
+    await asyncio.sleep(1.1)
+    running = timers.stats()["checks_running"]
+    await timers.stop()
+
+    # Assert
+    timers.on_close.assert_awaited_once_with(["2"])
+    assert running == 1
+    assert not timers.checks
+
+
+@pytest.mark.asyncio
+async def test_check_event_settlements_skips_leased_events():
+    # Arrange
+    @asynccontextmanager
+    async def db_and_redis():
+        yield AsyncMock(), AsyncMock()
+
+    lease = MagicMock()
+    lease.return_value.hold.return_value.__aenter__ = AsyncMock(return_value=None)
+    lease.return_value.hold.return_value.__aexit__ = AsyncMock(return_value=None)
+    settle_event = AsyncMock()
+
+    # Act
+    with patch("app.tasks.get_db_and_redis", db_and_redis), patch(
+        "app.tasks.get_events",
+        AsyncMock(return_value={"1": {"event_id": "1", "deadline": 1, "state": 2}}),
+    ), patch("app.tasks.get_settlement_status", return_value=BetStatus.WON), patch(
+        "app.tasks.settle_check_lease", lease
+    ), patch(
+        "app.tasks.settle_event", settle_event
+    ):
+        settled = await check_event_settlements(["1"])
+
+    # Assert
+    assert settled == []
+    assert lease.call_args.args[1] == "1"
+    settle_event.assert_not_awaited()
@@ -0,0 +1,231 @@
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.cache import event_cache
+from app.config import settings
+from app.operations.event import (
+    EVENTS_BY_DEADLINE,
+    EVENTS_SYNC_KEY,
+    cache_events,
+    get_events,
+    get_upcoming_events,
+    last_warmup,
+    merge_cached_event,
+    sync_events,
+    wait_for_cached_event,
+)
+from app.schemas import Event, EventState
+
+
+@pytest.fixture
+def redis_mock():
+    redis_mock = AsyncMock()
+
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    redis_mock.pipeline = MagicMock()
+    redis_mock.pipeline.return_value.__aenter__.return_value = pipe
+    redis_mock.pipeline.return_value.__aexit__.return_value = None
+
+    return redis_mock
+
+
+@pytest.mark.asyncio
+async def test_get_upcoming_events_reads_deadline_index(redis_mock):
+    # Arrange
+    pipe = redis_mock.pipeline.return_value.__aenter__.return_value
+    pipe.execute.return_value = [1, ["2", "3", "1"]]
+    redis_mock.mget.return_value = [
+        json.dumps({"event_id": "2", "deadline": 200}),
+        None,
+        json.dumps({"event_id": "1", "deadline": 300}),
+    ]
+
+    # Act
+    events = await get_upcoming_events(redis_client=redis_mock, limit=3, offset=10)
+
+    # Assert
+    assert [event["event_id"] for event in events] == ["2", "1"]
+    pipe.zremrangebyscore.assert_called_once()
+    assert pipe.zrangebyscore.call_args.kwargs == {"start": 10, "num": 3}
+    redis_mock.mget.assert_awaited_once_with(["event:2", "event:3", "event:1"])
+
+    # Index entries without a cached event are pruned
+    redis_mock.zrem.assert_awaited_once_with(EVENTS_BY_DEADLINE, "3")
+
+
+@pytest.mark.asyncio
+async def test_get_upcoming_events_empty_index(redis_mock):
+    # Arrange
+    pipe = redis_mock.pipeline.return_value.__aenter__.return_value
+    pipe.execute.return_value = [0, []]
+
+    # Act
+    events = await get_upcoming_events(redis_client=redis_mock)
+
+    # Assert
+    assert events == []
+    assert pipe.zrangebyscore.call_args.kwargs == {"start": 0, "num": -1}
+    redis_mock.mget.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_cache_events_in_chunked_pipelines(redis_mock):
+    # Arrange
+    deadline = int(time.time()) + 600
+    events = [{"event_id": str(i), "deadline": deadline} for i in range(5)]
+    events.append({"deadline": deadline})
+
+    # Act
+    with patch.object(settings, "warmup_chunk_size", 2):
+        cached = await cache_events(events=events, redis_client=redis_mock)
+
+    # Assert
+    assert cached == 5
+    pipe = redis_mock.pipeline.return_value.__aenter__.return_value
+    assert pipe.execute.await_count == 3
+    assert pipe.set.call_count == 5
+    assert pipe.zadd.call_count == 5
+
+    ttl = pipe.set.call_args.kwargs["ex"]
+    assert 600 < ttl <= 600 + settings.event_cache_retention
+
+
+@pytest.mark.asyncio
+async def test_get_events_fetches_only_misses(redis_mock):
+    # Arrange
+    event_cache.clear()
+    event_cache.set("1", {"event_id": "1"})
+    redis_mock.mget.return_value = [json.dumps({"event_id": "2"}), None, None]
+    client = MagicMock()
+    client.post = AsyncMock(
+        return_value=MagicMock(json=MagicMock(return_value=[{"event_id": "3"}]))
+    )
+
+    # Act
+    with patch.object(settings, "line_provider_batch_size", 1), patch(
+        "app.operations.event.get_line_provider_client", return_value=client
+    ):
+        events = await get_events(["1", "2", "3", "4", "1"], redis_client=redis_mock)
+
+    # Assert
+    assert sorted(events) == ["1", "2", "3"]
+    redis_mock.mget.assert_awaited_once_with(["event:2", "event:3", "event:4"])
+    # Upstream misses are requested in chunks of the batch size
+    assert [call.kwargs["json"] for call in client.post.await_args_list] == [
+        {"event_ids": ["3"]},
+        {"event_ids": ["4"]},
+    ]
+    assert event_cache.get("3") == {"event_id": "3"}
+    event_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_sync_events_applies_changes_since_stored_version(redis_mock):
+    # Arrange
+    redis_mock.hgetall.return_value = {"epoch": "a", "version": "7"}
+    pages = [
+        {"epoch": "a", "version": 8, "has_more": True, "events": [{"event_id": "1"}]},
+        {"epoch": "a", "version": 9, "has_more": False, "events": [{"event_id": "2"}]},
+    ]
+    client = MagicMock()
+    client.get = AsyncMock(
+        side_effect=[MagicMock(json=MagicMock(return_value=page)) for page in pages]
+    )
+
+    # Act
+    with patch(
+        "app.operations.event.get_line_provider_client", return_value=client
+    ), patch("app.operations.event.get_available_events") as full_warmup:
+        applied = await sync_events(redis_client=redis_mock)
+
+    # Assert
+    assert applied == 2
+    full_warmup.assert_not_called()
+    assert [call.kwargs["params"]["since"] for call in client.get.await_args_list] == [
+        7,
+        8,
+    ]
+    redis_mock.hset.assert_awaited_with(
+        EVENTS_SYNC_KEY, mapping={"epoch": "a", "version": 9}
+    )
+
+
+@pytest.mark.asyncio
+async def test_sync_events_full_warmup_on_new_epoch(redis_mock):
+    # Arrange
+    redis_mock.hgetall.return_value = {"epoch": "a", "version": "7"}
+    changes = {"epoch": "b", "version": 3, "latest": 3, "has_more": False}
+    client = MagicMock()
+    client.get = AsyncMock(return_value=MagicMock(json=MagicMock(return_value=changes)))
+
+    async def full_warmup(redis_client):
+        last_warmup["complete"] = True
+        return 3
+
+    # Act
+    with patch(
+        "app.operations.event.get_line_provider_client", return_value=client
+    ), patch("app.operations.event.get_available_events", side_effect=full_warmup):
+        loaded = await sync_events(redis_client=redis_mock)
+
+    # Assert
+    assert loaded == 3
+    redis_mock.hset.assert_awaited_once_with(
+        EVENTS_SYNC_KEY, mapping={"epoch": "b", "version": 3}
+    )
+
+
+@pytest.mark.asyncio
+async def test_wait_for_cached_event_stops_when_lock_released(redis_mock):
+    # Arrange
+    pipe = redis_mock.pipeline.return_value.__aenter__.return_value
+    pipe.execute.side_effect = [[None, 1], [None, 0]]
+
+    # Act
+    with patch.object(settings, "event_fetch_lock_ttl", 10), patch.object(
+        settings, "event_fetch_lock_poll_interval", 0.001
+    ):
+        started = time.monotonic()
+        event = await wait_for_cached_event("1", redis_client=redis_mock)
+
+    # Assert
+    # The holder failed to fetch, no point waiting out the lock TTL
+    assert event is None
+    assert time.monotonic() - started < 1
+    assert pipe.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_wait_for_cached_event_returns_cached(redis_mock):
+    # Arrange
+    event_cache.clear()
+    pipe = redis_mock.pipeline.return_value.__aenter__.return_value
+    pipe.execute.return_value = [json.dumps({"event_id": "1"}), 1]
+
+    # Act
+    with patch.object(settings, "event_fetch_lock_poll_interval", 0.001):
+        event = await wait_for_cached_event("1", redis_client=redis_mock)
+
+    # Assert
+    assert event == {"event_id": "1"}
+    pipe.exists.assert_called_once_with("lock:event:1")
+    event_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_merge_cached_event_passes_ttl_arguments(redis_mock):
+    # Arrange
+    script = AsyncMock(return_value='{"event_id": "1"}')
+    redis_mock.register_script = MagicMock(return_value=script)
+
+    # Act
+    await merge_cached_event(redis_mock, Event(event_id="1", state=EventState.NEW))
+
+    # Assert
+    args = script.await_args.kwargs["args"]
+    assert json.loads(args[0]) == {"event_id": "1", "state": 1}
+    assert abs(args[1] - time.time()) < 5
+    assert args[2] == settings.event_cache_retention
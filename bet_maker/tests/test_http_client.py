@@ -0,0 +1,130 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from app.errors import LineProviderUnavailableError
+from app.http_client import CircuitBreaker, LatencyHistogram, LineProviderClient
+
+
+def test_circuit_breaker_opens_after_threshold():
+    # Arrange
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    # Act
+    breaker.record_failure()
+    still_closed = breaker.allow()
+    breaker.record_failure()
+
+    # Assert
+    assert still_closed
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_circuit_breaker_half_open_trial():
+    # Arrange
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    # Act
+    allowed = breaker.allow()
+
+    # Assert
+    assert allowed
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_latency_histogram_cumulative_buckets():
+    # Arrange
+    histogram = LatencyHistogram(bounds=[0.1, 1])
+
+    # Act
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    # Assert
+    assert histogram.stats()["buckets"] == {"0.1": 1, "1": 2, "+Inf": 3}
+    assert histogram.stats()["count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_line_provider_client_fails_fast_when_open():
+    # Arrange
+    client = LineProviderClient()
+    client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    request = httpx.Request("GET", "http://line-provider/events/1")
+    get = AsyncMock(side_effect=httpx.ConnectError("refused", request=request))
+
+    # Act
+    with patch.object(client.client, "request", get):
+        with pytest.raises(httpx.ConnectError):
+            await client.get("/events/1")
+        with pytest.raises(LineProviderUnavailableError):
+            await client.get("/events/1")
+
+    # Assert
+    assert get.await_count == 1
+    assert client.breaker.state == CircuitBreaker.OPEN
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_line_provider_client_ignores_client_errors():
+    # Arrange
+    client = LineProviderClient()
+    client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    get = AsyncMock(return_value=httpx.Response(404))
+
+    # Act
+    with patch.object(client.client, "request", get):
+        response = await client.get("/events/1")
+
+    # Assert
+    assert response.status_code == 404
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    await client.aclose()
+
+
+def test_circuit_breaker_half_open_trial_expires():
+    # Arrange
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    breaker.opened_at -= 30
+    assert breaker.allow()
+
+    # Act
+    # The trial never reported back
+    blocked = breaker.allow()
+    breaker.opened_at -= 30
+    retried = breaker.allow()
+
+    # Assert
+    assert not blocked
+    assert retried
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+@pytest.mark.asyncio
+async def test_line_provider_client_cancelled_trial_reopens():
+    # Arrange
+    client = LineProviderClient()
+    client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    client.breaker.record_failure()
+    get = AsyncMock(side_effect=asyncio.CancelledError())
+
+    # Act
+    with patch.object(client.client, "request", get):
+        with pytest.raises(asyncio.CancelledError):
+            await client.get("/events/1")
+
+    # Assert
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.breaker.allow()
+    await client.aclose()
@@ -0,0 +1,134 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.models import BetStatus
+from app.partitioning import (
+    DEFAULT_PARTITION,
+    add_months,
+    drop_expired_partitions,
+    ensure_partitions,
+    partition_name,
+    split_default_partition,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@pytest.fixture
+def session_mock():
+    session_mock = AsyncMock(spec=AsyncSession)
+    session_mock.begin = MagicMock()
+    session_mock.begin.return_value.__aenter__.return_value = session_mock
+    session_mock.begin.return_value.__aexit__.return_value = None
+    return session_mock
+
+
+def test_add_months_wraps_years():
+    assert add_months(date(2026, 11, 17), 0) == date(2026, 11, 1)
+    assert add_months(date(2026, 11, 17), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    assert partition_name(date(2027, 1, 1)) == "bets_p2027_01"
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_creates_missing_months(session_mock):
+    # Act
+    with patch("app.partitioning.is_partitioned", AsyncMock(return_value=True)), patch(
+        "app.partitioning.list_partitions",
+        AsyncMock(return_value=["bets_default", "bets_p2026_12"]),
+    ), patch("app.partitioning.has_default_rows", AsyncMock(return_value=False)):
+        created = await ensure_partitions(
+            session_mock, months_ahead=2, today=date(2026, 11, 17)
+        )
+
+    # Assert
+    assert created == ["bets_p2026_11", "bets_p2027_01"]
+    statement = str(session_mock.execute.await_args_list[-1].args[0])
+    assert "FROM ('2027-01-01') TO ('2027-02-01')" in statement
+
+
+@pytest.mark.asyncio
+async def test_drop_expired_partitions_keeps_retention(session_mock):
+    # Arrange
+    partitions = ["bets_default", "bets_p2026_07", "bets_p2026_08", "bets_p2026_09"]
+    session_mock.execute.return_value = MagicMock(all=MagicMock(return_value=[]))
+
+    # Act
+    with patch("app.partitioning.is_partitioned", AsyncMock(return_value=True)), patch(
+        "app.partitioning.list_partitions", AsyncMock(return_value=partitions)
+    ):
+        dropped = await drop_expired_partitions(
+            session_mock, retention_months=2, today=date(2026, 10, 17)
+        )
+
+    # Assert
+    assert dropped == ["bets_p2026_07"]
+
+
+@pytest.mark.asyncio
+async def test_drop_expired_partitions_takes_bets_off_stats(session_mock):
+    # Arrange
+    session_mock.execute.return_value = MagicMock(
+        all=MagicMock(return_value=[("1", "WON", 2, Decimal("30.00"))])
+    )
+
+    # Act
+    with patch("app.partitioning.is_partitioned", AsyncMock(return_value=True)), patch(
+        "app.partitioning.list_partitions", AsyncMock(return_value=["bets_p2026_07"])
+    ), patch("app.partitioning.apply_bet_stats", AsyncMock()) as apply_bet_stats:
+        await drop_expired_partitions(
+            session_mock, retention_months=2, today=date(2026, 10, 17)
+        )
+
+    # Assert
+    apply_bet_stats.assert_awaited_once_with(
+        {("1", BetStatus.WON): (-2, Decimal("-30.00"))}, session_mock
+    )
+    statements = [str(call.args[0]) for call in session_mock.execute.await_args_list]
+    assert statements[0] == "ALTER TABLE bets DETACH PARTITION bets_p2026_07"
+    assert statements[-1] == "DROP TABLE bets_p2026_07"
+
+
+@pytest.mark.asyncio
+async def test_partition_maintenance_skips_plain_table(session_mock):
+    # Act
+    with patch("app.partitioning.is_partitioned", AsyncMock(return_value=False)):
+        created = await ensure_partitions(session_mock, months_ahead=2)
+
+    # Assert
+    assert created == []
+    session_mock.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_splits_default_rows(session_mock):
+    # Act
+    with patch("app.partitioning.is_partitioned", AsyncMock(return_value=True)), patch(
+        "app.partitioning.list_partitions", AsyncMock(return_value=["bets_default"])
+    ), patch("app.partitioning.has_default_rows", AsyncMock(return_value=True)), patch(
+        "app.partitioning.split_default_partition", AsyncMock()
+    ) as split:
+        created = await ensure_partitions(
+            session_mock, months_ahead=0, today=date(2026, 11, 17)
+        )
+
+    # Assert
+    assert created == ["bets_p2026_11"]
+    split.assert_awaited_once_with(session_mock, date(2026, 11, 1))
+
+
+@pytest.mark.asyncio
+async def test_split_default_partition_moves_month_rows(session_mock):
+    # Act
+    await split_default_partition(session_mock, date(2026, 11, 1))
+
+    # Assert
+    statements = [str(call.args[0]) for call in session_mock.execute.await_args_list]
+    assert statements[0] == f"ALTER TABLE bets DETACH PARTITION {DEFAULT_PARTITION}"
+    assert "FROM ('2026-11-01') TO ('2026-12-01')" in statements[1]
+    assert statements[2].startswith("INSERT INTO bets SELECT")
+    assert statements[3].startswith(f"DELETE FROM {DEFAULT_PARTITION}")
+    assert statements[4].endswith("DEFAULT")
+    # All in the one transaction
+    session_mock.begin.assert_called_once()
@@ -3,13 +3,16 @@ import uuid
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Any, Awaitable, Callable, Coroutine, Dict, cast
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
 import pytest
 import pytest_asyncio
 from app.dependencies import get_redis_client, get_session
+from app.errors import LineProviderUnavailableError
 from app.main import app_bet_maker as app
+from app.models import BetStatus
+from app.operations.bet import create_bet
 from app.schemas import BetCreate
 from fastapi import status
 from httpx import ASGITransport, AsyncClient, HTTPStatusError, Request
@@ -196,3 +199,131 @@ async def test_place_bet_failure(
     mock_get_event.assert_called_once_with(
         event_id=bet_create.event_id, redis_client=mock_redis_client
     )
+
+
+@pytest.mark.asyncio
+@patch("app.routes.bets.get_event", new_callable=AsyncMock)
+async def test_place_bet_on_closed_event(mock_get_event, async_client):
+    # Arrange
+    bet_create = BetCreate(event_id="closed_event", amount=Decimal("100.00"))
+    past_deadline = int((datetime.utcnow() - timedelta(minutes=1)).timestamp())
+    mock_get_event.return_value = {
+        "event_id": "closed_event",
+        "deadline": past_deadline,
+    }
+
+    # Act
+    with patch("app.event_timers.is_closed", return_value=True), patch(
+        "app.routes.bets.event_cache.invalidate"
+    ) as invalidate:
+        response = await async_client.post("/bets", json=bet_create.model_dump())
+
+    # Assert
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Betting deadline has passed"}
+    # Checked against the shared copy rather than the in-process one
+    invalidate.assert_called_once_with("closed_event")
+
+
+@pytest.mark.asyncio
+@patch("app.routes.bets.get_event", new_callable=AsyncMock)
+async def test_place_bet_after_deadline_extension(mock_get_event, async_client):
+    # Arrange
+    bet_create = BetCreate(event_id="extended_event", amount=Decimal("100.00"))
+    future_deadline = int((datetime.utcnow() + timedelta(hours=1)).timestamp())
+    event_data = {"event_id": "extended_event", "deadline": future_deadline}
+    mock_get_event.return_value = event_data
+
+    # Act
+    with patch("app.event_timers.is_closed", return_value=True), patch(
+        "app.event_timers.track_events"
+    ) as track_events, patch(
+        "app.routes.bets.create_bet", AsyncMock(return_value=uuid.uuid4())
+    ):
+        response = await async_client.post("/bets", json=bet_create.model_dump())
+
+    # Assert
+    assert response.status_code == status.HTTP_201_CREATED
+    track_events.assert_called_once_with([event_data])
+
+
+@pytest.mark.asyncio
+async def test_create_bet_returns_inserted_id():
+    # Arrange
+    bet_id = uuid.uuid4()
+    session = AsyncMock(spec=AsyncSession)
+    session.begin = MagicMock()
+    session.begin.return_value.__aenter__.return_value = session
+    session.begin.return_value.__aexit__.return_value = None
+    session.execute.return_value = MagicMock(scalar_one=MagicMock(return_value=bet_id))
+
+    # Act
+    with patch(
+        "app.operations.bet.apply_bet_stats", new_callable=AsyncMock
+    ) as mock_apply_bet_stats:
+        result = await create_bet(event_id="1", amount=Decimal("10"), session=session)
+
+    # Assert
+    assert result == str(bet_id)
+    session.execute.assert_awaited_once()
+    mock_apply_bet_stats.assert_awaited_once_with(
+        {("1", BetStatus.NOT_PLAYED): (1, Decimal("10"))}, session
+    )
+    query = str(session.execute.await_args.args[0])
+    assert query.startswith("INSERT INTO bets")
+    assert "RETURNING bets.id" in query
+
+
+@pytest.mark.asyncio
+@patch("app.routes.bets.get_events", new_callable=AsyncMock)
+@patch("app.routes.bets.create_bets", new_callable=AsyncMock)
+async def test_place_bets_batch(mock_create_bets, mock_get_events, async_client):
+    # Arrange
+    future_deadline = int((datetime.utcnow() + timedelta(days=1)).timestamp())
+    past_deadline = int((datetime.utcnow() - timedelta(days=1)).timestamp())
+    mock_get_events.return_value = {
+        "1": {"event_id": "1", "deadline": future_deadline},
+        "2": {"event_id": "2", "deadline": past_deadline},
+    }
+    bet_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    mock_create_bets.return_value = bet_ids
+    bets = [
+        {"event_id": "1", "amount": 10},
+        {"event_id": "2", "amount": 20},
+        {"event_id": "3", "amount": 30},
+        {"event_id": "1", "amount": 40},
+    ]
+
+    # Act
+    response = await async_client.post("/bets/batch", json={"bets": bets})
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["items"] == [
+        {"id": bet_ids[0], "error": None},
+        {"id": None, "error": "Betting deadline has passed"},
+        {"id": None, "error": "Event not found"},
+        {"id": bet_ids[1], "error": None},
+    ]
+    mock_get_events.assert_awaited_once()
+    created = mock_create_bets.await_args.kwargs["bets"]
+    assert [bet.amount for bet in created] == [Decimal("10"), Decimal("40")]
+
+
+@pytest.mark.asyncio
+@patch("app.routes.bets.get_events", new_callable=AsyncMock)
+@patch("app.routes.bets.create_bets", new_callable=AsyncMock)
+async def test_place_bets_batch_upstream_unavailable(
+    mock_create_bets, mock_get_events, async_client
+):
+    # Arrange
+    mock_get_events.side_effect = LineProviderUnavailableError("circuit is open")
+    bets = [{"event_id": "1", "amount": 10}]
+
+    # Act
+    response = await async_client.post("/bets/batch", json={"bets": bets})
+
+    # Assert
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert mock_get_events.await_args.kwargs["raise_errors"] is True
+    mock_create_bets.assert_not_awaited()
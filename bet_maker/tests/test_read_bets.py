@@ -1,12 +1,22 @@
+import csv
+import io
+import json
 import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from typing import cast
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from app.dependencies import get_read_session
+from app.main import app_bet_maker as app
 from app.models import BetStatus
-from app.routes.bets import read_bets
-from app.schemas import BetResponse, PaginatedBetsHistory
-from fastapi import HTTPException
+from app.operations.bet import decode_cursor, encode_cursor
+from app.operations.export import export_bets
+from app.routes.bets import MAX_PAGE_SIZE, export_bets_history, read_bets
+from app.schemas import BetResponse, CursorBetsHistory, PaginatedBetsHistory
+from fastapi import HTTPException, status
+from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.selectable import Select
 
@@ -65,3 +75,198 @@ async def test_read_bets_exception(session_mock: AsyncSession):
 
         # Assert
         assert str(exc_info.value.detail) == "Failed to get bets"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params",
+    [{"size": 0}, {"size": -1}, {"size": MAX_PAGE_SIZE + 1}, {"page": 0}],
+)
+async def test_read_bets_rejects_out_of_range_paging(params, session_mock):
+    # Arrange
+    app.dependency_overrides[get_read_session] = lambda: session_mock
+
+    # Act
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"  # type: ignore
+        ) as client:
+            response = await client.get("/bets", params=params)
+    finally:
+        app.dependency_overrides.clear()
+
+    # Assert
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    session_mock.execute.assert_not_awaited()
+
+
+def test_cursor_round_trip():
+    # Arrange
+    created_at = datetime(2024, 8, 13, 1, 32, 47, 493692)
+    bet_id = uuid.uuid4()
+
+    # Act
+    cursor = encode_cursor(created_at, bet_id)
+
+    # Assert
+    assert decode_cursor(cursor) == (created_at, bet_id)
+
+
+@pytest.mark.asyncio
+async def test_read_bets_keyset_page(session_mock: AsyncSession):
+    # Arrange
+    rows = [
+        MagicMock(
+            id=uuid.uuid4(),
+            status=BetStatus.NOT_PLAYED,
+            created_at=datetime(2024, 1, day),
+        )
+        for day in (1, 2, 3)
+    ]
+    mock_result = MagicMock()
+    mock_result.all.return_value = rows
+    cursor = encode_cursor(datetime(2023, 12, 31), uuid.uuid4())
+
+    with patch.object(session_mock, "execute", new_callable=AsyncMock) as mock_execute:
+        mock_execute.return_value = mock_result
+
+        # Act
+        result = await read_bets(size=2, cursor=cursor, session=session_mock)
+
+        # Assert
+        query = mock_execute.call_args[0][0]
+        assert isinstance(query, Select)
+        assert "ORDER BY bets.created_at, bets.id" in str(query)
+        assert "(bets.created_at, bets.id) >" in str(query)
+        # Only the page query, no count
+        mock_execute.assert_awaited_once()
+
+    assert isinstance(result, CursorBetsHistory)
+    assert [item.id for item in result.items] == [rows[0].id, rows[1].id]
+    assert decode_cursor(result.next_cursor) == (rows[1].created_at, rows[1].id)
+    assert result.total is None
+
+
+@pytest.mark.asyncio
+async def test_read_bets_invalid_cursor(session_mock: AsyncSession):
+    # Act
+    with pytest.raises(HTTPException) as exc_info:
+        await read_bets(cursor="not-a-cursor", session=session_mock)
+
+    # Assert
+    assert exc_info.value.status_code == 400
+
+
+def export_session_factory(partitions):
+    result = MagicMock()
+
+    async def iterate_partitions():
+        for rows in partitions:
+            yield rows
+
+    result.partitions = iterate_partitions
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=None)
+    session.begin = MagicMock()
+    session.begin.return_value.__aenter__ = AsyncMock()
+    session.begin.return_value.__aexit__ = AsyncMock(return_value=None)
+    session.stream = AsyncMock(return_value=result)
+    session.close = AsyncMock()
+    return AsyncMock(return_value=MagicMock(return_value=session)), session
+
+
+def export_row(status: BetStatus):
+    row = MagicMock()
+    row.id = uuid.UUID(int=1)
+    row.event_id = "event-1"
+    row.amount = Decimal("10.50")
+    row.status = status
+    row.created_at = datetime(2026, 1, 1, 12, 0)
+    row.updated_at = datetime(2026, 1, 1, 12, 0)
+    return row
+
+
+@pytest.mark.asyncio
+async def test_export_bets_streams_ndjson_per_partition():
+    # Arrange
+    factory, session = export_session_factory(
+        [[export_row(BetStatus.WON)], [export_row(BetStatus.LOST)]]
+    )
+
+    # Act
+    with patch("app.operations.export.get_read_sessionmaker", factory):
+        chunks = [chunk async for chunk in await export_bets("ndjson")]
+
+    # Assert
+    assert len(chunks) == 2
+    first = json.loads(chunks[0])
+    assert first["id"] == str(uuid.UUID(int=1))
+    assert first["amount"] == "10.50"
+    assert first["status"] == BetStatus.WON.value
+    assert first["created_at"] == "2026-01-01T12:00:00"
+    query = session.stream.call_args.args[0]
+    assert query.get_execution_options()["yield_per"] > 0
+    session.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_export_bets_csv_starts_with_header():
+    # Arrange
+    factory, _ = export_session_factory([[export_row(BetStatus.NOT_PLAYED)]])
+
+    # Act
+    with patch("app.operations.export.get_read_sessionmaker", factory):
+        chunks = [chunk async for chunk in await export_bets("csv")]
+
+    # Assert
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert rows[0] == ["id", "event_id", "amount", "status", "created_at", "updated_at"]
+    assert rows[1][1:4] == ["event-1", "10.50", BetStatus.NOT_PLAYED.value]
+
+
+@pytest.mark.asyncio
+async def test_export_bets_history_rejects_unknown_format_and_status():
+    # Act
+    with pytest.raises(HTTPException) as format_error:
+        await export_bets_history(format="xml")
+    with pytest.raises(HTTPException) as status_error:
+        await export_bets_history(format="csv", bet_status="PENDING")
+
+    # Assert
+    assert format_error.value.status_code == 422
+    assert status_error.value.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_bets_history_fails_before_streaming():
+    # Arrange
+    factory, session = export_session_factory([])
+    session.stream.side_effect = OSError("connection refused")
+
+    # Act
+    with patch("app.operations.export.get_read_sessionmaker", factory):
+        with pytest.raises(HTTPException) as exc_info:
+            await export_bets_history(format="ndjson", bet_status=None)
+
+    # Assert
+    assert exc_info.value.status_code == 500
+    session.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_export_bets_history_compares_naive_utc():
+    # Act
+    with patch("app.routes.bets.export_bets", AsyncMock()) as mock_export_bets:
+        await export_bets_history(
+            format="csv",
+            bet_status=None,
+            created_from=datetime(
+                2026, 1, 1, 14, 0, tzinfo=timezone(timedelta(hours=2))
+            ),
+        )
+
+    # Assert
+    assert mock_export_bets.await_args.kwargs["created_from"] == datetime(
+        2026, 1, 1, 12, 0
+    )
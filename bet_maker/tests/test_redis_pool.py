@@ -0,0 +1,33 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from app.redis_pool import InstrumentedConnectionPool
+from redis.exceptions import ConnectionError, TimeoutError
+
+
+@pytest.mark.asyncio
+async def test_pool_counts_exhaustion_apart_from_connection_errors():
+    # Arrange
+    pool = InstrumentedConnectionPool.from_url(
+        "redis://localhost:6379", max_connections=1, timeout=0.01
+    )
+    refused = ConnectionError("Connection refused")
+    exhausted = ConnectionError("No connection available.")
+    exhausted.__cause__ = asyncio.TimeoutError()
+    connect_timeout = TimeoutError("Timeout connecting to server")
+
+    # Act
+    with patch(
+        "redis.asyncio.BlockingConnectionPool.get_connection",
+        AsyncMock(side_effect=[refused, exhausted, connect_timeout]),
+    ):
+        for _ in range(3):
+            with pytest.raises((ConnectionError, TimeoutError)):
+                await pool.get_connection("GET")
+
+    # Assert
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["connection_errors"] == 2
+    assert stats["acquired"] == 0
@@ -0,0 +1,108 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.replica import ReplicaRouter
+
+
+def make_sessionmaker(lag=None, error=None):
+    session = AsyncMock()
+    if error:
+        session.execute.side_effect = error
+    else:
+        session.execute.return_value = MagicMock(scalar_one=MagicMock(return_value=lag))
+    sessionmaker = MagicMock()
+    sessionmaker.return_value.__aenter__.return_value = session
+    sessionmaker.return_value.__aexit__.return_value = None
+    return sessionmaker
+
+
+def make_router(replica, primary, check_interval=10, timeout=1):
+    return ReplicaRouter(
+        replica, primary, max_lag=1, check_interval=check_interval, timeout=timeout
+    )
+
+
+@pytest.mark.asyncio
+async def test_replica_router_uses_fresh_replica():
+    # Arrange
+    replica, primary = make_sessionmaker(lag=0.5), make_sessionmaker()
+    router = make_router(replica, primary)
+
+    # Act
+    # Served from the primary until the first check completes
+    unchecked = await router.session_factory()
+    await router.checking
+    first = await router.session_factory()
+    second = await router.session_factory()
+
+    # Assert
+    assert unchecked is primary
+    assert first is replica and second is replica
+    # The lag is checked once per interval
+    assert replica.call_count == 1
+    assert router.stats()["replica_sessions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_replica_router_falls_back_to_primary():
+    # Arrange
+    replica, primary = make_sessionmaker(lag=30), make_sessionmaker()
+    router = make_router(replica, primary)
+    session = replica.return_value.__aenter__.return_value
+
+    # Act
+    lagging = await router.check()
+    session.execute.return_value.scalar_one.return_value = None
+    not_streaming = await router.check()
+    session.execute.side_effect = OSError()
+    unreachable = await router.check()
+
+    # Assert
+    assert not (lagging or not_streaming or unreachable)
+    assert router.stats()["check_failures"] == 1
+    assert "pg_stat_wal_receiver" in str(session.execute.await_args.args[0])
+
+
+@pytest.mark.asyncio
+async def test_replica_router_does_not_wait_for_check():
+    # Arrange
+    replica, primary = make_sessionmaker(), make_sessionmaker()
+    session = replica.return_value.__aenter__.return_value
+    session.execute.side_effect = lambda query: asyncio.sleep(10)
+    router = make_router(replica, primary, check_interval=0, timeout=0.01)
+
+    # Act
+    first = await router.session_factory()
+    second = await router.session_factory()
+    await router.checking
+
+    # Assert
+    assert first is primary and second is primary
+    # One check in flight at a time, given up after the timeout
+    assert replica.call_count == 1
+    assert router.stats()["check_failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_replica_router_rechecks_after_interval():
+    # Arrange
+    replica, primary = make_sessionmaker(error=OSError()), make_sessionmaker()
+    router = make_router(replica, primary, check_interval=5)
+    session = replica.return_value.__aenter__.return_value
+
+    # Act
+    with patch("app.replica.time.monotonic", return_value=100):
+        await router.check()
+    session.execute.side_effect = None
+    session.execute.return_value = MagicMock(scalar_one=MagicMock(return_value=0))
+    with patch("app.replica.time.monotonic", return_value=103):
+        within_interval = await router.session_factory()
+    with patch("app.replica.time.monotonic", return_value=106):
+        await router.session_factory()
+        await router.checking
+        after = await router.session_factory()
+
+    # Assert
+    assert within_interval is primary
+    assert after is replica
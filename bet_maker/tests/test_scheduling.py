@@ -0,0 +1,228 @@
+import json
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.errors import StaleLeaseError
+from app.scheduling import (
+    INSTANCE_ID,
+    LeaseLock,
+    check_fence,
+    get_shard,
+    in_shard,
+)
+from app.tasks import resume_settlements_scheduler, run_pending_bets_sweep
+
+
+def make_redis_client(*script_results):
+    """Redis client mock whose registered scripts return `script_results`"""
+    redis_client = AsyncMock()
+    calls = []
+    results = iter(script_results)
+
+    def call(**kwargs):
+        calls.append(kwargs)
+        return next(results)
+
+    redis_client.register_script = MagicMock(
+        side_effect=lambda script: AsyncMock(side_effect=call)
+    )
+    return redis_client, calls
+
+
+@pytest.mark.asyncio
+async def test_lease_lock_holds_and_releases_with_token():
+    # Arrange
+    redis_client, calls = make_redis_client(7, 1)
+    lease = LeaseLock(redis_client, "sweep", ttl=60)
+
+    # Act
+    async with lease.hold() as token:
+        pass
+
+    # Assert
+    assert token == 7
+    acquire, release = calls
+    assert acquire == {
+        "keys": ["scheduler:sweep:lease", "scheduler:sweep:token"],
+        "args": [INSTANCE_ID, 60000],
+    }
+    assert release == {"keys": ["scheduler:sweep:lease"], "args": [INSTANCE_ID]}
+    redis_client.eval.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_lease_lock_yields_none_when_taken():
+    # Arrange
+    redis_client, calls = make_redis_client(None)
+    lease = LeaseLock(redis_client, "sweep", ttl=60)
+
+    # Act
+    async with lease.hold() as token:
+        pass
+
+    # Assert
+    assert token is None
+    # Nothing to release
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_check_fence_rejects_stale_token():
+    # Arrange
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(
+        scalar_one_or_none=MagicMock(return_value=None)
+    )
+
+    # Act / Assert
+    with pytest.raises(StaleLeaseError):
+        await check_fence(session, "sweep", 3)
+
+
+def make_cluster(live, snapshot=None):
+    """Redis client mock with `live` members and the cycle's `snapshot`"""
+    redis_client = AsyncMock()
+    redis_client.zrangebyscore.return_value = live
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(
+        return_value=[
+            snapshot is None,
+            json.dumps(sorted(live) if snapshot is None else snapshot),
+        ]
+    )
+    redis_client.pipeline = MagicMock()
+    redis_client.pipeline.return_value.__aenter__.return_value = pipe
+    redis_client.pipeline.return_value.__aexit__.return_value = None
+    return redis_client, pipe
+
+
+@pytest.mark.asyncio
+async def test_get_shard_of_live_members():
+    # Arrange
+    members = ["zz-other", INSTANCE_ID, "0-other"]
+    redis_client, pipe = make_cluster(members)
+
+    # Act
+    shard = await get_shard(redis_client, "sweep", 3600)
+
+    # Assert
+    assert shard == (sorted(members).index(INSTANCE_ID), 3)
+    # Snapshot for the other members of the cycle
+    assert pipe.set.call_args.kwargs["nx"] is True
+
+
+@pytest.mark.asyncio
+async def test_get_shard_uses_snapshot_of_the_cycle():
+    # Arrange
+    # Another member left since the snapshot of this cycle was taken
+    redis_client, _ = make_cluster(
+        [INSTANCE_ID], snapshot=sorted(["0-other", INSTANCE_ID])
+    )
+    late_client, _ = make_cluster([INSTANCE_ID], snapshot=["0-other", "1-other"])
+
+    # Act
+    shard = await get_shard(redis_client, "sweep", 3600)
+    late = await get_shard(late_client, "sweep", 3600)
+
+    # Assert
+    assert shard == (sorted(["0-other", INSTANCE_ID]).index(INSTANCE_ID), 2)
+    # Joined after the snapshot, the others cover its events
+    assert late is None
+
+
+def test_in_shard_assigns_every_event_once():
+    # Arrange
+    event_ids = [f"event-{i}" for i in range(100)]
+
+    # Act
+    shards = [[e for e in event_ids if in_shard(e, (i, 3))] for i in range(3)]
+
+    # Assert
+    assert sorted(sum(shards, [])) == sorted(event_ids)
+    assert all(shards)
+
+
+@pytest.mark.asyncio
+async def test_run_pending_bets_sweep_with_lease():
+    # Arrange
+    redis_client = AsyncMock()
+    redis_client.register_script = MagicMock()
+    redis_client.exists.return_value = 0
+    sweep = AsyncMock(return_value={"settled": 2})
+
+    # Act
+    with patch("app.tasks.update_not_playyed_bets", sweep), patch(
+        "app.scheduling.LeaseLock.acquire", AsyncMock(return_value=5)
+    ), patch("app.scheduling.LeaseLock.release", AsyncMock()):
+        report = await run_pending_bets_sweep(
+            session=AsyncMock(), redis_client=redis_client, read_session=AsyncMock()
+        )
+
+    # Assert
+    assert report == {"settled": 2}
+    assert sweep.await_args.kwargs["fencing_token"] == 5
+    # Marks the interval as done for the other instances
+    redis_client.set.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_run_pending_bets_sweep_skips_swept_interval():
+    # Arrange
+    redis_client = AsyncMock()
+    redis_client.exists.return_value = 1
+    sweep = AsyncMock()
+
+    # Act
+    with patch("app.tasks.update_not_playyed_bets", sweep):
+        report = await run_pending_bets_sweep(
+            session=AsyncMock(), redis_client=redis_client, read_session=AsyncMock()
+        )
+
+    # Assert
+    assert report is None
+    sweep.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_run_pending_bets_sweep_in_shard_mode():
+    # Arrange
+    sweep = AsyncMock(return_value={"settled": 0})
+
+    # Act
+    with patch("app.tasks.update_not_playyed_bets", sweep), patch(
+        "app.tasks.settings.sweep_coordination", "shard"
+    ), patch("app.tasks.get_shard", AsyncMock(return_value=(1, 3))):
+        await run_pending_bets_sweep(
+            session=AsyncMock(), redis_client=AsyncMock(), read_session=AsyncMock()
+        )
+
+    # Assert
+    assert sweep.await_args.kwargs["shard"] == (1, 3)
+
+
+@pytest.mark.asyncio
+async def test_resume_settlements_scheduler_resumes_once_per_interval():
+    # Arrange
+    session, redis_client = AsyncMock(), AsyncMock()
+    redis_client.register_script = MagicMock()
+    redis_client.exists.return_value = 0
+
+    @asynccontextmanager
+    async def db_and_redis():
+        yield session, redis_client
+
+    resume_settlements = AsyncMock(return_value=["1"])
+
+    # Act
+    # The body of one repetition, without the repeat_every loop around it
+    with patch("app.tasks.get_db_and_redis", db_and_redis), patch(
+        "app.tasks.resume_settlements", resume_settlements
+    ), patch("app.scheduling.LeaseLock.acquire", AsyncMock(return_value=3)), patch(
+        "app.scheduling.LeaseLock.release", AsyncMock()
+    ):
+        await resume_settlements_scheduler.__wrapped__()
+
+    # Assert
+    resume_settlements.assert_awaited_once_with(session)
+    assert "resume-settlements" in redis_client.set.await_args.args[0]
@@ -0,0 +1,149 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.config import settings
+from app.models import BetStatus, SettlementState
+from app.operations.settlement import settle_event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@pytest.fixture
+def session_mock():
+    session_mock = AsyncMock(spec=AsyncSession)
+    session_mock.begin = MagicMock()
+    session_mock.begin.return_value.__aenter__.return_value = session_mock
+    session_mock.begin.return_value.__aexit__.return_value = None
+    return session_mock
+
+
+def ids_result(bet_ids):
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = bet_ids
+    return result
+
+
+def claimed(claimed: bool = True):
+    return MagicMock(
+        scalar_one_or_none=MagicMock(return_value="1" if claimed else None)
+    )
+
+
+@pytest.mark.asyncio
+async def test_settle_event_in_chunks(session_mock):
+    # Arrange
+    bet_ids = sorted(uuid.uuid4() for _ in range(3))
+    settlement = MagicMock(last_bet_id=None, status=BetStatus.WON)
+    settlement.state = SettlementState.RUNNING
+    session_mock.execute.side_effect = [
+        # Start: insert unless it exists, lock it, claim it, read it back
+        MagicMock(),
+        MagicMock(scalar_one=MagicMock(return_value=settlement)),
+        claimed(),
+        MagicMock(scalar_one=MagicMock(return_value=settlement)),
+        # Full chunk, then the last one, each renewing the claim first and
+        # recording its progress last
+        claimed(),
+        ids_result(bet_ids[:2]),
+        MagicMock(),
+        claimed(),
+        ids_result(bet_ids[2:]),
+        MagicMock(),
+    ]
+
+    # Act
+    with patch.object(settings, "settlement_batch_size", 2), patch(
+        "app.operations.settlement.settle_bets", AsyncMock(side_effect=[2, 1])
+    ) as mock_settle_bets:
+        settled = await settle_event(
+            event_id="1", new_status=BetStatus.WON, session=session_mock
+        )
+
+    # Assert
+    assert settled == 3
+    # One transaction to start and one per chunk
+    assert session_mock.begin.call_count == 3
+    assert [call.kwargs["params"] for call in mock_settle_bets.await_args_list] == [
+        {"bet_ids": bet_ids[:2]},
+        {"bet_ids": bet_ids[2:]},
+    ]
+    calls = session_mock.execute.await_args_list
+    assert "ON CONFLICT (event_id) DO NOTHING" in str(calls[0].args[0])
+    # Every chunk renews the claim of this owner
+    owner = calls[2].args[0].compile().params["owner"]
+    assert calls[7].args[0].compile().params["owner_1"] == owner
+    # The second chunk starts after the last bet of the first one
+    assert calls[8].args[0].compile().params["id_1"] == bet_ids[1]
+    progress = calls[9].args[0].compile().params
+    assert progress["last_bet_id"] == bet_ids[2]
+    assert progress["state"] == SettlementState.DONE
+    assert progress["owner"] is None
+
+
+@pytest.mark.asyncio
+async def test_settle_event_skips_finished_settlement(session_mock):
+    # Arrange
+    settlement = MagicMock(status=BetStatus.LOST, state=SettlementState.DONE)
+    session_mock.execute.return_value = MagicMock(
+        scalar_one=MagicMock(return_value=settlement)
+    )
+
+    # Act
+    settled = await settle_event(
+        event_id="1", new_status=BetStatus.LOST, session=session_mock
+    )
+
+    # Assert
+    assert settled == 0
+    assert session_mock.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_settle_event_skips_settlement_claimed_elsewhere(session_mock):
+    # Arrange
+    settlement = MagicMock(status=BetStatus.WON, state=SettlementState.RUNNING)
+    session_mock.execute.side_effect = [
+        MagicMock(),
+        MagicMock(scalar_one=MagicMock(return_value=settlement)),
+        claimed(False),
+    ]
+
+    # Act
+    with patch(
+        "app.operations.settlement.settle_bets", AsyncMock()
+    ) as mock_settle_bets:
+        settled = await settle_event(
+            event_id="1", new_status=BetStatus.WON, session=session_mock
+        )
+
+    # Assert
+    assert settled == 0
+    mock_settle_bets.assert_not_awaited()
+    claim = str(session_mock.execute.await_args_list[2].args[0])
+    assert "settlements.lease_until <" in claim
+
+
+@pytest.mark.asyncio
+async def test_settle_event_stops_when_taken_over(session_mock):
+    # Arrange
+    settlement = MagicMock(last_bet_id=None, status=BetStatus.WON)
+    settlement.state = SettlementState.RUNNING
+    session_mock.execute.side_effect = [
+        MagicMock(),
+        MagicMock(scalar_one=MagicMock(return_value=settlement)),
+        claimed(),
+        MagicMock(scalar_one=MagicMock(return_value=settlement)),
+        claimed(False),
+    ]
+
+    # Act
+    with patch(
+        "app.operations.settlement.settle_bets", AsyncMock()
+    ) as mock_settle_bets:
+        settled = await settle_event(
+            event_id="1", new_status=BetStatus.WON, session=session_mock
+        )
+
+    # Assert
+    assert settled == 0
+    mock_settle_bets.assert_not_awaited()
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from app.cache import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    # Arrange
+    single_flight = SingleFlight(error_ttl=1)
+    calls = 0
+
+    async def fetch() -> dict:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"event_id": "1"}
+
+    # Act
+    results = await asyncio.gather(*(single_flight.do("1", fetch) for _ in range(10)))
+
+    # Assert
+    assert calls == 1
+    assert results == [{"event_id": "1"}] * 10
+    assert single_flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_caches_failures():
+    # Arrange
+    single_flight = SingleFlight(error_ttl=60)
+    calls = 0
+
+    async def fetch() -> dict:
+        nonlocal calls
+        calls += 1
+        raise ValueError("Event not found")
+
+    # Act
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            await single_flight.do("1", fetch)
+
+    # Assert
+    assert calls == 1
@@ -0,0 +1,170 @@
+import json
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.cache import event_cache
+from app.config import settings
+from app.models import BetStatus
+from app.operations.bet import (
+    coalesce_events,
+    update_events_status,
+    update_not_playyed_bets,
+)
+from app.schemas import Event, EventState
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@pytest.fixture
+def session_mock():
+    session_mock = AsyncMock(spec=AsyncSession)
+
+    # Mock the transaction context manager
+    session_mock.begin = MagicMock()
+    session_mock.begin.return_value.__aenter__.return_value = session_mock
+    session_mock.begin.return_value.__aexit__.return_value = None
+
+    result = MagicMock()
+    result.rowcount = 3
+    session_mock.execute.return_value = result
+
+    return session_mock
+
+
+@pytest.fixture
+def redis_mock():
+    redis_mock = AsyncMock()
+
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    pipe.register_script.return_value = AsyncMock()
+    redis_mock.pipeline = MagicMock()
+    redis_mock.pipeline.return_value.__aenter__.return_value = pipe
+    redis_mock.pipeline.return_value.__aexit__.return_value = None
+
+    return redis_mock
+
+
+def test_coalesce_events_applies_updates_in_order():
+    # Arrange
+    events = [
+        Event(event_id="1", coefficient="1.2", state=EventState.NEW),
+        Event(event_id="2", deadline=200),
+        Event(event_id="1", coefficient="1.3"),
+        Event(event_id="1", state=EventState.FINISHED_LOSE),
+    ]
+
+    # Act
+    coalesced = coalesce_events(events)
+
+    # Assert
+    assert [event.event_id for event in coalesced] == ["1", "2"]
+    assert coalesced[0].model_dump(exclude_unset=True) == {
+        "event_id": "1",
+        "coefficient": Decimal("1.3"),
+        "state": EventState.FINISHED_LOSE,
+    }
+    assert coalesced[1].model_fields_set == {"event_id", "deadline"}
+
+
+@pytest.mark.asyncio
+async def test_update_events_status_batch(session_mock, redis_mock):
+    # Arrange
+    pipe = redis_mock.pipeline.return_value.__aenter__.return_value
+    pipe.execute.return_value = [
+        json.dumps({"event_id": "1", "coefficient": "1.5", "state": 2}),
+        json.dumps({"event_id": "2", "deadline": 200, "state": 1}),
+    ]
+    events = [
+        Event(event_id="1", coefficient="1.5"),
+        Event(event_id="2", deadline=200, state=EventState.NEW),
+        Event(event_id="1", state=EventState.FINISHED_WIN),
+    ]
+
+    # Act
+    with patch(
+        "app.operations.bet.settle_event", AsyncMock(return_value=3)
+    ) as mock_settle_event:
+        responses = await update_events_status(
+            events=events, session=session_mock, redis_client=redis_mock
+        )
+
+    # Assert
+    merge_script = pipe.register_script.return_value
+    merges = [call.kwargs for call in merge_script.await_args_list]
+    assert [merge["keys"][0] for merge in merges] == ["event:1", "event:2"]
+    assert json.loads(merges[0]["args"][0]) == {
+        "event_id": "1",
+        "coefficient": "1.5",
+        "state": EventState.FINISHED_WIN.value,
+    }
+    pipe.execute.assert_awaited_once()
+    assert event_cache.get("2") == {"event_id": "2", "deadline": 200, "state": 1}
+
+    # Updates of event 1 are coalesced into one merge and one settlement
+    mock_settle_event.assert_awaited_once_with(
+        event_id="1", new_status=BetStatus.WON, session=session_mock
+    )
+    assert responses == [
+        {"message": "Updated 3 bets for event 1"},
+        {"message": "Event 2 has no bets to update"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_update_events_status_raises_on_database_error(session_mock, redis_mock):
+    # Arrange
+    session_mock.execute.side_effect = Exception("Database is down")
+
+    # Act
+    with pytest.raises(Exception) as exc_info:
+        await update_events_status(
+            events=[Event(event_id="1", state=EventState.FINISHED_LOSE)],
+            session=session_mock,
+            redis_client=redis_mock,
+        )
+
+    # Assert
+    assert str(exc_info.value) == "Database is down"
+
+
+@pytest.mark.asyncio
+async def test_update_not_playyed_bets_settles_in_chunks(session_mock, redis_mock):
+    # Arrange
+    pending = MagicMock()
+    pending.scalars.return_value.all.return_value = ["1", "2", "3", "4"]
+    session_mock.execute.return_value = pending
+    events = {
+        "1": {"event_id": "1", "state": EventState.FINISHED_WIN.value},
+        "2": {"event_id": "2", "state": EventState.FINISHED_WIN.value},
+        "3": {"event_id": "3", "state": EventState.FINISHED_LOSE.value},
+        "4": {"event_id": "4", "state": EventState.NEW.value},
+    }
+
+    # Act
+    with patch.object(settings, "settlement_chunk_size", 1), patch(
+        "app.operations.bet.get_events", AsyncMock(return_value=events)
+    ), patch(
+        "app.operations.bet.settle_bets", AsyncMock(return_value=5)
+    ) as mock_settle_bets:
+        report = await update_not_playyed_bets(
+            session=session_mock, redis_client=redis_mock
+        )
+
+    # Assert
+    updates = [call.kwargs for call in mock_settle_bets.await_args_list]
+    assert [update["params"] for update in updates] == [
+        {"event_ids": ["1"]},
+        {"event_ids": ["2"]},
+        {"event_ids": ["3"]},
+    ]
+    assert [update["new_status"] for update in updates] == [
+        BetStatus.WON,
+        BetStatus.WON,
+        BetStatus.LOST,
+    ]
+    assert report["events"] == 4
+    assert report["settled"] == 15
+    assert len(report["chunks"]) == 3
+    # One short transaction per chunk, after the one listing the events
+    assert session_mock.begin.call_count == 4
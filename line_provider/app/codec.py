@@ -0,0 +1,62 @@
+import struct
+
+from pydantic import BaseModel
+
+CONTENT_TYPE_HEADER = "content-type"
+BINARY_CONTENT_TYPE = "application/vnd.line-provider.event.v1"
+
+BINARY_VERSION = 1
+
+# Field flags, bit per optional field in the order they are written
+COEFFICIENT, DEADLINE, STATE = 1, 2, 4
+
+# version, set fields, null fields, event_id length
+_HEADER = struct.Struct(">BBBH")
+_DEADLINE = struct.Struct(">q")
+
+# Limits of the length fields, longer values raise ValueError
+MAX_EVENT_ID_LENGTH = 0xFFFF
+MAX_COEFFICIENT_LENGTH = 0xFF
+
+
+def encode_event(event: BaseModel) -> bytes:
+    """Encode the fields set on an event in the v1 binary format.
+
+    Must stay in sync with `app.codec.decode_event` in bet_maker, the
+    golden payloads in tests/test_codec.py of both services pin the format.
+    Raises ValueError when the event id or coefficient don't fit their
+    length fields.
+    """
+    # Read the set fields directly, model_dump costs more than the encoding
+    data = {name: getattr(event, name) for name in event.model_fields_set}
+    event_id = data["event_id"].encode("utf-8")
+    if len(event_id) > MAX_EVENT_ID_LENGTH:
+        raise ValueError(f"Event id {data['event_id'][:32]}... is too long to encode")
+
+    fields, nulls = 0, 0
+    body = [event_id]
+    if "coefficient" in data:
+        fields |= COEFFICIENT
+        if data["coefficient"] is None:
+            nulls |= COEFFICIENT
+        else:
+            coefficient = str(data["coefficient"]).encode("ascii")
+            if len(coefficient) > MAX_COEFFICIENT_LENGTH:
+                raise ValueError(
+                    f"Coefficient of event {data['event_id']} is too long to encode"
+                )
+            body.append(bytes([len(coefficient)]) + coefficient)
+    if "deadline" in data:
+        fields |= DEADLINE
+        if data["deadline"] is None:
+            nulls |= DEADLINE
+        else:
+            body.append(_DEADLINE.pack(data["deadline"]))
+    if "state" in data:
+        fields |= STATE
+        if data["state"] is None:
+            nulls |= STATE
+        else:
+            body.append(bytes([data["state"].value]))
+
+    return _HEADER.pack(BINARY_VERSION, fields, nulls, len(event_id)) + b"".join(body)
@@ -1,44 +1,75 @@
+import asyncio
 import enum
 import json
 import logging
 import os
 import time
+import uuid
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from decimal import Decimal
 from typing import Optional
 
 import httpx
 from aiokafka import AIOKafkaProducer  # type: ignore
-from fastapi import FastAPI, HTTPException, Path
+from app.codec import BINARY_CONTENT_TYPE, CONTENT_TYPE_HEADER, encode_event
+from app.publisher import EventPublisher
+from fastapi import FastAPI, HTTPException, Path, Query, Response
 from pydantic import BaseModel
 
 BET_MAKER_URL = os.getenv("BET_MAKER_URL")
 KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS")
 KAFKA_TOPIC = "line_provider"
+# "json" keeps the legacy JSON-in-JSON payload, "binary" sends the compact v1
+# format, switch once every bet_maker consumer understands it
+EVENT_WIRE_FORMAT = os.getenv("EVENT_WIRE_FORMAT", "json")
+# "sync" waits for the broker on every PUT /event, "async" queues the message
+# and lets the producer batch it, delivery failures are then only counted
+PUBLISH_MODE = os.getenv("PUBLISH_MODE", "sync")
+PUBLISH_QUEUE_SIZE = int(os.getenv("PUBLISH_QUEUE_SIZE", "10000"))
+PRODUCER_LINGER_MS = int(os.getenv("PRODUCER_LINGER_MS", "5"))
+PRODUCER_MAX_BATCH_SIZE = int(os.getenv("PRODUCER_MAX_BATCH_SIZE", "65536"))
+PRODUCER_COMPRESSION = os.getenv("PRODUCER_COMPRESSION") or None
+# Most event ids accepted by a single POST /events/batch
+MAX_BATCH_EVENT_IDS = int(os.getenv("MAX_BATCH_EVENT_IDS", "1000"))
+# Longest a GET /events/changes request may wait for a change, in seconds
+MAX_CHANGES_WAIT = float(os.getenv("MAX_CHANGES_WAIT", "30"))
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.DEBUG)
 
 producer = None
+publisher: Optional[EventPublisher] = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.debug("Starting Line Provider service...")
-    global producer
+    global producer, publisher
 
     producer = AIOKafkaProducer(
         bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+        key_serializer=lambda k: k.encode("utf-8"),
+        linger_ms=PRODUCER_LINGER_MS,
+        max_batch_size=PRODUCER_MAX_BATCH_SIZE,
+        compression_type=PRODUCER_COMPRESSION,
     )
     await producer.start()
 
+    if PUBLISH_MODE == "async":
+        publisher = EventPublisher(
+            producer=producer, topic=KAFKA_TOPIC, queue_size=PUBLISH_QUEUE_SIZE
+        )
+        publisher.start()
+
     yield
 
     # Shutdown
     logger.debug("Stopping Line Provider service...")
+    if publisher:
+        await publisher.stop()
     await producer.stop()
 
 
@@ -76,6 +107,38 @@ events: dict[str, Event] = {
     ),
 }
 
+
+class EventBatchRequest(BaseModel):
+    event_ids: list[str]
+
+
+# Change feed: every change of `events` gets the next version, and the latest
+# version of every event is kept in version order. The store lives in memory,
+# so the epoch tells clients when versions restarted from scratch
+EVENTS_EPOCH = uuid.uuid4().hex
+events_version = 0
+event_versions: OrderedDict[str, int] = OrderedDict()
+events_changed = asyncio.Condition()
+
+
+def record_change(event_id: str) -> int:
+    global events_version
+    events_version += 1
+    event_versions[event_id] = events_version
+    event_versions.move_to_end(event_id)
+    return events_version
+
+
+for _event_id in events:
+    record_change(_event_id)
+
+
+async def notify_change(event_id: str) -> None:
+    async with events_changed:
+        record_change(event_id)
+        events_changed.notify_all()
+
+
 app_line_provider = FastAPI(lifespan=lifespan)
 
 
@@ -86,6 +149,7 @@ async def create_event(event: Event):
     else:
         for p_name, p_value in event.model_dump(exclude_unset=True).items():
             setattr(events[event.event_id], p_name, p_value)
+    await notify_change(event.event_id)
 
     try:
         await send_event(event=event)
@@ -100,12 +164,34 @@ async def send_event(event: Event):
     await send_event_to_kafka(event=event)
 
 
+def serialize_event(event: Event) -> tuple[bytes, Optional[list]]:
+    """Kafka message value and headers for the configured wire format"""
+    if EVENT_WIRE_FORMAT == "binary":
+        try:
+            return encode_event(event), [
+                (CONTENT_TYPE_HEADER, BINARY_CONTENT_TYPE.encode("utf-8"))
+            ]
+        except ValueError as e:
+            # Consumers decode by content type, JSON carries any length
+            logger.warning(f"Sending event {event.event_id} as JSON: {e}")
+
+    message = event.model_dump_json(exclude_unset=True)
+    return json.dumps(message).encode("utf-8"), None
+
+
 async def send_event_to_kafka(event: Event):
     """Send event to Kafka"""
-    if producer:
-        message = event.model_dump_json(exclude_unset=True)
-        await producer.send_and_wait(topic=KAFKA_TOPIC, value=message)
-        logger.debug(f"Sent event to Kafka: {message}")
+    if publisher:
+        message, headers = serialize_event(event=event)
+        await publisher.publish(key=event.event_id, value=message, headers=headers)
+        logger.debug(f"Queued event for Kafka: {message!r}")
+    elif producer:
+        message, headers = serialize_event(event=event)
+        # Keyed by event, so all updates of an event land on one partition
+        await producer.send_and_wait(
+            topic=KAFKA_TOPIC, key=event.event_id, value=message, headers=headers
+        )
+        logger.debug(f"Sent event to Kafka: {message!r}")
     else:
         logger.error("Kafka producer not initialized")
 
@@ -132,9 +218,77 @@ async def get_event(event_id: str = Path(...)):
 
 
 @app_line_provider.get("/events")
-async def get_events():
+async def get_events(response: Response, offset: int = 0, limit: Optional[int] = None):
     events_list = [
         e for e in events.values() if e.deadline and time.time() < e.deadline
     ]
-    logger.debug(f"Found events: {events_list}")
-    return events_list
+    logger.debug(f"Found {len(events_list)} events")
+
+    # Total of the unpaged list, so clients know when they got everything
+    response.headers["X-Total-Count"] = str(len(events_list))
+    end = offset + limit if limit is not None else None
+    return events_list[offset:end]
+
+
+@app_line_provider.post("/events/batch")
+async def get_events_batch(request: EventBatchRequest):
+    """Events with the requested ids, unknown ids are left out"""
+    if len(request.event_ids) > MAX_BATCH_EVENT_IDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {MAX_BATCH_EVENT_IDS} event ids per request",
+        )
+
+    return [
+        events[event_id]
+        for event_id in dict.fromkeys(request.event_ids)
+        if event_id in events
+    ]
+
+
+@app_line_provider.get("/events/changes")
+async def get_event_changes(
+    since: int = 0, limit: int = Query(500, ge=1), wait: float = 0
+):
+    """Latest state of the events changed after version `since`.
+
+    Events come in version order, pass the returned `version` as `since` to
+    get the next page. With nothing new the request waits up to `wait`
+    seconds for a change. A different `epoch` means the versions restarted
+    and the client has to resynchronise fully.
+    """
+    if wait > 0 and since == events_version:
+        async with events_changed:
+            try:
+                await asyncio.wait_for(
+                    events_changed.wait_for(lambda: events_version > since),
+                    timeout=min(wait, MAX_CHANGES_WAIT),
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    # Newest first until reaching the client version, cheap for small gaps
+    changed = []
+    for event_id, version in reversed(event_versions.items()):
+        if version <= since:
+            break
+        changed.append((event_id, version))
+    changed.reverse()
+
+    page = changed[:limit]
+    has_more = len(changed) > limit
+    return {
+        "epoch": EVENTS_EPOCH,
+        "version": page[-1][1] if has_more else events_version,
+        "latest": events_version,
+        "has_more": has_more,
+        "events": [events[event_id] for event_id, _ in page],
+    }
+
+
+@app_line_provider.get("/publisher/stats")
+async def get_publisher_stats():
+    if not publisher:
+        raise HTTPException(status_code=404, detail="Async publishing is disabled")
+
+    return publisher.stats()
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Optional
+
+from aiokafka import AIOKafkaProducer  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class EventPublisher:
+    """Publish messages without waiting for the broker.
+
+    Messages go through a bounded in-memory queue to a background task which
+    hands them to the producer, so they are batched according to the producer
+    linger and batch size settings. Delivery futures are tracked to count
+    delivered and failed messages. `publish` only waits when the queue is full.
+    """
+
+    def __init__(self, producer: AIOKafkaProducer, topic: str, queue_size: int):
+        self.producer = producer
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.in_flight: set[asyncio.Future] = set()
+        self.task: Optional[asyncio.Task] = None
+
+        self.published = 0
+        self.delivered = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Send everything queued and wait for the outstanding deliveries"""
+        await self.queue.join()
+        if self.task:
+            self.task.cancel()
+            await asyncio.wait([self.task])
+        if self.in_flight:
+            await asyncio.wait(self.in_flight)
+
+    async def publish(
+        self, key: str, value: bytes, headers: Optional[list] = None
+    ) -> None:
+        await self.queue.put((key, value, headers))
+        self.published += 1
+
+    async def _run(self) -> None:
+        while True:
+            key, value, headers = await self.queue.get()
+            try:
+                # Returns once the message is added to a batch, not on delivery
+                future = await self.producer.send(
+                    topic=self.topic, key=key, value=value, headers=headers
+                )
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to send event {key} to Kafka: {e}")
+            else:
+                self.in_flight.add(future)
+                future.add_done_callback(self._on_delivery)
+            finally:
+                self.queue.task_done()
+
+    def _on_delivery(self, future: asyncio.Future) -> None:
+        self.in_flight.discard(future)
+        error = "cancelled" if future.cancelled() else future.exception()
+        if error:
+            self.failed += 1
+            logger.error(f"Failed to deliver event to Kafka: {error}")
+        else:
+            self.delivered += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "published": self.published,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "queued": self.queue.qsize(),
+            "in_flight": len(self.in_flight),
+        }
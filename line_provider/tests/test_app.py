@@ -51,3 +51,66 @@ async def test_simple_workflow(anyio_backend):
 
     assert response.status_code == 200
     assert response.json() == updated_event
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_events_pagination(anyio_backend):
+    transport = ASGITransport(app=cast(ASGIApp, app_line_provider))
+
+    async with AsyncClient(transport=transport, base_url="http://localhost") as ac:
+        all_response = await ac.get("/events")
+        page_response = await ac.get("/events", params={"offset": 1, "limit": 1})
+
+    assert all_response.status_code == 200
+    assert page_response.status_code == 200
+
+    all_events = all_response.json()
+    assert page_response.json() == all_events[1:2]
+    assert page_response.headers["X-Total-Count"] == str(len(all_events))
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_events_batch(anyio_backend):
+    transport = ASGITransport(app=cast(ASGIApp, app_line_provider))
+
+    async with AsyncClient(transport=transport, base_url="http://localhost") as ac:
+        response = await ac.post(
+            "/events/batch", json={"event_ids": ["1", "unknown", "2", "1"]}
+        )
+
+    assert response.status_code == 200
+    assert [event["event_id"] for event in response.json()] == ["1", "2"]
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_event_changes(anyio_backend):
+    transport = ASGITransport(app=cast(ASGIApp, app_line_provider))
+
+    async with AsyncClient(transport=transport, base_url="http://localhost") as ac:
+        head = (await ac.get("/events/changes", params={"limit": 1})).json()
+        await ac.put("/event", json={"event_id": "1", "coefficient": "1.3"})
+        await ac.put("/event", json={"event_id": "2", "coefficient": "1.4"})
+        first = (
+            await ac.get(
+                "/events/changes", params={"since": head["latest"], "limit": 1}
+            )
+        ).json()
+        second = (
+            await ac.get("/events/changes", params={"since": first["version"]})
+        ).json()
+        # Nothing new: waits for the timeout, then returns an empty page
+        empty = (
+            await ac.get(
+                "/events/changes", params={"since": second["version"], "wait": 0.01}
+            )
+        ).json()
+
+    assert head["has_more"]
+    assert first["has_more"]
+    assert [event["event_id"] for event in first["events"]] == ["1"]
+    assert not second["has_more"]
+    assert [event["event_id"] for event in second["events"]] == ["2"]
+    assert second["version"] == head["latest"] + 2
+    assert empty["events"] == []
+    assert empty["version"] == second["version"]
+    assert first["epoch"] == second["epoch"] == head["epoch"]
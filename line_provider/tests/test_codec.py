@@ -0,0 +1,55 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from app.codec import BINARY_CONTENT_TYPE, encode_event
+from app.main import Event, EventState, serialize_event
+
+# Decoded by tests/test_codec.py of bet_maker, keep both in sync
+GOLDEN_PAYLOADS = [
+    (
+        Event(
+            event_id="1",
+            coefficient=Decimal("1.15"),
+            deadline=1723456789,
+            state=EventState.NEW,
+        ),
+        "01070000013104312e31350000000066b9dd1501",
+    ),
+    (Event(event_id="2", state=EventState.FINISHED_WIN), "01040000013202"),
+    (
+        Event(event_id="событие", coefficient=None, deadline=0),
+        "010301000ed181d0bed0b1d18bd182d0b8d0b50000000000000000",
+    ),
+]
+
+
+@pytest.mark.parametrize("event, payload", GOLDEN_PAYLOADS)
+def test_encode_event_matches_golden_payload(event: Event, payload: str):
+    # Act & Assert
+    assert encode_event(event).hex() == payload
+
+
+def test_encode_event_rejects_oversized_coefficient():
+    # Arrange
+    event = Event(event_id="1", coefficient=Decimal("1." + "1" * 300))
+
+    # Act & Assert
+    with pytest.raises(ValueError):
+        encode_event(event)
+
+
+def test_serialize_event_falls_back_to_json():
+    # Arrange
+    event = Event(event_id="1", coefficient=Decimal("1." + "1" * 300))
+
+    # Act
+    with patch("app.main.EVENT_WIRE_FORMAT", "binary"):
+        message, headers = serialize_event(event)
+    with patch("app.main.EVENT_WIRE_FORMAT", "binary"):
+        _, binary_headers = serialize_event(GOLDEN_PAYLOADS[0][0])
+
+    # Assert
+    assert headers is None
+    assert b"1.111" in message
+    assert binary_headers[0][1] == BINARY_CONTENT_TYPE.encode("utf-8")
@@ -0,0 +1,32 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from app.publisher import EventPublisher
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_publisher_counts_deliveries(anyio_backend):
+    loop = asyncio.get_running_loop()
+    delivered, failed = loop.create_future(), loop.create_future()
+    delivered.set_result(None)
+    failed.set_exception(Exception("Broker is down"))
+
+    producer = AsyncMock()
+    producer.send.side_effect = [delivered, failed, Exception("Buffer full")]
+
+    publisher = EventPublisher(producer=producer, topic="line_provider", queue_size=10)
+    publisher.start()
+
+    for event_id in ("1", "2", "3"):
+        await publisher.publish(key=event_id, value=b"{}")
+    await publisher.stop()
+
+    assert producer.send.await_count == 3
+    assert publisher.stats() == {
+        "published": 3,
+        "delivered": 1,
+        "failed": 2,
+        "queued": 0,
+        "in_flight": 0,
+    }